@@ -0,0 +1,256 @@
+"""
+Agrégats pré-calculés sur les résultats par commune.
+
+Les pages d'analyse interrogent ces petites tables (une ligne par élection et
+par département) au lieu de regrouper à chaque interaction le fichier complet.
+"""
+import numpy as np
+import pandas as pd
+
+# Effectifs additionnés dans le cube
+COLONNES_SOMMES = ['Inscrits', 'Abstentions', 'Votants', 'Blancs', 'Nuls', 'Exprimés']
+
+# Pourcentages communaux dont les pages affichent la moyenne : on garde somme et effectif
+COLONNES_POURCENTAGES = ['% Abs/Ins', '% Blancs/Ins', '% Nuls/Ins']
+
+# Taux pondérés (somme des effectifs / somme des inscrits)
+TAUX_PONDERES = {
+    'Taux Abs/Ins': 'Abstentions',
+    'Taux Vot/Ins': 'Votants',
+    'Taux Blancs/Ins': 'Blancs',
+    'Taux Nuls/Ins': 'Nuls',
+    'Taux Exp/Ins': 'Exprimés',
+}
+
+CLES_CUBE = ['id_election', 'cle_departement', 'Code du département', 'Libellé du département']
+
+
+def ajouter_taux(table):
+    for taux, colonne in TAUX_PONDERES.items():
+        table[taux] = 100 * table[colonne] / table['Inscrits']
+    return table
+
+
+def construire_cube_abstention(df):
+    """
+    Cube (élection, département) : effectifs sommés, somme et nombre des
+    pourcentages communaux, taux pondérés, et tour de l'élection.
+    """
+    groupes = df.groupby(CLES_CUBE, observed=True)
+    cube = groupes[[c for c in COLONNES_SOMMES if c in df.columns]].sum()
+    for colonne in COLONNES_POURCENTAGES:
+        cube[f'Somme {colonne}'] = groupes[colonne].sum()
+        cube[f'Nb {colonne}'] = groupes[colonne].count()
+    cube = ajouter_taux(cube.reset_index())
+    cube['Tour'] = cube['id_election'].astype(str).str[-2:].str.upper()
+    return cube
+
+
+def moyennes_communales(cube, par, colonnes=('% Abs/Ins',)):
+    """
+    Moyenne des pourcentages communaux regroupée selon `par`, identique à
+    df.groupby(par)[colonnes].mean() sur le fichier complet.
+    """
+    groupes = cube.groupby(par, observed=True)
+    moyennes = pd.DataFrame({
+        colonne: groupes[f'Somme {colonne}'].sum() / groupes[f'Nb {colonne}'].sum()
+        for colonne in colonnes
+    })
+    return moyennes.reset_index()
+
+
+def totaux(cube, par=None):
+    """Effectifs sommés et taux pondérés, regroupés selon `par` (ou au total)."""
+    if par is None:
+        return ajouter_taux(cube[COLONNES_SOMMES].sum().to_frame().T)
+    return ajouter_taux(cube.groupby(par, observed=True)[COLONNES_SOMMES].sum().reset_index())
+
+
+def classement_departements(cube, colonne='% Abs/Ins'):
+    """
+    Index de classement : pour chaque (élection, département), la moyenne
+    communale de `colonne` et son rang dans les deux sens au sein de l'élection.
+
+    La table est triée une fois pour toutes par élection puis par valeur
+    décroissante, ce qui dispense de tout tri à l'affichage.
+    """
+    table = moyennes_communales(cube, ['id_election', 'Libellé du département'], [colonne])
+    groupes = table.groupby('id_election', observed=True)[colonne]
+    table['Rang croissant'] = groupes.rank(method='first', ascending=True)
+    table['Rang décroissant'] = groupes.rank(method='first', ascending=False)
+    return table.sort_values(['id_election', 'Rang décroissant'], na_position='last', ignore_index=True)
+
+
+def apparitions(classement, k, rang='Rang croissant'):
+    """Nombre d'élections où chaque département figure dans les k premiers selon `rang`, par ordre décroissant."""
+    dans_top = classement[classement[rang] <= k]
+    return (dans_top.groupby('Libellé du département', observed=True).size()
+            .sort_values(ascending=False, kind='stable'))
+
+
+##################################
+# JOINTURES SOCIO-DEMOGRAPHIQUES #
+##################################
+
+def abstention_premiers_tours(cube):
+    """Taux d'abstention pondéré (abstentions / inscrits) par année d'élection et par département, premiers tours seulement."""
+    premiers = cube[cube['Tour'] == 'T1']
+    premiers = premiers.assign(Annee=premiers['id_election'].astype(str).str[:4].astype(int))
+    return totaux(premiers, ['Annee', 'cle_departement'])
+
+
+def annees_proches(annees, annees_reference):
+    """Pour chaque année, l'année de référence la plus proche (la plus ancienne à égalité)."""
+    reference = np.sort(np.asarray(annees_reference))
+    ecarts = np.abs(np.asarray(annees)[:, None] - reference[None, :])
+    return reference[ecarts.argmin(axis=1)]
+
+
+def jointure_ages_abstention(ages, abstention):
+    """
+    Proportions par tranche d'âge (une ligne par département et par année)
+    jointes au taux d'abstention pondéré des premiers tours de l'année
+    d'élection la plus proche, indiquée dans 'Annee election'.
+
+    Les deux côtés sont réduits au département avant la jointure, faite sur un
+    index (année, clé département) de quelques centaines de lignes.
+    """
+    if abstention.empty:
+        return ages.iloc[:0].assign(**{'Annee election': 0, 'Taux Abs/Ins': 0.0})
+    annees = ages['Annee'].unique()
+    correspondance = pd.Series(annees_proches(annees, abstention['Annee'].unique()), index=annees)
+    ages = ages.assign(**{'Annee election': ages['Annee'].map(correspondance)})
+    taux = abstention.set_index(['Annee', 'cle_departement'])[['Taux Abs/Ins', 'Inscrits', 'Abstentions']]
+    return ages.join(taux, on=['Annee election', 'cle_departement'], how='inner').reset_index(drop=True)
+
+
+def panel_chomage_abstention(chomage, cube):
+    """
+    Panel long (département, année, élection de premier tour) : taux de chômage
+    de l'année et moyenne communale de l'abstention de l'élection. Les colonnes
+    annuelles du chômage sont dépliées une fois, puis jointes sur un index
+    (année, clé département).
+    """
+    annees = [colonne for colonne in chomage.columns if colonne.isdigit()]
+    chomage = chomage.melt(id_vars=['cle_departement', 'DEP_CODE', 'DEP_NOM'], value_vars=annees,
+                           var_name='Annee', value_name='Taux de chômage')
+    chomage['Annee'] = chomage['Annee'].astype(int)
+    abstention = moyennes_communales(cube[cube['Tour'] == 'T1'], ['cle_departement', 'id_election'])
+    abstention['Annee'] = abstention['id_election'].astype(str).str[:4].astype(int)
+    abstention = abstention.set_index(['Annee', 'cle_departement'])
+    return chomage.join(abstention, on=['Annee', 'cle_departement'], how='inner').reset_index(drop=True)
+
+
+def statistiques_panel(panel, annees, x='Taux de chômage', y='% Abs/Ins', k=10):
+    """
+    En une passe sur les années demandées : moyennes de x et y et corrélation
+    de Pearson par année, puis les k lignes aux x les plus élevés et les plus
+    faibles de chaque année (mêmes lignes que nlargest/nsmallest, égalités comprises).
+    """
+    selection = panel[panel['Annee'].isin(annees)]
+    resume = selection.groupby('Annee')[[x, y]].mean()
+    # Corrélation sur les paires complètes, à partir des écarts à la moyenne de l'année
+    complet = selection.dropna(subset=[x, y])
+    ecarts = complet[[x, y]] - complet.groupby('Annee')[[x, y]].transform('mean')
+    sommes = pd.DataFrame({
+        'xy': ecarts[x] * ecarts[y], 'xx': ecarts[x] ** 2, 'yy': ecarts[y] ** 2, 'Annee': complet['Annee'],
+    }).groupby('Annee').sum()
+    resume['Corrélation'] = sommes['xy'] / np.sqrt(sommes['xx'] * sommes['yy'])
+    classables = selection.dropna(subset=[x])
+    plus_eleves = classables.sort_values(['Annee', x], ascending=[True, False], kind='stable').groupby('Annee').head(k)
+    plus_faibles = classables.sort_values(['Annee', x], kind='stable').groupby('Annee').head(k)
+    return resume, plus_eleves, plus_faibles
+
+
+#################
+# BAROMETRE INA #
+#################
+
+class CubeBarometre:
+    """
+    Baromètre INA compilé en tableaux denses année x mois x chaîne x thème.
+
+    Pour chaque métrique on garde les valeurs mensuelles, leurs sommes
+    annuelles et leurs sommes cumulées le long du temps : le total d'une
+    période quelconque pour un sous-ensemble de chaînes et de thèmes coûte
+    O(chaînes x thèmes), sans filtrer ni regrouper de DataFrame.
+    """
+
+    METRIQUES = ('Nb_Thème', 'Nb_temps')
+
+    def __init__(self, df):
+        self.annees = np.sort(df['Annee'].unique())
+        self.mois = np.arange(1, 13)
+        self.chaines = pd.Index(df['Chaîne'].unique())
+        self.themes = pd.Index(df['Thématique'].unique())
+
+        forme = (len(self.annees), len(self.mois), len(self.chaines), len(self.themes))
+        position = (
+            np.searchsorted(self.annees, df['Annee'].to_numpy()),
+            df['Mois'].to_numpy() - 1,
+            self.chaines.get_indexer(df['Chaîne']),
+            self.themes.get_indexer(df['Thématique']),
+        )
+        # Nombre de lignes par case, pour distinguer "aucune donnée" de zéro
+        self.presence = np.zeros(forme, dtype=np.int32)
+        np.add.at(self.presence, position, 1)
+
+        self.mensuel, self.annuel, self.cumul = {}, {}, {}
+        for metrique in self.METRIQUES:
+            valeurs = np.zeros(forme)
+            np.add.at(valeurs, position, df[metrique].fillna(0).to_numpy(dtype=float))
+            self.mensuel[metrique] = valeurs
+            self.annuel[metrique] = valeurs.sum(axis=1)
+            # Sommes cumulées sur les mois successifs, précédées d'une ligne nulle
+            cumul = valeurs.reshape(-1, forme[2], forme[3]).cumsum(axis=0)
+            self.cumul[metrique] = np.concatenate([np.zeros((1,) + forme[2:]), cumul])
+        self.presence_annuelle = self.presence.sum(axis=1)
+
+    def _selection(self, chaines, themes):
+        """Positions des chaînes et des thèmes demandés. Lève KeyError si l'un d'eux est inconnu."""
+        positions = []
+        for index, noms in ((self.chaines, list(chaines)), (self.themes, list(themes))):
+            position = index.get_indexer(noms)
+            if (position < 0).any():
+                raise KeyError([nom for nom, i in zip(noms, position) if i < 0])
+            positions.append(position)
+        return tuple(positions)
+
+    def _rang(self, annee, mois, apres):
+        """
+        Nombre de mois couverts avant le mois (annee, mois), ou jusqu'à lui
+        inclus si `apres` : une borne de l'axe du temps, entre 0 et le nombre
+        de mois couverts. Un mois hors des années couvertes ne compte pas.
+        """
+        position = int(np.searchsorted(self.annees, annee))
+        rang = position * len(self.mois)
+        if position < len(self.annees) and self.annees[position] == annee:
+            rang += int(np.clip(mois - 1 + apres, 0, len(self.mois)))
+        return rang
+
+    def total(self, metrique, chaines, themes, debut=None, fin=None):
+        """
+        Total par thème entre deux mois (annee, mois) inclus, pour les chaînes
+        sélectionnées. Sans bornes, toute la période est prise ; une période
+        hors des années couvertes donne des zéros.
+        """
+        i_chaines, i_themes = self._selection(chaines, themes)
+        cumul = self.cumul[metrique]
+        bas = 0 if debut is None else self._rang(*debut, apres=False)
+        haut = len(cumul) - 1 if fin is None else self._rang(*fin, apres=True)
+        if haut <= bas:
+            return pd.Series(0.0, index=self.themes[i_themes], name=metrique)
+        difference = cumul[haut][np.ix_(i_chaines, i_themes)] - cumul[bas][np.ix_(i_chaines, i_themes)]
+        return pd.Series(difference.sum(axis=0), index=self.themes[i_themes], name=metrique)
+
+    def serie_annuelle(self, metrique, chaines, themes, annee_max=None):
+        """
+        Somme annuelle par thème jusqu'à annee_max incluse, pour les chaînes
+        sélectionnées ; NaN les années sans aucune donnée pour ce thème.
+        """
+        i_chaines, i_themes = self._selection(chaines, themes)
+        nb_annees = len(self.annees) if annee_max is None else int(np.searchsorted(self.annees, annee_max, side='right'))
+        annuel = self.annuel[metrique][:nb_annees][:, i_chaines][:, :, i_themes].sum(axis=1)
+        presence = self.presence_annuelle[:nb_annees][:, i_chaines][:, :, i_themes].sum(axis=1)
+        return pd.DataFrame(np.where(presence > 0, annuel, np.nan),
+                            index=pd.Index(self.annees[:nb_annees], name='Annee'), columns=self.themes[i_themes])
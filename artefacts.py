@@ -0,0 +1,473 @@
+"""
+Reconstruction hors ligne des fichiers dérivés du dashboard (images, contours,
+tables pré-converties) à partir des CSV sources.
+
+Chaque artefact est décrit par une règle : fichiers d'entrée, fichiers de
+sortie et fonction de construction. Une règle n'est rejouée que si l'empreinte
+du contenu de ses entrées, de son code (son module et les modules du dashboard
+qu'il importe) et de ses paramètres diffère de celle enregistrée dans
+cache/artefacts.json, ou si l'une de ses sorties manque. Les
+règles indépendantes sont exécutées en parallèle dans un pool de processus ;
+une règle qui lit la sortie d'une autre (les cartes lisent les contours)
+attend que celle-ci soit construite.
+
+Usage :
+    python artefacts.py                     # reconstruit ce qui a changé
+    python artefacts.py --liste             # état de chaque artefact
+    python artefacts.py reconstruits/age2017.png --force
+    python artefacts.py --processus 4
+
+Les images et cartes versionnées affichées par carte.py ont été produites à la
+main, par une méthode que les règles ne reproduisent pas encore à l'identique
+(classes, sources des taux) : elles figurent dans NON_REPRODUCTIBLES, et leurs
+versions reconstruites sont écrites à part, dans reconstruits/, sans jamais
+remplacer les originaux. Seuls les contours et les tables pré-converties sont
+produits en place.
+"""
+import argparse
+import concurrent.futures
+import datetime
+import hashlib
+import inspect
+import json
+import os
+import sys
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+from matplotlib.collections import PolyCollection
+from matplotlib.lines import Line2D
+
+from cartographie import (CADRAGE_METROPOLE, COUCHES, COULEURS_BORDS, LARGEUR_VUE, NIVEAUX, charger_geometrie,
+                          chemin_geometrie, choisir_niveau, choroplethe, codes_disponibles, construire_geometries,
+                          polygones, resultats_par_zone)
+from donnees import (DOSSIER_CACHE, FICHIERS_CIRCONSCRIPTIONS, TABLES_PRECONVERTIES, charger_chomage, charger_pauvrete,
+                     chemin_cache, convertir, lire_candidats_circonscriptions)
+from referentiel import DEPARTEMENTS, normaliser_departements
+
+# Empreintes des artefacts construits et des fichiers déjà hachés
+MANIFESTE = os.path.join(DOSSIER_CACHE, "artefacts.json")
+
+# Versions reconstruites des images et cartes versionnées (non versionné)
+DOSSIER_RECONSTRUITS = "reconstruits"
+
+# Dossier des modules du dashboard, dont le code entre dans l'empreinte des règles
+DOSSIER_DASHBOARD = os.path.dirname(os.path.abspath(__file__))
+
+RESOLUTION = 150
+
+ANNEES_AGE = [2017, 2018, 2019, 2020, 2021, 2022]
+
+# Années des analyses du chômage et suffixe des fichiers correspondants
+ANNEES_CHOMAGE = {"2017": "", "2022": "_2022", "2024": "_2024"}
+
+CLASSES_CHOMAGE = ["Faible", "Moyen", "Élevé", "Très élevé"]
+
+# Tranches d'âge comparées sur les cartes (colonnes prop<tranche><année> de df_age.csv)
+COULEURS_AGES = {"1539": "#1f77b4", "4059": "#9467bd", "60p": "#17becf"}
+
+CONTOURS_DEPARTEMENTS = chemin_geometrie("departements", "moyen")
+
+# Taux de pauvreté des départements par année (colonnes de moyenne_pauvrete_par_departement.csv)
+COLONNES_PAUVRETE = {"2017": "tp60_a17", "2021": "DISP_TP60_A21"}
+
+# Quintiles des cartes de pauvreté, aux couleurs des cartes folium d'origine
+COULEURS_PAUVRETE = ["#ffffcc", "#a1dab4", "#41b6c4", "#225ea8", "#130c4d"]
+
+# Contours lus par les cartes HTML cadrées sur la métropole (niveau choisi par choroplethe)
+CONTOURS_CARTES_HTML = chemin_geometrie("departements", choisir_niveau(
+    max(np.diff(CADRAGE_METROPOLE["lonaxis_range"])[0], np.diff(CADRAGE_METROPOLE["lataxis_range"])[0]), LARGEUR_VUE))
+
+NON_REPRODUCTIBLES = {
+    "age20*.png, Carte_classes_taux_chom*.png, repartition_vote_classe_taux_chom*.png, evolution_*.png":
+        "méthode d'origine non reproduite à l'identique, versions approchées dans reconstruits/",
+    "map_taux_pauv_departements_*.html": "taux d'origine différents de moyenne_pauvrete_par_departement.csv, "
+                                         "versions approchées dans reconstruits/",
+    "map_revenu_departements_*.html": "revenu médian absent de departements_pauvrete.csv (déciles 1-3 et 7-9 seulement)",
+    "map_circonscription_Haute_Garonne_*.html": "revenu médian et taux de pauvreté par circonscription présents "
+                                                "seulement dans ces cartes",
+    "image2022.png, image2024.png": "df_jointure_2022.csv et df_jointure_2024.csv non versionnés",
+    "resultats_electoraux_interactifs_*.html": "résultats des présidentielles absents du dépôt",
+    "res_*.html": "cartes folium d'origine, sources des contours (geometries/)",
+}
+
+
+######################
+# FONCTIONS DE RENDU #
+######################
+
+def enregistrer_figure(figure, chemin):
+    """Écrit la figure puis la ferme ; le fichier n'apparaît qu'une fois complet."""
+    temporaire = f"{chemin}.{os.getpid()}.tmp"
+    try:
+        figure.savefig(temporaire, format=os.path.splitext(chemin)[1][1:], dpi=RESOLUTION, bbox_inches="tight")
+        os.replace(temporaire, chemin)
+    finally:
+        plt.close(figure)
+        if os.path.exists(temporaire):
+            os.remove(temporaire)
+
+
+def dessiner_departements(ax, classes, couleurs):
+    """Carte des départements métropolitains colorés selon leur classe (Series code -> classe)."""
+    contours, teintes = [], []
+    for entite in charger_geometrie("departements", "moyen")["features"]:
+        classe = classes.get(entite["properties"]["code"])
+        if classe not in couleurs:
+            continue
+        for polygone in polygones(entite["geometry"]):
+            contours.append(np.asarray(polygone[0], dtype=float)[:, :2])
+            teintes.append(couleurs[classe])
+    ax.add_collection(PolyCollection(contours, facecolors=teintes, edgecolors="white", linewidths=0.2))
+    ax.autoscale_view()
+    # Degrés de longitude raccourcis à la latitude moyenne de la métropole
+    ax.set_aspect(1 / np.cos(np.radians(46.5)))
+    ax.set_axis_off()
+    presentes = [classe for classe in couleurs if classe in set(classes)]
+    ax.legend(handles=[Line2D([], [], marker="o", linestyle="", markersize=10, color=couleurs[classe], label=classe)
+                       for classe in presentes], loc="upper right")
+
+
+def enregistrer_html(figure, chemin):
+    """Écrit la figure Plotly en page HTML autonome (plotly.js depuis le CDN), à la taille de son cadre."""
+    figure.update_layout(height=None)
+    temporaire = f"{chemin}.{os.getpid()}.tmp"
+    try:
+        figure.write_html(temporaire, include_plotlyjs="cdn", default_height="100%")
+        os.replace(temporaire, chemin)
+    finally:
+        if os.path.exists(temporaire):
+            os.remove(temporaire)
+
+
+def classes_chomage(annee):
+    """Quartiles du taux de chômage des départements métropolitains pour une année."""
+    chomage = charger_chomage("taux_chomage_par_departement.csv")
+    chomage = chomage[chomage["cle_departement"].map(DEPARTEMENTS["metropole"]).fillna(False).to_numpy(dtype=bool)]
+    return pd.Series(pd.qcut(chomage[annee], 4, labels=CLASSES_CHOMAGE).to_numpy(), index=chomage["DEP_CODE"])
+
+
+def carte_ages(sorties, annee):
+    ages = normaliser_departements(pd.read_csv("df_age.csv"), "dep")
+    colonnes = [f"prop{tranche}{annee}" for tranche in COULEURS_AGES]
+    majoritaire = ages[colonnes].idxmax(axis=1).str[len("prop"):-len(str(annee))]
+    figure, ax = plt.subplots(figsize=(10, 10))
+    dessiner_departements(ax, pd.Series(majoritaire.to_numpy(), index=ages["dep"]), COULEURS_AGES)
+    ax.set_title(f"Répartition des classes d'âge majoritaires en {annee}", fontsize=16)
+    enregistrer_figure(figure, sorties[0])
+
+
+def carte_classes_chomage(sorties, annee):
+    couleurs = dict(zip(CLASSES_CHOMAGE, plt.cm.Blues(np.linspace(0.2, 0.7, len(CLASSES_CHOMAGE)))))
+    figure, ax = plt.subplots(figsize=(8, 8))
+    dessiner_departements(ax, classes_chomage(annee), couleurs)
+    ax.set_title(f"Carte des classes de taux de chômage - {annee}")
+    enregistrer_figure(figure, sorties[0])
+
+
+def repartition_vote_chomage(sorties, annee):
+    """Bord politique arrivé en tête au premier tour, compté par classe de chômage des départements."""
+    id_election = f"{annee}_legi_t1"
+    candidats = lire_candidats_circonscriptions(FICHIERS_CIRCONSCRIPTIONS[id_election], id_election)
+    zones = resultats_par_zone(candidats, id_election, "departements", nb_candidats=1)
+    zones = zones.assign(Classe=zones["Code"].map(classes_chomage(annee))).dropna(subset=["Classe"])
+    comptes = pd.crosstab(pd.Categorical(zones["Classe"], categories=CLASSES_CHOMAGE), zones["Bord 1"])
+    comptes = comptes[[bord for bord in COULEURS_BORDS if bord in comptes.columns]]
+    figure, ax = plt.subplots(figsize=(10, 6))
+    comptes.plot(kind="bar", stacked=True, ax=ax, color=[COULEURS_BORDS[bord] for bord in comptes.columns])
+    ax.set_title(f"Répartition des classes politiques par classe de chômage ({annee})")
+    ax.set_xlabel("Classe de chômage")
+    ax.set_ylabel("Nombre de départements")
+    ax.legend(title="Classe Parti")
+    enregistrer_figure(figure, sorties[0])
+
+
+def evolution_chomage(sorties, statistique):
+    """Moyenne ou écart-type du taux de chômage des départements, année par année."""
+    chomage = charger_chomage("taux_chomage_par_departement.csv")
+    annees = [colonne for colonne in chomage.columns if colonne.isdigit()]
+    serie = chomage[annees].agg(statistique)
+    periode = f"({annees[0]}-{annees[-1]})"
+    figure, ax = plt.subplots(figsize=(10, 6))
+    if statistique == "mean":
+        ax.plot(annees, serie, marker="o", color="blue")
+        ax.set_title(f"Évolution du taux de chômage moyen en France {periode}")
+        ax.set_ylabel("Taux de chômage moyen (%)")
+    else:
+        ax.plot(annees, serie, marker="o", color="red")
+        ax.set_title(f"Évolution de la variabilité des taux de chômage entre départements {periode}")
+        ax.set_ylabel("Écart-type (%)")
+    ax.set_xlabel("Année")
+    ax.tick_params(axis="x", rotation=45)
+    ax.grid(True)
+    enregistrer_figure(figure, sorties[0])
+
+
+def carte_pauvrete(sorties, annee):
+    """Carte HTML du taux de pauvreté des départements métropolitains, en quintiles."""
+    pauvrete = charger_pauvrete("moyenne_pauvrete_par_departement.csv")
+    taux = pauvrete.set_index("departement")[COLONNES_PAUVRETE[annee]].dropna()
+    taux = taux[taux.index.isin(codes_disponibles("departements"))]
+    classes = pd.qcut(taux, len(COULEURS_PAUVRETE))
+    libelles = [f"{intervalle.left:.1f} - {intervalle.right:.1f} %" for intervalle in classes.cat.categories]
+    classes = classes.cat.rename_categories(libelles)
+    figure = choroplethe(
+        "departements",
+        taux.index,
+        classes,
+        dict(zip(libelles, COULEURS_PAUVRETE)),
+        survol="Département " + taux.index + "<br>Taux de pauvreté : " + taux.round(1).astype(str) + " %",
+        cadrage=CADRAGE_METROPOLE,
+        titre=f"Taux de pauvreté par département ({annee})",
+    )
+    enregistrer_html(figure, sorties[0])
+
+
+def construire_contours(sorties):
+    construire_geometries(".")
+
+
+def convertir_table(sorties, fichier):
+    convertir(fichier, TABLES_PRECONVERTIES[fichier])
+
+
+##########
+# REGLES #
+##########
+
+def reconstruit(nom):
+    """Chemin de la version reconstruite d'un fichier versionné, qui n'est jamais remplacé."""
+    return os.path.join(DOSSIER_RECONSTRUITS, nom)
+
+
+def regles():
+    """Règles de construction, par nom (la première sortie)."""
+    liste = [{
+        "sorties": [chemin_geometrie(couche, niveau) for couche in ("departements", "circonscriptions")
+                    for niveau in [None, *NIVEAUX]],
+        "entrees": [source for couche in ("departements", "circonscriptions") for source in COUCHES[couche]["sources"]],
+        "fonction": construire_contours,
+        "parametres": {},
+    }]
+    for annee in ANNEES_AGE:
+        liste.append({"sorties": [reconstruit(f"age{annee}.png")], "entrees": ["df_age.csv", CONTOURS_DEPARTEMENTS],
+                      "fonction": carte_ages, "parametres": {"annee": annee}})
+    for annee, suffixe in ANNEES_CHOMAGE.items():
+        liste.append({"sorties": [reconstruit(f"Carte_classes_taux_chom{suffixe}.png")],
+                      "entrees": ["taux_chomage_par_departement.csv", CONTOURS_DEPARTEMENTS],
+                      "fonction": carte_classes_chomage, "parametres": {"annee": annee}})
+        liste.append({"sorties": [reconstruit(f"repartition_vote_classe_taux_chom{suffixe}.png")],
+                      "entrees": ["taux_chomage_par_departement.csv", FICHIERS_CIRCONSCRIPTIONS[f"{annee}_legi_t1"],
+                                  "nuance_politique.csv"],
+                      "fonction": repartition_vote_chomage, "parametres": {"annee": annee}})
+    for annee in COLONNES_PAUVRETE:
+        liste.append({"sorties": [reconstruit(f"map_taux_pauv_departements_{annee}.html")],
+                      "entrees": ["moyenne_pauvrete_par_departement.csv", CONTOURS_CARTES_HTML],
+                      "fonction": carte_pauvrete, "parametres": {"annee": annee}})
+    for sortie, statistique in (("evolution_chomage.png", "mean"), ("evolution_taux_chom_dep.png", "std")):
+        liste.append({"sorties": [reconstruit(sortie)], "entrees": ["taux_chomage_par_departement.csv"],
+                      "fonction": evolution_chomage, "parametres": {"statistique": statistique}})
+    for fichier in TABLES_PRECONVERTIES:
+        liste.append({"sorties": [os.path.join(chemin_cache(fichier), "meta.json")], "entrees": [fichier],
+                      "fonction": convertir_table, "parametres": {"fichier": fichier}})
+    return {regle["sorties"][0]: regle for regle in liste}
+
+
+##############
+# EMPREINTES #
+##############
+
+def lire_manifeste():
+    try:
+        with open(MANIFESTE, encoding="utf-8") as fichier:
+            return json.load(fichier)
+    except (OSError, ValueError):
+        return {"artefacts": {}, "fichiers": {}}
+
+
+def ecrire_manifeste(manifeste):
+    os.makedirs(os.path.dirname(MANIFESTE), exist_ok=True)
+    temporaire = MANIFESTE + ".tmp"
+    with open(temporaire, "w", encoding="utf-8") as fichier:
+        json.dump(manifeste, fichier, ensure_ascii=False, indent=1)
+    os.replace(temporaire, MANIFESTE)
+
+
+def empreinte_fichier(chemin, connus):
+    """Empreinte du contenu, recalculée seulement si la taille ou la date du fichier a changé."""
+    stat = os.stat(chemin)
+    connu = connus.get(chemin)
+    if connu and connu["taille"] == stat.st_size and connu["mtime"] == stat.st_mtime_ns:
+        return connu["empreinte"]
+    hachage = hashlib.blake2b(digest_size=16)
+    with open(chemin, "rb") as fichier:
+        for bloc in iter(lambda: fichier.read(1 << 20), b""):
+            hachage.update(bloc)
+    connus[chemin] = {"taille": stat.st_size, "mtime": stat.st_mtime_ns, "empreinte": hachage.hexdigest()}
+    return connus[chemin]["empreinte"]
+
+
+def modules_locaux(module, vus=None):
+    """
+    Le module et, récursivement, les modules du dashboard dont il utilise des
+    noms (import x ou from x import y) : ceux du dossier de ce fichier, pas
+    ceux des bibliothèques installées.
+    """
+    vus = {} if vus is None else vus
+    vus[module.__name__] = module
+    for valeur in list(vars(module).values()):
+        nom = valeur.__name__ if inspect.ismodule(valeur) else getattr(valeur, "__module__", None)
+        dependance = sys.modules.get(nom) if isinstance(nom, str) else None
+        if dependance is not None and dependance not in vus.values() and est_local(dependance):
+            modules_locaux(dependance, vus)
+    return vus
+
+
+def est_local(module):
+    fichier = getattr(module, "__file__", None)
+    return fichier is not None and os.path.dirname(os.path.abspath(fichier)) == DOSSIER_DASHBOARD
+
+
+def source_module(module):
+    return inspect.getsource(module)
+
+
+def empreinte_regle(regle, connus):
+    """
+    Contenu des entrées, code du module qui construit l'artefact et des modules
+    du dashboard qu'il importe (cartographie, donnees...), et paramètres.
+    """
+    hachage = hashlib.blake2b(digest_size=16)
+    modules = modules_locaux(sys.modules[regle["fonction"].__module__])
+    for module in sorted(modules.values(), key=lambda module: os.path.basename(module.__file__)):
+        hachage.update(os.path.basename(module.__file__).encode())
+        hachage.update(source_module(module).encode())
+    hachage.update(repr((regle["fonction"].__name__, sorted(regle["parametres"].items()))).encode())
+    for entree in regle["entrees"]:
+        hachage.update(entree.encode())
+        hachage.update(empreinte_fichier(entree, connus).encode())
+    return hachage.hexdigest()
+
+
+def etat(nom, regle, manifeste, force=False):
+    """("manquant", entrées absentes), ("a_construire", empreinte) ou ("a_jour", empreinte)."""
+    absentes = [entree for entree in regle["entrees"] if not os.path.exists(entree)]
+    if absentes:
+        return "manquant", absentes
+    empreinte = empreinte_regle(regle, manifeste["fichiers"])
+    a_jour = (manifeste["artefacts"].get(nom, {}).get("empreinte") == empreinte
+              and all(os.path.exists(sortie) for sortie in regle["sorties"]))
+    return ("a_jour" if a_jour and not force else "a_construire"), empreinte
+
+
+################
+# CONSTRUCTION #
+################
+
+def executer(fonction, sorties, parametres):
+    """Exécutée dans un processus du pool."""
+    for sortie in sorties:
+        os.makedirs(os.path.dirname(sortie) or ".", exist_ok=True)
+    fonction(sorties, **parametres)
+
+
+def selection(toutes, demandes):
+    """Règles demandées (toutes par défaut) et celles dont elles lisent les sorties, récursivement."""
+    producteurs = {sortie: nom for nom, regle in toutes.items() for sortie in regle["sorties"]}
+    dependances = {nom: {producteurs[e] for e in regle["entrees"] if e in producteurs} for nom, regle in toutes.items()}
+    a_voir = [producteurs.get(nom, nom) for nom in demandes] if demandes else list(toutes)
+    inconnues = [nom for nom in a_voir if nom not in toutes]
+    if inconnues:
+        raise SystemExit(f"Artefacts inconnus : {', '.join(inconnues)}")
+    retenues = set()
+    while a_voir:
+        nom = a_voir.pop()
+        if nom not in retenues:
+            retenues.add(nom)
+            a_voir.extend(dependances[nom])
+    return {nom: dependances[nom] & retenues for nom in toutes if nom in retenues}
+
+
+def construire(demandes=(), processus=None, force=False):
+    """Reconstruit les artefacts périmés ; renvoie le nombre d'échecs."""
+    toutes = regles()
+    dependances = selection(toutes, demandes)
+    manifeste = lire_manifeste()
+    termines, echecs, en_cours = set(), set(), {}
+    with concurrent.futures.ProcessPoolExecutor(max_workers=processus) as pool:
+        while len(termines) + len(echecs) < len(dependances):
+            # Règles dont toutes les dépendances sont traitées
+            for nom, requises in dependances.items():
+                if nom in termines or nom in echecs or nom in en_cours.values() or not requises <= termines | echecs:
+                    continue
+                if requises & echecs:
+                    print(f"ignoré      {nom} (dépendance en échec)")
+                    echecs.add(nom)
+                    continue
+                statut, detail = etat(nom, toutes[nom], manifeste, force and (not demandes or nom in demandes))
+                if statut == "manquant":
+                    print(f"ignoré      {nom} (entrées absentes : {', '.join(detail)})")
+                    echecs.add(nom)
+                elif statut == "a_jour":
+                    termines.add(nom)
+                else:
+                    regle = toutes[nom]
+                    futur = pool.submit(executer, regle["fonction"], regle["sorties"], regle["parametres"])
+                    futur.empreinte = detail
+                    en_cours[futur] = nom
+            if not en_cours:
+                continue
+            faits, _ = concurrent.futures.wait(en_cours, return_when=concurrent.futures.FIRST_COMPLETED)
+            for futur in faits:
+                nom = en_cours.pop(futur)
+                try:
+                    futur.result()
+                except Exception as erreur:
+                    print(f"échec       {nom} : {erreur!r}")
+                    echecs.add(nom)
+                    continue
+                manifeste["artefacts"][nom] = {
+                    "empreinte": futur.empreinte,
+                    "date": datetime.datetime.now().isoformat(timespec="seconds"),
+                }
+                ecrire_manifeste(manifeste)
+                print(f"construit   {nom}")
+                termines.add(nom)
+    ecrire_manifeste(manifeste)
+    manquantes = sum(1 for nom in echecs if etat(nom, toutes[nom], manifeste)[0] == "manquant")
+    return len(echecs) - manquantes
+
+
+def lister():
+    manifeste = lire_manifeste()
+    for nom, regle in regles().items():
+        statut, detail = etat(nom, regle, manifeste)
+        libelle = {"a_jour": "à jour", "a_construire": "à construire", "manquant": "entrées absentes"}[statut]
+        print(f"{libelle:<17} {nom}" + (f" ({', '.join(detail)})" if statut == "manquant" else ""))
+    print("\nNon reproductibles depuis le dépôt :")
+    for motif, raison in NON_REPRODUCTIBLES.items():
+        print(f"  {motif} : {raison}")
+    ecrire_manifeste(manifeste)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconstruction des artefacts dérivés du dashboard")
+    parser.add_argument("artefacts", nargs="*", help="artefacts à construire (tous par défaut)")
+    parser.add_argument("--processus", type=int, default=None, help="taille du pool (nombre de cœurs par défaut)")
+    parser.add_argument("--force", action="store_true", help="reconstruire même à jour")
+    parser.add_argument("--liste", action="store_true", help="afficher l'état des artefacts sans rien construire")
+    arguments = parser.parse_args()
+    # Les chemins des règles sont relatifs au dossier du dashboard
+    os.chdir(DOSSIER_DASHBOARD)
+    if arguments.liste:
+        lister()
+        return
+    if construire(arguments.artefacts, arguments.processus, arguments.force):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,364 @@
+"""
+Banc d'essai des pages de carte.py, sans navigateur.
+
+Chaque page est pilotée par AppTest (Streamlit) sur des combinaisons de
+widgets représentatives : toutes les élections, années, tours, niveaux et
+départements proposés. Pour chaque réexécution du script on mesure :
+
+- la durée ;
+- le pic de mémoire résidente du processus pendant la réexécution ;
+- le nombre de figures matplotlib créées ;
+- les octets envoyés au navigateur (messages d'affichage et fichiers médias).
+
+Les mesures peuvent être enregistrées comme référence puis comparées à une
+référence existante, pour repérer une régression avant un déploiement et
+classer les pages à optimiser en priorité.
+
+Usage :
+    python benchmark.py                               # mesure et classement des pages
+    python benchmark.py --pages Abstention --froid    # pages filtrées, caches vidés avant chaque page
+    python benchmark.py --enregistrer reference.json
+    python benchmark.py --comparer reference.json     # code de sortie 1 en cas de régression
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import resource
+import statistics
+import sys
+import time
+from contextlib import contextmanager
+
+import matplotlib
+matplotlib.use("Agg")
+from matplotlib.figure import Figure
+import streamlit as st
+from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+from streamlit.testing.v1 import AppTest
+from streamlit.testing.v1 import local_script_runner
+
+# Les pages sont mesurées sans le préchargement en arrière-plan, qui fausserait durées et mémoire
+os.environ["PRECHARGEMENT"] = "0"
+
+DOSSIER = os.path.dirname(os.path.abspath(__file__))
+SCRIPT = os.path.join(DOSSIER, "carte.py")
+
+# Délai maximal d'une réexécution (secondes)
+DELAI = 300
+
+# Écarts tolérés avant de signaler une régression
+TOLERANCE = 0.25
+MARGE_TEMPS = 0.05
+MARGE_RSS_KO = 20 * 1024
+
+
+def codes_revenus():
+    """Valeurs brutes de la liste des départements de la page revenu (affichée via format_func)."""
+    from donnees import charger_revenus_departements
+    return list(charger_revenus_departements(os.path.join(DOSSIER, 'departements_pauvrete.csv')).codes)
+
+
+# Parcours de chaque page : listes d'axes (type de widget, libellé, valeurs).
+# Les axes d'un parcours sont croisés ; sans valeurs explicites on prend toutes
+# les options affichées par le widget (une par une pour un multiselect).
+PARCOURS = {
+    "Présentation": [[]],
+    "Résultat des élections": [[
+        ("radio", "Type d'élection", None),
+        ("selectbox", "Année", None),
+        ("selectbox", "Tour", None),
+        ("selectbox", "Niveau", None),
+    ]],
+    "Analyse globale de la population française": [
+        [("selectbox", "Choisissez une année", None)],
+        [("selectbox", "Choisissez l'année", None)],
+    ],
+    "Analyse sur le chomage": [[("selectbox", "Année", None)]],
+    "Analyse sur le revenu": [
+        [("selectbox", "Sélectionnez le département à analyser :", codes_revenus)],
+        [("radio", "Choisissez le type de carte :", None), ("radio", "Choisissez l'année :", None)],
+    ],
+    "Cas de la Haute-Garonne": [[("radio", "Choisissez le type de carte :", None)]],
+    "Analyse Générale de l'Abstention Électorale": [
+        [("selectbox", "Sélectionnez une élection", None)],
+        [("multiselect", "Sélectionnez un ou plusieurs départements", None)],
+        [("text_input", "Rechercher une commune (optionnel)", ["a", "saint", "sur mer"])],
+    ],
+    "Analyse Approfondie de l'Abstention et de ses Liens Socio-économiques": [
+        [("selectbox", "Choisissez une année pour l'analyse Abstention/Pauvreté  :", None)],
+        [("multiselect", "Sélectionnez les années d'analyse Abstention/chômage:", None)],
+        [("selectbox", "Choisissez une année pour l'analyse Abstention/Categorie d'age :", None)],
+    ],
+    "Résultat sur le vote et audiovisuel": [[
+        ("selectbox", "Choisir l'Annee", None),
+        ("radio", "Choisir la métrique", None),
+    ]],
+}
+
+
+###############
+# INSTRUMENTS #
+###############
+
+def remettre_pic_rss():
+    """Remet à zéro le pic de mémoire résidente (VmHWM) du processus, si le noyau le permet."""
+    try:
+        with open("/proc/self/clear_refs", "w") as fichier:
+            fichier.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def pic_rss_ko():
+    try:
+        with open("/proc/self/status") as fichier:
+            for ligne in fichier:
+                if ligne.startswith("VmHWM:"):
+                    return int(ligne.split()[1])
+    except OSError:
+        pass
+    # Pic depuis le démarrage du processus, à défaut (Ko sous Linux)
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+@contextmanager
+def instrumenter(compteurs):
+    """Compte les figures matplotlib créées et les octets émis par les réexécutions AppTest."""
+    init_figure = Figure.__init__
+    analyser = local_script_runner.parse_tree_from_messages
+    charger_media = MemoryMediaFileStorage.load_and_get_id
+
+    def compter_figure(figure, *args, **kwargs):
+        compteurs["figures"] += 1
+        init_figure(figure, *args, **kwargs)
+
+    def compter_messages(messages):
+        compteurs["octets_messages"] += sum(message.ByteSize() for message in messages)
+        return analyser(messages)
+
+    def compter_media(stockage, donnees, *args, **kwargs):
+        taille = os.path.getsize(donnees) if isinstance(donnees, str) else len(donnees)
+        compteurs["octets_medias"] += taille
+        return charger_media(stockage, donnees, *args, **kwargs)
+
+    Figure.__init__ = compter_figure
+    local_script_runner.parse_tree_from_messages = compter_messages
+    MemoryMediaFileStorage.load_and_get_id = compter_media
+    try:
+        yield
+    finally:
+        Figure.__init__ = init_figure
+        local_script_runner.parse_tree_from_messages = analyser
+        MemoryMediaFileStorage.load_and_get_id = charger_media
+
+
+def vider_caches():
+    """Vide les caches partagés entre sessions, pour mesurer une page à froid."""
+    st.cache_resource.clear()
+    st.cache_data.clear()
+    for module, cache in (("graphiques", "cache_images"), ("ressources", "cache_html")):
+        if module in sys.modules:
+            getattr(sys.modules[module], cache).vider()
+
+
+##########
+# MESURE #
+##########
+
+def trouver(at, type_widget, libelle):
+    for widget in at.get(type_widget):
+        if widget.label == libelle:
+            return widget
+    return None
+
+
+def cle(page, combinaison):
+    return page + " | " + "; ".join(f"{libelle}={valeur}" for libelle, valeur in combinaison.items())
+
+
+class Banc:
+    """Exécute les parcours et accumule une mesure par réexécution."""
+
+    def __init__(self):
+        self.mesures = []
+
+    def mesurer(self, at, page, combinaison):
+        compteurs = {"figures": 0, "octets_messages": 0, "octets_medias": 0}
+        remettre_pic_rss()
+        with instrumenter(compteurs):
+            debut = time.perf_counter()
+            at.run()
+            duree = time.perf_counter() - debut
+        mesure = {
+            "cle": cle(page, combinaison),
+            "page": page,
+            "temps_s": round(duree, 4),
+            "pic_rss_ko": pic_rss_ko(),
+            **compteurs,
+            "erreur": [e.message for e in at.exception][:1] or None,
+        }
+        self.mesures.append(mesure)
+        etat = "EXC" if mesure["erreur"] else "ok "
+        print(f"{etat} {duree:7.3f}s {compteurs['figures']:3d} fig. "
+              f"{(compteurs['octets_messages'] + compteurs['octets_medias']) / 1024:9.1f} Ko  {mesure['cle']}")
+
+    def parcourir(self, at, page, axes, combinaison):
+        if not axes:
+            return
+        type_widget, libelle, valeurs = axes[0]
+        widget = trouver(at, type_widget, libelle)
+        if widget is None:
+            # Widget absent dans cet état de la page (le niveau n'existe que pour les législatives)
+            self.parcourir(at, page, axes[1:], combinaison)
+            return
+        if callable(valeurs):
+            valeurs = valeurs()
+        elif valeurs is None:
+            valeurs = [[option] for option in widget.options] if type_widget == "multiselect" else widget.options
+        for valeur in valeurs:
+            trouver(at, type_widget, libelle).set_value(valeur)
+            suite = {**combinaison, libelle: valeur}
+            self.mesurer(at, page, suite)
+            self.parcourir(at, page, axes[1:], suite)
+
+    def executer(self, pages, froid=False):
+        for page, parcours in PARCOURS.items():
+            if pages and not any(filtre.lower() in page.lower() for filtre in pages):
+                continue
+            if froid:
+                vider_caches()
+            for numero, axes in enumerate(parcours):
+                at = AppTest.from_file(SCRIPT, default_timeout=DELAI)
+                at.run()
+                at.sidebar.radio[0].set_value(page)
+                # L'arrivée sur la page n'est mesurée qu'une fois par page
+                if numero == 0:
+                    self.mesurer(at, page, {})
+                else:
+                    at.run()
+                self.parcourir(at, page, axes, {})
+
+
+#############
+# RESULTATS #
+#############
+
+def agreger(mesures):
+    """Une mesure par clé : temps minimal sur les répétitions, maxima des autres grandeurs."""
+    par_cle = {}
+    for mesure in mesures:
+        if mesure["cle"] not in par_cle:
+            par_cle[mesure["cle"]] = dict(mesure)
+            continue
+        actuelle = par_cle[mesure["cle"]]
+        actuelle["temps_s"] = min(actuelle["temps_s"], mesure["temps_s"])
+        for grandeur in ("pic_rss_ko", "figures", "octets_messages", "octets_medias"):
+            actuelle[grandeur] = max(actuelle[grandeur], mesure[grandeur])
+        actuelle["erreur"] = actuelle["erreur"] or mesure["erreur"]
+    return par_cle
+
+
+def classement(par_cle):
+    """Pages par temps total décroissant, avec les autres grandeurs."""
+    pages = {}
+    for mesure in par_cle.values():
+        pages.setdefault(mesure["page"], []).append(mesure)
+    lignes = []
+    for page, mesures in pages.items():
+        temps = [m["temps_s"] for m in mesures]
+        lignes.append({
+            "page": page,
+            "reexecutions": len(mesures),
+            "temps_total_s": sum(temps),
+            "temps_median_s": statistics.median(temps),
+            "temps_max_s": max(temps),
+            "pic_rss_mo": max(m["pic_rss_ko"] for m in mesures) / 1024,
+            "figures": sum(m["figures"] for m in mesures),
+            "octets_mo": sum(m["octets_messages"] + m["octets_medias"] for m in mesures) / 1024 ** 2,
+            "erreurs": sum(bool(m["erreur"]) for m in mesures),
+        })
+    return sorted(lignes, key=lambda ligne: -ligne["temps_total_s"])
+
+
+def afficher_classement(lignes):
+    print(f"\n{'page':<45} {'n':>4} {'total':>8} {'médiane':>8} {'max':>8} {'RSS Mo':>7} {'fig.':>5} {'Mo env.':>8} {'err.':>4}")
+    for ligne in lignes:
+        print(f"{ligne['page'][:45]:<45} {ligne['reexecutions']:4d} {ligne['temps_total_s']:7.2f}s "
+              f"{ligne['temps_median_s']:7.3f}s {ligne['temps_max_s']:7.3f}s {ligne['pic_rss_mo']:7.0f} "
+              f"{ligne['figures']:5d} {ligne['octets_mo']:8.2f} {ligne['erreurs']:4d}")
+
+
+def comparer(par_cle, reference, tolerance=TOLERANCE):
+    """Régressions par rapport à une référence : liste de (clé, grandeur, référence, mesure)."""
+    regressions = []
+    for cle_mesure, mesure in par_cle.items():
+        ancienne = reference.get(cle_mesure)
+        if ancienne is None:
+            continue
+        if mesure["temps_s"] > ancienne["temps_s"] * (1 + tolerance) + MARGE_TEMPS:
+            regressions.append((cle_mesure, "temps_s", ancienne["temps_s"], mesure["temps_s"]))
+        if mesure["pic_rss_ko"] > ancienne["pic_rss_ko"] * (1 + tolerance) + MARGE_RSS_KO:
+            regressions.append((cle_mesure, "pic_rss_ko", ancienne["pic_rss_ko"], mesure["pic_rss_ko"]))
+        if mesure["figures"] > ancienne["figures"]:
+            regressions.append((cle_mesure, "figures", ancienne["figures"], mesure["figures"]))
+        for grandeur in ("octets_messages", "octets_medias"):
+            if mesure[grandeur] > ancienne[grandeur] * (1 + tolerance) + 1024:
+                regressions.append((cle_mesure, grandeur, ancienne[grandeur], mesure[grandeur]))
+        if mesure["erreur"] and not ancienne["erreur"]:
+            regressions.append((cle_mesure, "erreur", None, mesure["erreur"][0]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Banc d'essai des pages de carte.py")
+    parser.add_argument("--pages", nargs="*", default=[], help="filtres sur le titre des pages")
+    parser.add_argument("--repetitions", type=int, default=1, help="passages complets (on garde le temps minimal)")
+    parser.add_argument("--froid", action="store_true", help="vider les caches partagés avant chaque page")
+    parser.add_argument("--enregistrer", metavar="FICHIER", help="enregistrer les mesures comme référence")
+    parser.add_argument("--comparer", metavar="FICHIER", help="comparer à une référence enregistrée")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="écart relatif toléré (0.25 = 25 %%)")
+    arguments = parser.parse_args()
+
+    # Les chemins des fichiers de données sont relatifs au dossier de l'application
+    os.chdir(DOSSIER)
+    banc = Banc()
+    for _ in range(arguments.repetitions):
+        banc.executer(arguments.pages, arguments.froid)
+    par_cle = agreger(banc.mesures)
+    afficher_classement(classement(par_cle))
+    # La première visite d'une page dépend des caches déjà remplis : on ne compare
+    # que des mesures prises avec les mêmes options
+    options = {"pages": arguments.pages, "repetitions": arguments.repetitions, "froid": arguments.froid}
+
+    if arguments.enregistrer:
+        with open(arguments.enregistrer, "w", encoding="utf-8") as fichier:
+            json.dump({
+                "date": datetime.datetime.now().isoformat(timespec="seconds"),
+                "machine": platform.node(),
+                "python": platform.python_version(),
+                "streamlit": st.__version__,
+                "options": options,
+                "mesures": list(par_cle.values()),
+            }, fichier, ensure_ascii=False, indent=1)
+        print(f"\n{len(par_cle)} mesures enregistrées dans {arguments.enregistrer}")
+
+    if arguments.comparer:
+        with open(arguments.comparer, encoding="utf-8") as fichier:
+            contenu = json.load(fichier)
+        if contenu.get("options") != options:
+            print(f"\nAttention : référence mesurée avec d'autres options ({contenu.get('options')})")
+        reference = {mesure["cle"]: mesure for mesure in contenu["mesures"]}
+        regressions = comparer(par_cle, reference, arguments.tolerance)
+        communes = len(set(par_cle) & set(reference))
+        print(f"\n{communes} combinaisons comparées à {arguments.comparer}, {len(regressions)} régression(s)")
+        for cle_mesure, grandeur, avant, apres in regressions:
+            print(f"  {grandeur:<16} {avant!s:>12} -> {apres!s:<12} {cle_mesure}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,16 @@
+import functools
+import importlib
+
 import streamlit as st
-import os
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-import plotly.graph_objs as go
-import plotly.express as px
 import numpy as np
+from agregats import (CubeBarometre, abstention_premiers_tours, apparitions, classement_departements, construire_cube_abstention,
+                      jointure_ages_abstention, moyennes_communales, panel_chomage_abstention, statistiques_panel)
+from donnees import (charger_barometre_ina, charger_candidats_circonscriptions, charger_chomage, charger_demographie,
+                     charger_elections, charger_historique_candidats, charger_pauvrete, charger_revenus_departements, figer)
+from profilage import etape, modes_demandes, nouveau_profil
+from recherche import IndexCommunes, saisie_vide
+from ressources import lire_html, url_carte
 
 # Configuration de la page
 st.set_page_config(
@@ -144,55 +149,337 @@ def apply_custom_design():
 
 
 
+# Les jeux de données sont chargés une fois par processus (st.cache_resource) et partagés, sans copie, par
+# toutes les sessions : figer() les rend non modifiables en place, les pages n'en dérivent que des vues ou
+# de nouveaux objets. Les colonnes dérivées (codes normalisés, pourcentages) sont calculées au chargement.
+# Les élections et les tables départementales sont lues depuis cache/ (construit par `python donnees.py`),
+# projetées en mémoire : plusieurs processus du serveur partagent alors les mêmes pages physiques.
+
+# Charger les données de chômage
+@etape("chargement load_unemployment_data")
+@st.cache_resource
 def load_unemployment_data():
     try:
-        return pd.read_csv('taux_chomage_par_departement.csv')
+        return figer(charger_chomage('taux_chomage_par_departement.csv'))
     except FileNotFoundError:
         st.error("Fichier 'taux_chomage_par_departement.csv' introuvable. Veuillez le placer dans le même répertoire que le script.")
         return pd.DataFrame()
 
 # Charger les données démographiques
-@st.cache_data
+@etape("chargement load_demographic_data")
+@st.cache_resource
 def load_demographic_data():
     try:
-        return pd.read_csv('donnees_2017_2022.csv')
+        return figer(charger_demographie('df_age.csv'))
     except FileNotFoundError:
-        st.error("Fichier 'donnees_2017_2022.csv' introuvable. Veuillez le placer dans le même répertoire que le script.")
+        st.error("Fichier 'df_age.csv' introuvable. Veuillez le placer dans le même répertoire que le script.")
         return pd.DataFrame()
 
 # Charger les données principales
-@st.cache_data
+@etape("chargement load_data")
+@st.cache_resource
 def load_data():
     try:
-        return pd.read_csv('data_elections.csv', low_memory=False)
+        # Colonnes typées projetées en mémoire, régénérées si le CSV change
+        return figer(charger_elections('data_elections.csv'))
     except FileNotFoundError:
         st.error("Fichier 'data_elections.csv' introuvable. Assurez-vous qu'il est dans le même répertoire que le script.")
         return pd.DataFrame()
 
+# Proportions par tranche d'âge jointes à l'abstention pondérée des premiers tours, toutes années, par département
+@etape("chargement load_age_abstention")
+@st.cache_resource
+def load_age_abstention():
+    demographic_data = load_demographic_data()
+    if demographic_data.empty or load_data().empty:
+        return pd.DataFrame()
+    return figer(jointure_ages_abstention(demographic_data, abstention_premiers_tours(load_abstention_cube())))
+
+# Panel chômage x abstention des premiers tours (département, année, élection), toutes années, calculé une seule fois
+@etape("chargement load_unemployment_panel")
+@st.cache_resource
+def load_unemployment_panel():
+    unemployment_data = load_unemployment_data()
+    if unemployment_data.empty or load_data().empty:
+        return pd.DataFrame()
+    return figer(panel_chomage_abstention(unemployment_data, load_abstention_cube()))
+
+# Corrélations de tous les indicateurs départementaux avec tous les résultats électoraux (Pearson, Spearman,
+# intervalles bootstrap), calculées une seule fois par processus
+@etape("chargement load_correlations")
+@st.cache_resource
+def load_correlations():
+    from cartographie import charger_bords
+    from correlations import MatriceCorrelations, indicateurs_departements, resultats_departements
+    try:
+        political_sides = charger_bords()
+    except FileNotFoundError:
+        political_sides = None
+    indicators = indicateurs_departements(load_poverty_data(), load_unemployment_data(), load_demographic_data(),
+                                          load_revenue_store())
+    results = resultats_departements(None if load_data().empty else load_abstention_cube(), load_candidates_data(),
+                                     political_sides)
+    if indicators.empty or results.empty:
+        return None
+    return MatriceCorrelations(indicators, results)
+
+# Cube (élection, département) des effectifs et pourcentages, calculé une seule fois pour les pages d'abstention
+@etape("chargement load_abstention_cube")
+@st.cache_resource
+def load_abstention_cube():
+    return figer(construire_cube_abstention(load_data()))
+
+# Rang de chaque département dans chaque élection (taux d'abstention), calculé une seule fois
+@etape("chargement load_abstention_ranking")
+@st.cache_resource
+def load_abstention_ranking():
+    return figer(classement_departements(load_abstention_cube()))
+
+# Index de recherche des communes (accents, casse, tirets, Saint/St), construit une fois par processus
+@etape("chargement load_commune_index")
+@st.cache_resource
+def load_commune_index():
+    return IndexCommunes(load_data()['Libellé de la commune'])
+
+# Revenus et QPV par département, en tableaux indexés (lecture seule, partagés entre les sessions)
+@etape("chargement load_revenue_store")
+@st.cache_resource
+def load_revenue_store():
+    try:
+        return charger_revenus_departements('departements_pauvrete.csv')
+    except FileNotFoundError:
+        st.error("Fichier 'departements_pauvrete.csv' introuvable. Veuillez le placer dans le même répertoire que le script.")
+        return None
+
+# Historique des candidats 2002-2024 (lecture seule, partagé entre les sessions)
+@etape("chargement load_candidates_history")
+@st.cache_resource
+def load_candidates_history():
+    try:
+        return charger_historique_candidats('df_all_export.csv')
+    except FileNotFoundError:
+        st.error("Fichier 'df_all_export.csv' introuvable. Veuillez le placer dans le même répertoire que le script.")
+        return None
+
+# Baromètre thématique des JT compilé en cube (lecture seule, partagé entre les sessions)
+@etape("chargement load_tv_barometer")
+@st.cache_resource
+def load_tv_barometer():
+    try:
+        return CubeBarometre(charger_barometre_ina('ina-barometre-jt-tv-donnee-mois-theme-2000-2020.csv'))
+    except FileNotFoundError:
+        st.error("Fichier 'ina-barometre-jt-tv-donnee-mois-theme-2000-2020.csv' introuvable. Veuillez le placer dans le même répertoire que le script.")
+        return None
+
 # Charger les données de pauvreté
-@st.cache_data
+@etape("chargement load_poverty_data")
+@st.cache_resource
 def load_poverty_data():
     try:
-        return pd.read_csv('moyenne_pauvrete_par_departement.csv')
+        return figer(charger_pauvrete('moyenne_pauvrete_par_departement.csv'))
     except FileNotFoundError:
         st.error("Fichier 'moyenne_pauvrete_par_departement.csv' introuvable. Veuillez le placer dans le même répertoire que le script.")
         return pd.DataFrame()
 
-# Charger les données principales
-df = load_data()
+# Charger les résultats des législatives par circonscription (un candidat par ligne)
+@etape("chargement load_candidates_data")
+@st.cache_resource
+def load_candidates_data():
+    try:
+        return figer(charger_candidats_circonscriptions())
+    except FileNotFoundError as e:
+        st.error(f"Fichier '{e.filename}' introuvable. Veuillez le placer dans le même répertoire que le script.")
+        return pd.DataFrame()
+
+# Charger les résultats des partis par tranche de pauvreté (Haute-Garonne)
+@etape("chargement load_party_results_data")
+@st.cache_resource
+def load_party_results_data():
+    return figer(pd.read_csv('resultats_graphiques_partis.csv'))
+
+# Charger les votes 2024 et 2022 joints aux caractéristiques des communes
+@etape("chargement load_votes_data_2024")
+@st.cache_resource
+def load_votes_data_2024():
+    try:
+        return figer(pd.read_csv('df_jointure_2024.csv'))
+    except FileNotFoundError:
+        st.error("Fichier 'df_jointure_2024.csv' introuvable. Assurez-vous qu'il est dans le même répertoire que le script.")
+        return pd.DataFrame()
+
+@etape("chargement load_votes_data_2022")
+@st.cache_resource
+def load_votes_data_2022():
+    try:
+        return figer(pd.read_csv('df_jointure_2022.csv'))
+    except FileNotFoundError:
+        st.error("Fichier 'df_jointure_2022.csv' introuvable. Assurez-vous qu'il est dans le même répertoire que le script.")
+        return pd.DataFrame()
+
+# Charger le fichier démographique tel quel (page de la population)
+@etape("chargement load_demographics_data")
+@st.cache_resource
+def load_demographics_data():
+    try:
+        return figer(pd.read_csv('df_age.csv'))
+    except FileNotFoundError:
+        st.error("Fichier 'df_age.csv' introuvable. Assurez-vous qu'il est dans le même répertoire que le script.")
+        return pd.DataFrame()
+
+# Carte HTML affichée par défaut sur la page des résultats, mise dans le cache des cartes (sauf en mode URL)
+DEFAULT_ELECTION_MAP = "resultats_electoraux_interactifs_2017_T1.html"
+
+def load_default_election_map():
+    return lire_html(DEFAULT_ELECTION_MAP) if url_carte(DEFAULT_ELECTION_MAP) is None else ""
 
-if df.empty:
-    st.stop()
+# Carte des nuances arrivées en tête, construite à la volée : les contours sont partagés, seules les valeurs changent
+def display_results_map(id_election, layer="departements"):
+    from cartographie import carte_resultats
+    candidates = load_candidates_data()
+    if candidates.empty:
+        return
+    try:
+        with etape("carte résultats"):
+            fig, missing_shapes = carte_resultats(candidates, id_election, layer)
+    except FileNotFoundError:
+        st.error("Les contours de la carte sont introuvables (lancer 'python cartographie.py').")
+        return
+    st.plotly_chart(fig)
+    if missing_shapes:
+        st.caption(f"Zones sans contour disponible, non représentées : {', '.join(missing_shapes)}.")
+
+# Fonction pour charger et afficher un fichier HTML (pour les maps interactives)
+def display_map_from_html(html_file, height=600, width=None, scrolling=True):
+    try:
+        # Mode fichiers statiques : le navigateur charge (et met en cache) la carte lui-même
+        url = url_carte(html_file)
+        if url is None:
+            # Sinon le contenu est lu une seule fois par processus (cache partagé entre sessions)
+            with etape("chargement carte html"):
+                map_html = lire_html(html_file)
+    except FileNotFoundError:
+        st.error("Le fichier HTML n'a pas été trouvé.")
+        return
+    if url is not None:
+        st.components.v1.iframe(url, height=height, width=width, scrolling=scrolling)
+    else:
+        st.components.v1.html(map_html, height=height, width=width, scrolling=scrolling)
+
+# Afficher un graphique matplotlib : tracé une seule fois par jeu de données, figure fermée aussitôt
+def display_chart(draw, *data):
+    from graphiques import image_graphique
+    with etape(f"graphique {draw.__name__}"):
+        image = image_graphique(draw, *data)
+    st.image(image, width="stretch")
+
+# Bouton de téléchargement d'une table, au format choisi. `table` (DataFrame ou fonction qui le renvoie) n'est
+# encodée qu'au clic, par blocs, et l'export est réutilisé tant que les sources et les filtres sont les mêmes.
+def display_download(label, table, file_stem, sources=(), **filters):
+    from exports import FORMATS, empreinte_export, formats_disponibles, ouvrir_export
+    fingerprint = empreinte_export(file_stem, sources, **filters)
+    export_format = st.selectbox("Format du fichier", formats_disponibles(), key=f"format_{file_stem}",
+                                 format_func=lambda name: FORMATS[name]['libelle'])
+    st.download_button(
+        label=label,
+        data=lambda: ouvrir_export(table, export_format, fingerprint),
+        file_name=f"{file_stem}.{FORMATS[export_format]['extension']}",
+        mime=FORMATS[export_format]['mime'],
+    )
+
+# Profil de l'exécution, demandé par le paramètre d'URL ?profil= (panneau, journal, flamme ; cumulables)
+def display_profile(profile, modes):
+    profile.terminer()
+    if "journal" in modes:
+        profile.journaliser()
+    if "panneau" in modes:
+        with st.sidebar.expander("Profil de la page", expanded=True):
+            st.metric("Durée de l'exécution", f"{1000 * profile.duree:.0f} ms")
+            categories = pd.Series(profile.par_categorie(), name="ms").sort_values(ascending=False)
+            st.dataframe(categories.round(1))
+            steps = pd.DataFrame(profile.lignes())
+            if not steps.empty:
+                steps["etape"] = ["· " * depth + name for depth, name in zip(steps["profondeur"], steps["etape"])]
+                st.dataframe(steps[["etape", "duree_ms", "propre_ms"]].round(1), hide_index=True)
+    if "flamme" in modes:
+        st.sidebar.download_button("Profil (piles repliées)", profile.pile_repliee(), file_name="profil.folded", mime="text/plain")
+
+# Modules lourds importés par certaines pages (en tête de leur bloc), que le préchargement importe d'avance
+HEAVY_MODULES = ["matplotlib.pyplot", "plotly.graph_objs"]
+
+# Registre des pages : jeux de données indispensables à chacune et chargements secondaires (cartes des
+# résultats, sections d'analyse croisée, carte HTML par défaut). Rien n'est chargé tant que la page n'est
+# pas affichée ; une fois une page affichée, les données des autres pages sont préchargées en arrière-plan
+# (voir prefetch_pages).
+PAGES = {
+    "Présentation": {"datasets": []},
+    "Résultat des élections": {"datasets": [], "prefetch": [load_default_election_map, load_candidates_data]},
+    "Analyse globale de la population française": {
+        "datasets": [],
+        "prefetch": [load_votes_data_2024, load_votes_data_2022, load_demographics_data, load_candidates_data],
+    },
+    "Analyse sur le chomage": {"datasets": [], "prefetch": [load_candidates_data]},
+    "Analyse sur le revenu": {"datasets": [load_revenue_store]},
+    "Cas de la Haute-Garonne": {"datasets": [load_party_results_data]},
+    "Analyse Générale de l'Abstention Électorale": {
+        "datasets": [load_data, load_abstention_cube, load_abstention_ranking],
+        "prefetch": [load_commune_index],
+    },
+    "Analyse Approfondie de l'Abstention et de ses Liens Socio-économiques": {
+        "datasets": [load_data, load_abstention_cube],
+        "prefetch": [load_poverty_data, load_unemployment_panel, load_age_abstention, load_correlations],
+    },
+    "Résultat sur le vote et audiovisuel": {"datasets": [load_candidates_history, load_tv_barometer]},
+}
+
+# Charger les données de la page affichée (les caches rendent les affichages suivants immédiats)
+def prepare_page(page):
+    with st.spinner("Chargement des données..."):
+        for load in PAGES[page]["datasets"]:
+            data = load()
+            # Le chargeur a déjà affiché l'erreur
+            if data is None or getattr(data, "empty", False):
+                st.stop()
+
+# Profilage à la demande (?profil=panneau), désactivé sinon
+profile_modes = modes_demandes(st.query_params.get_all("profil"))
+profile = nouveau_profil(actif=bool(profile_modes))
+
+# Préchargeur partagé par les sessions : pool de fils et fréquences de navigation du processus
+@st.cache_resource
+def load_prefetcher():
+    from prechargement import Prechargeur
+    return Prechargeur()
+
+# Tâche de préchargement d'un chargeur : en cas d'échec, son cache est vidé pour que la page recharge et
+# affiche l'erreur à sa visite (un message émis hors du fil du script n'est pas affiché)
+def prefetch_task(load):
+    def task():
+        data = load()
+        if data is None or getattr(data, "empty", False):
+            getattr(load, "__wrapped__", load).clear()
+    return task
+
+# Une fois la page affichée, précharger les modules lourds et les données des autres pages sans bloquer le script,
+# en commençant par celles le plus souvent ouvertes après la page courante
+def prefetch_pages(page):
+    prefetcher = load_prefetcher()
+    if not prefetcher.actif:
+        return
+    previous_page = st.session_state.get("previous_page")
+    if previous_page != page:
+        prefetcher.navigation.noter(previous_page, page)
+        st.session_state["previous_page"] = page
+    tasks = [(f"import {module}", functools.partial(importlib.import_module, module)) for module in HEAVY_MODULES]
+    for next_page in prefetcher.navigation.suivantes(page, list(PAGES)):
+        declaration = PAGES[next_page]
+        tasks += [(load.__name__, prefetch_task(load)) for load in declaration["datasets"] + declaration.get("prefetch", [])]
+    prefetcher.precharger(tasks)
 
-# Convertir les colonnes numériques si nécessaire
-colonnes_a_convertir = ['Inscrits', 'Abstentions', '% Abs/Ins', 'Votants', '% Vot/Ins', 'Blancs', '% Blancs/Ins',
-                        'Nuls', '% Nuls/Ins', '% Nuls/Vot', 'Exprimés', '% Exp/Ins', '% Exp/Vot']
-for colonne in colonnes_a_convertir:
-    if colonne in df.columns:
-        df[colonne] = pd.to_numeric(df[colonne], errors='coerce')
 # Gestion de la navigation entre les pages
-page = st.sidebar.radio("", ["Présentation","Résultat des élections","Analyse globale de la population française","Analyse sur le chomage","Analyse sur le revenu","Cas de la Haute-Garonne","Analyse Générale de l'Abstention Électorale",
-"Analyse Approfondie de l'Abstention et de ses Liens Socio-économiques","Résultat sur le vote et audiovisuel"], horizontal= False)
+page = st.sidebar.radio("", list(PAGES), horizontal= False)
+if profile is not None:
+    profile.nom = page
+prepare_page(page)
 
 # Dictionnaire pour mapper les ID d'élections aux noms complets
 id_to_name = {
@@ -249,63 +536,23 @@ if page == "Résultat des élections":
     annee = st.selectbox("Année", ["2017", "2022"] + (["2024"] if election_type == "Législatives" else []))
     tour = st.selectbox("Tour", ["T1", "T2"])
 
-    # Génération du nom de fichier en fonction du type d'élection
+    # Choix de la carte en fonction du type d'élection
     if election_type == "Présidentielles":
-        if annee == "2017":
-            if tour== "T1":
-                st.components.v1.html(open("resultats_electoraux_interactifs_2017_T1.html", "r", encoding="utf-8").read(), height=600, scrolling=True)
-            if tour == "T2":
-                st.components.v1.html(open("resultats_electoraux_interactifs_2017_T2.html", "r", encoding="utf-8").read(), height=600, scrolling=True)
-        if annee == "2022":
-            if tour== "T1":
-                st.components.v1.html(open("resultats_electoraux_interactifs_2022_T1.html", "r", encoding="utf-8").read(), height=600, scrolling=True)
-            if tour == "T2":
-                st.components.v1.html(open("resultats_electoraux_interactifs_2022_T2.html", "r", encoding="utf-8").read(), height=600, scrolling=True)
+        display_map_from_html(f"resultats_electoraux_interactifs_{annee}_{tour}.html")
     if election_type == "Législatives":
-        niveau = st.selectbox("Niveau", ["Circonscription", "Département"])
-        if niveau =="Circonscription":
-            if annee == "2017":
-                if tour== "T1":
-                    st.components.v1.html(open("res_2017_T1_circo_circo.html", "r", encoding="utf-8").read(), height=600, scrolling=True)
-                if tour == "T2":
-                    st.components.v1.html(open("res_2017_T2_circo_circo.html", "r", encoding="utf-8").read(), height=600, scrolling=True)
-            if annee == "2022":
-                if tour== "T1":
-                    st.components.v1.html(open("res_2022_T1_circo_circo.html", "r", encoding="utf-8").read(), height=600, scrolling=True)
-                if tour == "T2":
-                    st.components.v1.html(open("res_2022_T2_circo_circo.html", "r", encoding="utf-8").read(), height=600, scrolling=True)
-            if annee == "2024":
-                if tour== "T1":
-                    st.components.v1.html(open("res_2024_T2_circo_circo.html", "r", encoding="utf-8").read(), height=600, scrolling=True)
-                if tour == "T2":
-                    st.components.v1.html(open("res_2024_T2_circo_circo.html", "r", encoding="utf-8").read(), height=600, scrolling=True)
-        if niveau =="Département":
-            if annee == "2017":
-                if tour== "T1":
-                    st.components.v1.html(open("res_2017_T1_dept.html", "r", encoding="utf-8").read(), height=600, scrolling=True)
-                if tour == "T2":
-                    st.components.v1.html(open("res_2017_T2_dept.html", "r", encoding="utf-8").read(), height=600, scrolling=True)
-            if annee == "2022":
-                if tour== "T1":
-                    st.components.v1.html(open("res_2022_T1_dept.html", "r", encoding="utf-8").read(), height=600, scrolling=True)
-                if tour == "T2":
-                    st.components.v1.html(open("res_2022_T2_dept.html", "r", encoding="utf-8").read(), height=600, scrolling=True)
-            if annee == "2024":
-                if tour== "T1":
-                    st.components.v1.html(open("res_2024_T1_dept.html", "r", encoding="utf-8").read(), height=600, scrolling=True)
-                if tour == "T2":
-                    st.components.v1.html(open("res_2024_T2_dept.html", "r", encoding="utf-8").read(), height=600, scrolling=True)
+        # Seuls les contours des circonscriptions de la Haute-Garonne sont disponibles
+        niveau = st.selectbox("Niveau", ["Département", "Circonscription (Haute-Garonne)"])
+        # Les cartes des législatives sont construites à partir des résultats par circonscription
+        layer = "circonscriptions" if niveau.startswith("Circonscription") else "departements"
+        display_results_map(f"{annee}_legi_{tour.lower()}", layer)
         # Ajout d'images pour les législatives
         st.image("voteevol.png", caption="Evolution du vote au fil des années",width=600)
         st.image("piechart.png", caption="répartition des votes pour le premier tour")
-        if file_name:
-            st.components.v1.html(open(file_name, "r", encoding="utf-8").read(), height=600, scrolling=True)
-            # Affichage du texte contextuel basé sur l'année et le tour
-        if election_type == "Législatives":
-            st.markdown(f"**Analyse des résultats pour le {tour.lower().replace('t', 'tour ')} de l'année {annee} :**")
-            st.markdown("Ces cartes montrent le résultat des élections législatives depuis l'élection de M.Macron en 2017.")
-            if tour == "T2":
-                st.markdown("De plus, si un département ou une circonscription manque sur le Tour 2 c'est qu'il a gagné au Tour 1.")
+        # Affichage du texte contextuel basé sur l'année et le tour
+        st.markdown(f"**Analyse des résultats pour le {tour.lower().replace('t', 'tour ')} de l'année {annee} :**")
+        st.markdown("Ces cartes montrent le résultat des élections législatives depuis l'élection de M.Macron en 2017.")
+        if tour == "T2":
+            st.markdown("De plus, si un département ou une circonscription manque sur le Tour 2 c'est qu'il a gagné au Tour 1.")
     
 if page == "Analyse sur le chomage":
     st.title("Analyse sur le chomage")
@@ -320,40 +567,32 @@ if page == "Analyse sur le chomage":
             st.image("Carte_classes_taux_chom.png", caption="")
             st.image("repartition_vote_classe_taux_chom.png", caption="")
         with col2:
-            st.components.v1.html(open("res_2017_T1_dept.html", "r", encoding="utf-8").read(), height=600, scrolling=True)
+            display_results_map("2017_legi_t1")
     if annee == "2022":
         with col1:
             st.image("Carte_classes_taux_chom_2022.png", caption="")
             st.image("repartition_vote_classe_taux_chom_2022.png", caption="")
         with col2:
-            st.components.v1.html(open("res_2022_T1_dept.html", "r", encoding="utf-8").read(), height=600, scrolling=True)
+            display_results_map("2022_legi_t1")
     if annee == "2024":
         with col1:
             st.image("Carte_classes_taux_chom_2024.png", caption="")
             st.image("repartition_vote_classe_taux_chom_2024.png", caption="")
         with col2:
-            st.components.v1.html(open("res_2024_T1_dept.html", "r", encoding="utf-8").read(), height=600, scrolling=True)
+            display_results_map("2024_legi_t1")
     
 
 if page == "Analyse sur le revenu":
-        # Liste permettant l'affichage des graphiques
-    annees = ["2017", "2018", "2019", "2020", "2021"]
-    deciles = ["1", "2", "3", "7", "8", "9"]
-    
-    # Fonction pour charger et afficher un fichier HTML (pour les maps interactives)
-    def display_map_from_html(html_file):
-        # Vérifier si le fichier existe
-        if os.path.exists(html_file):
-            # Charger le fichier HTML
-            with open(html_file, "r",encoding="utf-8") as file:
-                map_html = file.read()
-            # Afficher le fichier HTML dans Streamlit
-            st.components.v1.html(map_html, height=500, width=700)
-        else:
-            st.error("Le fichier HTML n'a pas été trouvé.")
-    
-    # Récupération du DataFrame permettant d'obtenir les graphiques
-    df_data_departements = pd.read_csv("departements_pauvrete.csv")
+    with etape("import matplotlib.pyplot"):
+        import matplotlib.pyplot as plt
+    # Données indexées par département, lues une seule fois
+    revenue_store = load_revenue_store()
+    if revenue_store is None:
+        st.stop()
+
+    # Liste permettant l'affichage des graphiques
+    annees = revenue_store.annees
+    deciles = revenue_store.deciles
     
     # Titre de la page
     st.title("Analyse de la pauvreté par département")
@@ -365,8 +604,8 @@ if page == "Analyse sur le revenu":
     
     # Liste déroulante pour choisir un département
     dept_options = {
-        row["dept"]: f"{row['dept']} - {row['lib_dept']}"
-        for _, row in df_data_departements.iterrows()
+        code: f"{code} - {libelle}"
+        for code, libelle in zip(revenue_store.codes, revenue_store.libelles)
     }
     
     # Liste déroulante affichant le nom complet, mais retournant uniquement le numéro du département
@@ -381,50 +620,17 @@ if page == "Analyse sur le revenu":
     # LES DONNEES #
     ###############
     
-    # Filtrer les données pour le département sélectionné
-    filtered_data = df_data_departements[df_data_departements['dept'] == selected_dept]
-    
-    # Récupérer le nombre de qpv pour ce département
-    y_nbr_qpv = [filtered_data['nb_qpv_2017'].values[0], filtered_data['nb_qpv_2018'].values[0], filtered_data['nb_qpv_2019'].values[0],
-        filtered_data['nb_qpv_2020'].values[0],
-        filtered_data['nb_qpv_2021'].values[0]]
-        
-    # Les données pour les différents déciles
-    # 1er décile
-    y_decile_1 = [filtered_data['revenu_disp_d1_2017'].values[0], filtered_data['revenu_disp_d1_2018'].values[0], filtered_data['revenu_disp_d1_2019'].values[0],
-        filtered_data['revenu_disp_d1_2020'].values[0],
-        filtered_data['revenu_disp_d1_2021'].values[0]]
-        
-    # 2ème décile
-    y_decile_2 = [filtered_data['revenu_disp_d2_2017'].values[0], filtered_data['revenu_disp_d2_2018'].values[0], filtered_data['revenu_disp_d2_2019'].values[0],
-        filtered_data['revenu_disp_d2_2020'].values[0],
-        filtered_data['revenu_disp_d2_2021'].values[0]]
-    
-    # 3ème décile
-    y_decile_3 = [filtered_data['revenu_disp_d3_2017'].values[0], filtered_data['revenu_disp_d3_2018'].values[0], filtered_data['revenu_disp_d3_2019'].values[0],
-        filtered_data['revenu_disp_d3_2020'].values[0],
-        filtered_data['revenu_disp_d3_2021'].values[0]]
+    # Tranches des tableaux pour le département sélectionné
+    dept_row = revenue_store.ligne(selected_dept)
     
-    # 7ème décile
-    y_decile_7 = [filtered_data['revenu_disp_d7_2017'].values[0], filtered_data['revenu_disp_d7_2018'].values[0], filtered_data['revenu_disp_d7_2019'].values[0],
-        filtered_data['revenu_disp_d7_2020'].values[0],
-        filtered_data['revenu_disp_d7_2021'].values[0]]
-    
-    # 8ème décile
-    y_decile_8 = [filtered_data['revenu_disp_d8_2017'].values[0], filtered_data['revenu_disp_d8_2018'].values[0], filtered_data['revenu_disp_d8_2019'].values[0],
-        filtered_data['revenu_disp_d8_2020'].values[0],
-        filtered_data['revenu_disp_d8_2021'].values[0]]
-    
-    # 9ème décile
-    y_decile_9 = [filtered_data['revenu_disp_d9_2017'].values[0], filtered_data['revenu_disp_d9_2018'].values[0], filtered_data['revenu_disp_d9_2019'].values[0],
-        filtered_data['revenu_disp_d9_2020'].values[0],
-        filtered_data['revenu_disp_d9_2021'].values[0]]
+    # Nombre de qpv par année pour ce département
+    y_nbr_qpv = revenue_store.qpv[dept_row]
         
+    # Revenus disponibles par décile (une ligne par décile, une colonne par année)
+    y_deciles = revenue_store.revenus[dept_row]
         
     # Les pourcentages d'augmentation par décile au fur et à mesure des années
-    x_pourcentage = [filtered_data['pourc_augm_d1'].values[0], filtered_data['pourc_augm_d2'].values[0], filtered_data['pourc_augm_d3'].values[0],
-        filtered_data['pourc_augm_d7'].values[0],
-        filtered_data['pourc_augm_d8'].values[0], filtered_data['pourc_augm_d9'].values[0]]
+    x_pourcentage = revenue_store.augmentation[dept_row]
     
     
     
@@ -432,16 +638,36 @@ if page == "Analyse sur le revenu":
     # AFFICHAGE #
     #############
     
-    # Graphique du haut
-    with st.container():
-        st.subheader(f"Diagramme montrant le nombre de QPV étudié pour le département {selected_dept}")
+    def draw_qpv(annees, y_nbr_qpv, selected_dept):
         fig1, ax1 = plt.subplots(figsize=(10, 4))
         ax1.bar(annees, y_nbr_qpv)
         ax1.set_title(f"Nombre de QPV par année pour le département {selected_dept}")
         ax1.set_xlabel("Années")
         ax1.set_ylabel("Nombre de QPV")
+        return fig1
+
+    def draw_income_trend(annees, y_deciles, selected_dept):
+        fig2, ax2 = plt.subplots(figsize=(12, 6))
+        for y_decile in y_deciles:
+            ax2.plot(annees, y_decile)
+        ax2.set_title(f"Évolution des révenus médians par unité de consommation pour le département {selected_dept}")
+        ax2.set_xlabel("Années")
+        ax2.set_ylabel("revenus disponibles (en euros)")
+        return fig2
+
+    def draw_income_growth(deciles, x_pourcentage, selected_dept):
+        fig3, ax3 = plt.subplots(figsize=(12, 6))
+        ax3.barh(deciles, x_pourcentage)
+        ax3.set_title(f"Évolution des revenus en pourcentage pour le département {selected_dept}")
+        ax3.set_xlabel("déciles")
+        ax3.set_ylabel("Augmentation (en %)")
+        return fig3
+
+    # Graphique du haut
+    with st.container():
+        st.subheader(f"Diagramme montrant le nombre de QPV étudié pour le département {selected_dept}")
         # Afficher le graphique
-        st.pyplot(fig1)
+        display_chart(draw_qpv, annees, y_nbr_qpv, selected_dept)
     
     
     # Les deux graphiques du milieu
@@ -449,27 +675,12 @@ if page == "Analyse sur le revenu":
     with st.container():
         col1, col2 = st.columns(2)
         with col1:
-            fig2, ax2 = plt.subplots(figsize=(12, 6))
-            ax2.plot(annees, y_decile_1)
-            ax2.plot(annees, y_decile_2)
-            ax2.plot(annees, y_decile_3)
-            ax2.plot(annees, y_decile_7)
-            ax2.plot(annees, y_decile_8)
-            ax2.plot(annees, y_decile_9)
-            ax2.set_title(f"Évolution des révenus médians par unité de consommation pour le département {selected_dept}")
-            ax2.set_xlabel("Années")
-            ax2.set_ylabel("revenus disponibles (en euros)")
             # Afficher le graphique
-            st.pyplot(fig2)
+            display_chart(draw_income_trend, annees, y_deciles, selected_dept)
     
         with col2:
-            fig3, ax3 = plt.subplots(figsize=(12, 6))
-            ax3.barh(deciles, x_pourcentage)
-            ax3.set_title(f"Évolution des revenus en pourcentage pour le département {selected_dept}")
-            ax3.set_xlabel("déciles")
-            ax3.set_ylabel("Augmentation (en %)")
             # Afficher le graphique
-            st.pyplot(fig3)
+            display_chart(draw_income_growth, deciles, x_pourcentage, selected_dept)
     
     
     # Le graphique du bas
@@ -499,28 +710,26 @@ if page == "Analyse sur le revenu":
                 map_to_display = "map_revenu_departements_2021.html"  # Carte Revenu Médian 2021
     
         # Afficher la carte sélectionnée
-        display_map_from_html(map_to_display)
+        display_map_from_html(map_to_display, height=500, width=700, scrolling=False)
 
 if page == "Résultat sur le vote et audiovisuel":
-    df_all = pd.read_csv("df_all_export.csv", delimiter=';')
-    df_chaine = pd.read_csv('ina-barometre-jt-tv-donnee-mois-theme-2000-2020.csv', delimiter=';')
-    df_chaine.columns = ['Annee', 'Mois', 'Chaîne', 'PartdAudience', 'Thématique', 'Nb_Thème', 'Nb_temps']
-
+    with etape("import plotly.graph_objs"):
+        import plotly.graph_objs as go
+    # Historique des candidats partitionné par année sur disque, avec sommes par (Annee, Sexe, Nuance)
+    candidates_history = load_candidates_history()
+    if candidates_history is None:
+        st.stop()
 
-    df_chaine['Annee'] = df_chaine['Annee'].astype(int)
-    df_chaine['Nb_Thème'] = pd.to_numeric(df_chaine['Nb_Thème'], errors='coerce')
-    df_chaine['Nb_temps'] = pd.to_numeric(df_chaine['Nb_temps'], errors='coerce')
-    
-    df_chaine_transformed = df_chaine.groupby(['Annee', 'Chaîne', 'Thématique'], as_index=False).agg({
-        'Nb_Thème': 'sum',
-        'Nb_temps': 'sum'
-    })
+    # Baromètre INA compilé une seule fois en cube année x mois x chaîne x thème
+    tv_cube = load_tv_barometer()
+    if tv_cube is None:
+        st.stop()
     
     # Options disponibles
     relevant_years = [2002, 2007, 2012, 2017, 2022, 2024]
-    available_channels = df_chaine_transformed['Chaîne'].unique()
-    available_thematics = df_chaine_transformed['Thématique'].unique()
-    available_sexes = df_all['Sexe'].unique()
+    available_channels = tv_cube.chaines
+    available_thematics = tv_cube.themes
+    available_sexes = candidates_history.sexes
     
     # Interface utilisateur avec Streamlit
     st.title("Analyse des Données")
@@ -533,9 +742,7 @@ if page == "Résultat sur le vote et audiovisuel":
     
     # Graphique des élections
     st.subheader(f"Élections {selected_year} : Voix et Élus par Nuance")
-    filtered = df_all[(df_all['Annee'] == selected_year) & (df_all['Sexe'].isin(selected_sexes))]
-    grouped = filtered.groupby("Nuance").agg({"Voix": "sum", "Elu": "sum"}).reset_index()
-    grouped = grouped.sort_values("Voix", ascending=False)
+    grouped = candidates_history.voix_elus(selected_year, selected_sexes)
     
     fig_election = go.Figure()
     fig_election.add_trace(go.Bar(
@@ -561,6 +768,10 @@ if page == "Résultat sur le vote et audiovisuel":
         bargap=0.15
     )
     st.plotly_chart(fig_election)
+
+    # Candidats de l'année, lus depuis leur seule partition au clic sur le bouton
+    display_download(f"Télécharger les candidats de {selected_year}", lambda: candidates_history.partition(selected_year),
+                     f"candidats_{selected_year}", sources=('df_all_export.csv',))
     
     # Sélection des chaînes télévisées
     st.subheader("Analyse des Chaînes Télévisées")
@@ -572,16 +783,10 @@ if page == "Résultat sur le vote et audiovisuel":
     # Choix de la métrique
     selected_metric = st.radio("Choisir la métrique", ["Nb_Thème", "Nb_temps"], index=0)
     
-    # Graphique des chaînes télévisées
-    filtered = df_chaine_transformed[
-        (df_chaine_transformed['Annee'] <= selected_year) &
-        (df_chaine_transformed['Chaîne'].isin(selected_channels)) &
-        (df_chaine_transformed['Thématique'].isin(selected_thematics))
-    ]
-    
-    if not filtered.empty:
-        grouped = filtered.groupby(['Annee', 'Thématique'])[selected_metric].sum().reset_index()
+    # Graphique des chaînes télévisées : sommes annuelles lues dans le cube (NaN sans donnée)
+    grouped = tv_cube.serie_annuelle(selected_metric, selected_channels, selected_thematics, selected_year)
     
+    if grouped.notna().any(axis=None):
         fig_channel = go.Figure()
         color_map = {
             thematic: f'rgba({i*50 % 255}, {i*100 % 255}, {i*150 % 255}, 0.9)'
@@ -589,10 +794,10 @@ if page == "Résultat sur le vote et audiovisuel":
         }
     
         for thematic in selected_thematics:
-            thematic_data = grouped[grouped['Thématique'] == thematic]
+            thematic_data = grouped[thematic].dropna()
             fig_channel.add_trace(go.Scatter(
-                x=thematic_data['Annee'],
-                y=thematic_data[selected_metric],
+                x=thematic_data.index,
+                y=thematic_data.values,
                 mode='lines',
                 fill='tonexty',
                 name=thematic,
@@ -606,35 +811,32 @@ if page == "Résultat sur le vote et audiovisuel":
             plot_bgcolor="white"
         )
         st.plotly_chart(fig_channel)
+
+        # Total par thématique sur une période au mois près, lu dans les sommes cumulées du cube
+        periods = [(int(year), int(month)) for year in tv_cube.annees for month in tv_cube.mois]
+        start, end = st.select_slider("Choisir la période", options=periods, value=(periods[0], periods[-1]),
+                                      format_func=lambda period: f"{period[1]:02d}/{period[0]}")
+        totals = tv_cube.total(selected_metric, selected_channels, selected_thematics, start, end)
+        fig_period = go.Figure(go.Bar(
+            x=totals.index,
+            y=totals.values,
+            marker_color=[color_map[thematic] for thematic in totals.index]
+        ))
+        fig_period.update_layout(
+            title=f"Total des thématiques de {start[1]:02d}/{start[0]} à {end[1]:02d}/{end[0]}",
+            xaxis_title="Thématique",
+            yaxis_title="Valeur",
+            plot_bgcolor="white"
+        )
+        st.plotly_chart(fig_period)
     else:
         st.warning("Aucune donnée disponible pour les sélections actuelles.")
 
             
 if page == "Cas de la Haute-Garonne":
-    # Fonction pour charger et afficher un fichier HTML (pour les maps interactives)
-    def display_map_from_html(html_file):
-        # Vérifier si le fichier existe
-        if os.path.exists(html_file):
-            # Charger le fichier HTML
-            with open(html_file, "r",encoding="utf-8") as file:
-                map_html = file.read()
-            # Afficher le fichier HTML dans Streamlit
-            st.components.v1.html(map_html, height=500, width=700)
-        else:
-            st.error("Le fichier HTML n'a pas été trouvé.")
-            
-    def display_map_from_html2(html_file):
-        # Vérifier si le fichier existe
-        if os.path.exists(html_file):
-            # Charger le fichier HTML
-            with open(html_file, "r",encoding="utf-8") as file:
-                map_html = file.read()
-            # Afficher le fichier HTML dans Streamlit
-            st.components.v1.html(map_html, height=400, width=400)
-        else:
-            st.error("Le fichier HTML n'a pas été trouvé.")
-            
-    df_circonscription = pd.read_csv('resultats_graphiques_partis.csv')
+    with etape("import matplotlib.pyplot"):
+        import matplotlib.pyplot as plt
+    df_circonscription = load_party_results_data()
 
     # Titre de la page
     st.title("Cartes comparants la pauvreté par circonscription en Haute-Garonne aux résultats des votes durant les législatives 2022")
@@ -650,10 +852,10 @@ if page == "Cas de la Haute-Garonne":
         col1, col2 = st.columns(2)
         with col1:
             map_tour_1 = "res_2022_T1_circo_Haute_Garonne.html"
-            display_map_from_html2(map_tour_1)
+            display_map_from_html(map_tour_1, height=400, width=400, scrolling=False)
         with col2:
             map_tour_2 = "res_2022_T2_circo_Haute_Garonne.html"
-            display_map_from_html2(map_tour_2)
+            display_map_from_html(map_tour_2, height=400, width=400, scrolling=False)
 
 
     # La carte du bas
@@ -670,97 +872,114 @@ if page == "Cas de la Haute-Garonne":
             map_to_display = "map_circonscription_Haute_Garonne_revenu.html"
 
         # Afficher la carte sélectionnée
-        display_map_from_html(map_to_display)
+        display_map_from_html(map_to_display, height=500, width=700, scrolling=False)
 
 
     # Le graphique du bas
     with st.container():
         st.subheader("Graphique mettant en avant l'orientation des votes selon le taux de pauvreté présent dans la circonscription en Haute-Garonne")
 
-        fig1, ax1 = plt.subplots(figsize=(10, 4))
+        def draw_votes_by_poverty(df_circonscription):
+            fig1, ax1 = plt.subplots(figsize=(10, 4))
         
-        # Les données
-        gauche = df_circonscription['gauche'].tolist()
-        extr_gauche = df_circonscription['extr_gauche'].tolist()
-        centre = df_circonscription['centre'].tolist()
-        droite = df_circonscription['droite'].tolist()
-        extr_droite = df_circonscription['extr_droite'].tolist()
-        divers = df_circonscription['divers'].tolist()
+            # Les données
+            gauche = df_circonscription['gauche'].tolist()
+            extr_gauche = df_circonscription['extr_gauche'].tolist()
+            centre = df_circonscription['centre'].tolist()
+            droite = df_circonscription['droite'].tolist()
+            extr_droite = df_circonscription['extr_droite'].tolist()
+            divers = df_circonscription['divers'].tolist()
         
-        categories = ['< 10', '10-14', '14-18', '18-20', '> 20']
+            categories = ['< 10', '10-14', '14-18', '18-20', '> 20']
 
-        # Positions des barres
-        x = np.arange(len(categories))
+            # Positions des barres
+            x = np.arange(len(categories))
         
-        ax1.bar(x, extr_gauche, label='Extreme gauche', color='#8B0000')
-        ax1.bar(x, gauche, bottom=extr_gauche, label='Gauche', color='red')
-        ax1.bar(x, centre, bottom=np.array(extr_gauche) + np.array(gauche), label='Centre', color='yellow')
-        ax1.bar(x, droite, bottom=np.array(extr_gauche) + np.array(gauche) + np.array(centre), label='Droite', color='blue')
-        ax1.bar(x, extr_droite, bottom=np.array(extr_gauche) + np.array(gauche) + np.array(centre) + np.array(droite), label='Extreme droite', color='#00008B')
-        ax1.bar(x, divers, bottom=np.array(extr_gauche) + np.array(gauche) + np.array(centre) + np.array(droite) + np.array(extr_droite), label='Divers', color='green')
-
-        ax1.set_title("Représentation du pourcentage de votes selon le taux de pauvreté en Haute-Garonne")
-        ax1.set_xlabel("taux de pauvreté")
-        ax1.set_ylabel("pourcentage de vote")
-        ax1.legend()
-        ax1.set_xticks(x)
-        ax1.set_xticklabels(categories)
+            ax1.bar(x, extr_gauche, label='Extreme gauche', color='#8B0000')
+            ax1.bar(x, gauche, bottom=extr_gauche, label='Gauche', color='red')
+            ax1.bar(x, centre, bottom=np.array(extr_gauche) + np.array(gauche), label='Centre', color='yellow')
+            ax1.bar(x, droite, bottom=np.array(extr_gauche) + np.array(gauche) + np.array(centre), label='Droite', color='blue')
+            ax1.bar(x, extr_droite, bottom=np.array(extr_gauche) + np.array(gauche) + np.array(centre) + np.array(droite), label='Extreme droite', color='#00008B')
+            ax1.bar(x, divers, bottom=np.array(extr_gauche) + np.array(gauche) + np.array(centre) + np.array(droite) + np.array(extr_droite), label='Divers', color='green')
+
+            ax1.set_title("Représentation du pourcentage de votes selon le taux de pauvreté en Haute-Garonne")
+            ax1.set_xlabel("taux de pauvreté")
+            ax1.set_ylabel("pourcentage de vote")
+            ax1.legend()
+            ax1.set_xticks(x)
+            ax1.set_xticklabels(categories)
+            return fig1
+
         # Afficher le graphique
-        st.pyplot(fig1)
+        display_chart(draw_votes_by_poverty, df_circonscription)
 
 
 if page ==     "Analyse Générale de l'Abstention Électorale":
+    with etape("import matplotlib.pyplot"):
+        import matplotlib.pyplot as plt
     apply_custom_design()
     st.header("Tendances de l'abstention et statistiques globales ")
 
+    # Charger les données principales
+    df = load_data()
+
+    cube = load_abstention_cube()
+
     # Calculer le taux moyen d'abstention par élection
-    taux_abstention_par_election = df.groupby('id_election')['% Abs/Ins'].mean().reset_index()
+    with etape("calcul moyennes par élection"):
+        taux_abstention_par_election = moyennes_communales(cube, 'id_election')
     taux_abstention_par_election['Nom élection'] = taux_abstention_par_election['id_election'].map(id_to_name)
     # Graphique d'évolution
     st.subheader("Évolution du Taux d'Abstention par Élection")
-    fig, ax = plt.subplots(figsize=(10, 6))
-    ax.plot(
-        taux_abstention_par_election['Nom élection'],
-        taux_abstention_par_election['% Abs/Ins'],
-        marker='o',
-        linestyle='-',
-        color='skyblue',
-        linewidth=2,
-        label="Taux d'Abstention"
-    )
-    ax.set_title("Évolution du Taux d'Abstention", fontsize=18, fontweight='bold', color='darkblue')
-    ax.set_xlabel("Élections (id_election)", fontsize=14, fontweight='bold', color='gray')
-    ax.set_ylabel("Taux d'Abstention (%)", fontsize=14, fontweight='bold', color='gray')
-    ax.grid(axis='y', linestyle='--', alpha=0.7)
-    ax.legend(fontsize=12, title="Indicateur", title_fontsize=14)
-    ax.set_xticks(range(len(taux_abstention_par_election['Nom élection'])))
-    ax.set_xticklabels(taux_abstention_par_election['Nom élection'], rotation=45, ha='right')
-    ax.set_facecolor('#f7f9fc')
-    st.pyplot(fig)
+    def draw_abstention_trend(taux_abstention_par_election):
+        fig, ax = plt.subplots(figsize=(10, 6))
+        ax.plot(
+            taux_abstention_par_election['Nom élection'],
+            taux_abstention_par_election['% Abs/Ins'],
+            marker='o',
+            linestyle='-',
+            color='skyblue',
+            linewidth=2,
+            label="Taux d'Abstention"
+        )
+        ax.set_title("Évolution du Taux d'Abstention", fontsize=18, fontweight='bold', color='darkblue')
+        ax.set_xlabel("Élections (id_election)", fontsize=14, fontweight='bold', color='gray')
+        ax.set_ylabel("Taux d'Abstention (%)", fontsize=14, fontweight='bold', color='gray')
+        ax.grid(axis='y', linestyle='--', alpha=0.7)
+        ax.legend(fontsize=12, title="Indicateur", title_fontsize=14)
+        ax.set_xticks(range(len(taux_abstention_par_election['Nom élection'])))
+        ax.set_xticklabels(taux_abstention_par_election['Nom élection'], rotation=45, ha='right')
+        ax.set_facecolor('#f7f9fc')
+        return fig
+
+    display_chart(draw_abstention_trend, taux_abstention_par_election)
 
     # Calculer la variation entre les élections
     taux_abstention_par_election['Variation (%)'] = taux_abstention_par_election['% Abs/Ins'].diff()
 
     # Graphique de variations
     st.subheader("Variation du Taux d'Abstention entre Élections")
-    fig, ax = plt.subplots(figsize=(12, 6))
-    bars = ax.bar(
-        taux_abstention_par_election['Nom élection'],
-        taux_abstention_par_election['Variation (%)'].fillna(0),
-        color=['green' if val < 0 else 'red' for val in taux_abstention_par_election['Variation (%)'].fillna(0)],
-        alpha=0.8,
-        edgecolor='black'
-    )
-    ax.set_title("Variation du Taux d'Abstention Entre Chaque Élection", fontsize=18, fontweight='bold', color='darkblue')
-    ax.set_xlabel("Élections (id_election)", fontsize=14, fontweight='bold', color='gray')
-    ax.set_ylabel("Variation (%)", fontsize=14, fontweight='bold', color='gray')
-    ax.axhline(0, color='black', linewidth=1.2, linestyle='--')
-    ax.bar_label(bars, fmt="%.2f", fontsize=10, padding=3, label_type='edge', color='black')
-    ax.set_xticks(range(len(taux_abstention_par_election['Nom élection'])))
-    ax.set_xticklabels(taux_abstention_par_election['Nom élection'], rotation=45, ha='right')
-    ax.grid(axis='y', linestyle='--', alpha=0.6)
-    ax.set_facecolor('#f7f9fc')
-    st.pyplot(fig)
+    def draw_abstention_variation(taux_abstention_par_election):
+        fig, ax = plt.subplots(figsize=(12, 6))
+        bars = ax.bar(
+            taux_abstention_par_election['Nom élection'],
+            taux_abstention_par_election['Variation (%)'].fillna(0),
+            color=['green' if val < 0 else 'red' for val in taux_abstention_par_election['Variation (%)'].fillna(0)],
+            alpha=0.8,
+            edgecolor='black'
+        )
+        ax.set_title("Variation du Taux d'Abstention Entre Chaque Élection", fontsize=18, fontweight='bold', color='darkblue')
+        ax.set_xlabel("Élections (id_election)", fontsize=14, fontweight='bold', color='gray')
+        ax.set_ylabel("Variation (%)", fontsize=14, fontweight='bold', color='gray')
+        ax.axhline(0, color='black', linewidth=1.2, linestyle='--')
+        ax.bar_label(bars, fmt="%.2f", fontsize=10, padding=3, label_type='edge', color='black')
+        ax.set_xticks(range(len(taux_abstention_par_election['Nom élection'])))
+        ax.set_xticklabels(taux_abstention_par_election['Nom élection'], rotation=45, ha='right')
+        ax.grid(axis='y', linestyle='--', alpha=0.6)
+        ax.set_facecolor('#f7f9fc')
+        return fig
+
+    display_chart(draw_abstention_variation, taux_abstention_par_election)
 
     # Informations supplémentaires
     st.subheader("Informations Clés")
@@ -781,15 +1000,25 @@ if page ==     "Analyse Générale de l'Abstention Électorale":
     election = st.sidebar.selectbox("Sélectionnez une élection", df['id_election'].unique())
     departement = st.sidebar.multiselect("Sélectionnez un ou plusieurs départements", df['Libellé du département'].unique())
     commune = st.sidebar.text_input("Rechercher une commune (optionnel)")
+    if commune and saisie_vide(commune):
+        st.sidebar.warning("Saisissez au moins une lettre ou un chiffre pour rechercher une commune.")
+        commune = ""
 
-    # Filtrer les données
-    filtered_data = df[df['id_election'] == election]
-
-    if departement:
-        filtered_data = filtered_data[filtered_data['Libellé du département'].isin(departement)]
-
+    # Filtrer les données : le cube suffit, sauf pour la recherche d'une commune
     if commune:
-        filtered_data = filtered_data[filtered_data['Libellé de la commune'].str.contains(commune, case=False, na=False)]
+        # L'index donne directement les lignes des communes correspondantes
+        positions = load_commune_index().positions(commune)
+        with etape("calcul filtre commune"):
+            filtered_data = df.iloc[positions]
+            filtered_data = filtered_data[filtered_data['id_election'] == election]
+            if departement:
+                filtered_data = filtered_data[filtered_data['Libellé du département'].isin(departement)]
+            filtered_data = construire_cube_abstention(filtered_data)
+    else:
+        with etape("calcul filtre cube"):
+            filtered_data = cube[cube['id_election'] == election]
+            if departement:
+                filtered_data = filtered_data[filtered_data['Libellé du département'].isin(departement)]
 
     if filtered_data.empty:
         st.warning("Aucune donnée trouvée pour les filtres sélectionnés.")
@@ -808,81 +1037,79 @@ if page ==     "Analyse Générale de l'Abstention Électorale":
 
     # Classement par taux d'abstention pour l'élection sélectionnée
     st.subheader("Visualisation des Taux d'Abstention par Département")
-    departments_taux = (
-        filtered_data.groupby('Libellé du département')['% Abs/Ins']
-        .mean()
-        .sort_values(ascending=False)
-    )
+    # L'index de classement est déjà trié par taux décroissant : filtrer conserve l'ordre
+    with etape("calcul classement"):
+        ranking = classement_departements(filtered_data) if commune else load_abstention_ranking()
+        ranking = ranking[ranking['id_election'] == election]
+        if departement:
+            ranking = ranking[ranking['Libellé du département'].isin(departement)]
+    departments_taux = ranking.set_index('Libellé du département')['% Abs/Ins']
 
     # Graphiques des départements avec les taux d'abstention les plus élevés et les plus faibles
     highest_abstention = departments_taux.head(5)
     lowest_abstention = departments_taux.tail(5)
 
-    fig1, ax1 = plt.subplots(figsize=(8, 5))
-    highest_abstention.plot(kind='bar', color='red', alpha=0.7, ax=ax1)
-    ax1.set_title("Top 5 - Départements avec les Taux d'Abstention les Plus Élevés")
-    ax1.set_ylabel("Taux d'Abstention (%)")
-    ax1.set_xlabel("Départements")
-    ax1.set_xticklabels(highest_abstention.index, rotation=45, ha='right')
-    ax1.bar_label(ax1.containers[0], fmt="%.2f%%")
-    st.pyplot(fig1)
-
-    fig2, ax2 = plt.subplots(figsize=(8, 5))
-    lowest_abstention.plot(kind='bar', color='green', alpha=0.7, ax=ax2)
-    ax2.set_title("Top 5 - Départements avec les Taux d'Abstention les Plus Faibles")
-    ax2.set_ylabel("Taux d'Abstention (%)")
-    ax2.set_xlabel("Départements")
-    ax2.set_xticklabels(lowest_abstention.index, rotation=45, ha='right')
-    ax2.bar_label(ax2.containers[0], fmt="%.2f%%")
-    st.pyplot(fig2)
+    def draw_highest_abstention(highest_abstention):
+        fig1, ax1 = plt.subplots(figsize=(8, 5))
+        highest_abstention.plot(kind='bar', color='red', alpha=0.7, ax=ax1)
+        ax1.set_title("Top 5 - Départements avec les Taux d'Abstention les Plus Élevés")
+        ax1.set_ylabel("Taux d'Abstention (%)")
+        ax1.set_xlabel("Départements")
+        ax1.set_xticklabels(highest_abstention.index, rotation=45, ha='right')
+        ax1.bar_label(ax1.containers[0], fmt="%.2f%%")
+        return fig1
+
+    display_chart(draw_highest_abstention, highest_abstention)
+
+    def draw_lowest_abstention(lowest_abstention):
+        fig2, ax2 = plt.subplots(figsize=(8, 5))
+        lowest_abstention.plot(kind='bar', color='green', alpha=0.7, ax=ax2)
+        ax2.set_title("Top 5 - Départements avec les Taux d'Abstention les Plus Faibles")
+        ax2.set_ylabel("Taux d'Abstention (%)")
+        ax2.set_xlabel("Départements")
+        ax2.set_xticklabels(lowest_abstention.index, rotation=45, ha='right')
+        ax2.bar_label(ax2.containers[0], fmt="%.2f%%")
+        return fig2
+
+    display_chart(draw_lowest_abstention, lowest_abstention)
 
     # Analyse des départements sur plusieurs élections
     st.subheader("Fréquence des Départements dans les Meilleurs et Moins Bons Taux d'Abstention")
     st.write("Ce graphique montre les départements figurant fréquemment parmi les meilleurs ou les moins bons votants.")
     try:
-        elections_analysis = df.groupby(['id_election', 'Libellé du département'])['% Abs/Ins'].mean().reset_index()
-
-        # Identifier les départements dans le top 10 des taux d'abstention les plus faibles et les plus élevés
-        top_departments = {}
-        bottom_departments = {}
-
-        for election_id in df['id_election'].unique():
-            election_data = elections_analysis[elections_analysis['id_election'] == election_id]
-            top_10 = election_data.nsmallest(10, '% Abs/Ins')['Libellé du département']
-            bottom_10 = election_data.nlargest(10, '% Abs/Ins')['Libellé du département']
-
-            for dept in top_10:
-                top_departments[dept] = top_departments.get(dept, 0) + 1
-
-            for dept in bottom_10:
-                bottom_departments[dept] = bottom_departments.get(dept, 0) + 1
-
-        # Convertir en DataFrame pour affichage
-        top_departments_df = pd.DataFrame(list(top_departments.items()), columns=['Département', 'Apparitions'])
-        top_departments_df['Classement'] = top_departments_df['Apparitions'].apply(lambda x: "Toujours Top 10" if x == len(df['id_election'].unique()) else "Parfois Top 10")
-        top_departments_df = top_departments_df.sort_values(by='Apparitions', ascending=False)
-
-        bottom_departments_df = pd.DataFrame(list(bottom_departments.items()), columns=['Département', 'Apparitions'])
-        bottom_departments_df['Classement'] = bottom_departments_df['Apparitions'].apply(lambda x: "Toujours Top 10" if x == len(df['id_election'].unique()) else "Parfois Top 10")
-        bottom_departments_df = bottom_departments_df.sort_values(by='Apparitions', ascending=False)
-
-        fig3, ax3 = plt.subplots(figsize=(10, 6))
-        ax3.bar(top_departments_df['Département'][:10], top_departments_df['Apparitions'][:10], color='blue', alpha=0.7)
-        ax3.set_title("Départements votant le mieux (Top 10 des Taux les Plus Faibles)")
-        ax3.set_ylabel("Nombre d'Apparitions")
-        ax3.set_xlabel("Départements")
-        ax3.set_xticklabels(top_departments_df['Département'][:10], rotation=90, ha='center')
-        ax3.bar_label(ax3.containers[0], fmt="%d")
-        st.pyplot(fig3)
-
-        fig4, ax4 = plt.subplots(figsize=(10, 6))
-        ax4.bar(bottom_departments_df['Département'][:10], bottom_departments_df['Apparitions'][:10], color='orange', alpha=0.7)
-        ax4.set_title("Départements votant le moins (Top 10 des Taux les Plus Élevés)")
-        ax4.set_ylabel("Nombre d'Apparitions")
-        ax4.set_xlabel("Départements")
-        ax4.set_xticklabels(bottom_departments_df['Département'][:10], rotation=90, ha='center')
-        ax4.bar_label(ax4.containers[0], fmt="%d")
-        st.pyplot(fig4)
+        elections_ranking = load_abstention_ranking()
+        nb_elections = elections_ranking['id_election'].nunique()
+
+        # Départements dans le top 10 des taux d'abstention les plus faibles et les plus élevés, toutes élections confondues
+        top_departments_df = apparitions(elections_ranking, 10, 'Rang croissant').rename_axis('Département').reset_index(name='Apparitions')
+        top_departments_df['Classement'] = np.where(top_departments_df['Apparitions'] == nb_elections, "Toujours Top 10", "Parfois Top 10")
+
+        bottom_departments_df = apparitions(elections_ranking, 10, 'Rang décroissant').rename_axis('Département').reset_index(name='Apparitions')
+        bottom_departments_df['Classement'] = np.where(bottom_departments_df['Apparitions'] == nb_elections, "Toujours Top 10", "Parfois Top 10")
+
+        def draw_best_voters_frequency(top_departments_df):
+            fig3, ax3 = plt.subplots(figsize=(10, 6))
+            ax3.bar(top_departments_df['Département'][:10], top_departments_df['Apparitions'][:10], color='blue', alpha=0.7)
+            ax3.set_title("Départements votant le mieux (Top 10 des Taux les Plus Faibles)")
+            ax3.set_ylabel("Nombre d'Apparitions")
+            ax3.set_xlabel("Départements")
+            ax3.set_xticklabels(top_departments_df['Département'][:10], rotation=90, ha='center')
+            ax3.bar_label(ax3.containers[0], fmt="%d")
+            return fig3
+
+        display_chart(draw_best_voters_frequency, top_departments_df)
+
+        def draw_worst_voters_frequency(bottom_departments_df):
+            fig4, ax4 = plt.subplots(figsize=(10, 6))
+            ax4.bar(bottom_departments_df['Département'][:10], bottom_departments_df['Apparitions'][:10], color='orange', alpha=0.7)
+            ax4.set_title("Départements votant le moins (Top 10 des Taux les Plus Élevés)")
+            ax4.set_ylabel("Nombre d'Apparitions")
+            ax4.set_xlabel("Départements")
+            ax4.set_xticklabels(bottom_departments_df['Département'][:10], rotation=90, ha='center')
+            ax4.bar_label(ax4.containers[0], fmt="%d")
+            return fig4
+
+        display_chart(draw_worst_voters_frequency, bottom_departments_df)
 
         # Départements d'outre-mer présents dans le graphique
         outre_mer_departments = ['Guadeloupe', 'Martinique', 'Guyane', 'La Réunion', 'Saint-Martin/Saint-Barthélemy', 'Nouvelle-Calédonie']
@@ -897,14 +1124,19 @@ if page ==     "Analyse Générale de l'Abstention Électorale":
 
 
 elif page == "Analyse Approfondie de l'Abstention et de ses Liens Socio-économiques":
+    with etape("import matplotlib.pyplot"):
+        import matplotlib.pyplot as plt
     apply_custom_design()
     st.header("Analyse des Votes Blancs, Nuls et Abstentions")
     st.markdown("""
     Un **vote blanc** est exprimé lorsque l'enveloppe ou le bulletin est vide, tandis qu'un **vote nul** correspond à un bulletin non valide (rayé, annoté, etc.). Ces votes reflètent une expression particulière des électeurs vis-à-vis des options proposées.
     """)
 
+    cube = load_abstention_cube()
+
     # Calculer les moyennes des pourcentages par élection
-    grouped_data = df.groupby('id_election')[['% Abs/Ins', '% Blancs/Ins', '% Nuls/Ins']].mean().reset_index()
+    with etape("calcul moyennes par élection"):
+        grouped_data = moyennes_communales(cube, 'id_election', ['% Abs/Ins', '% Blancs/Ins', '% Nuls/Ins'])
 
     if grouped_data.empty:
         st.warning("Aucune donnée disponible pour l'analyse.")
@@ -922,35 +1154,41 @@ elif page == "Analyse Approfondie de l'Abstention et de ses Liens Socio-économi
 
     # Comparer graphiquement les pourcentages par élection
     st.subheader("Comparaison des Votes Blancs, Nuls et Abstentions par Élection")
-    fig, ax = plt.subplots(figsize=(12, 6))
-    bar_width = 0.2
-    x = range(len(grouped_data['Nom élection']))
-
-    ax.bar(x, grouped_data['% Abs/Ins'], width=bar_width, label='% Abs/Ins', color='lightblue')
-    ax.bar([p + bar_width for p in x], grouped_data['% Blancs/Ins'], width=bar_width, label='% Blancs/Ins', color='lightgreen')
-    ax.bar([p + 2 * bar_width for p in x], grouped_data['% Nuls/Ins'], width=bar_width, label='% Nuls/Ins', color='lightcoral')
-
-    ax.set_xticks([p + bar_width for p in x])
-    ax.set_xticklabels(grouped_data['Nom élection'], rotation=45, ha='right')
-    ax.set_title("Comparaison des Votes Blancs, Nuls et Abstentions par Élection", fontsize=16)
-    ax.set_xlabel("Élections", fontsize=14)
-    ax.set_ylabel("Pourcentage (%)", fontsize=14)
-    ax.legend()
-    st.pyplot(fig)
+    def draw_blank_null_comparison(grouped_data):
+        fig, ax = plt.subplots(figsize=(12, 6))
+        bar_width = 0.2
+        x = range(len(grouped_data['Nom élection']))
+
+        ax.bar(x, grouped_data['% Abs/Ins'], width=bar_width, label='% Abs/Ins', color='lightblue')
+        ax.bar([p + bar_width for p in x], grouped_data['% Blancs/Ins'], width=bar_width, label='% Blancs/Ins', color='lightgreen')
+        ax.bar([p + 2 * bar_width for p in x], grouped_data['% Nuls/Ins'], width=bar_width, label='% Nuls/Ins', color='lightcoral')
+
+        ax.set_xticks([p + bar_width for p in x])
+        ax.set_xticklabels(grouped_data['Nom élection'], rotation=45, ha='right')
+        ax.set_title("Comparaison des Votes Blancs, Nuls et Abstentions par Élection", fontsize=16)
+        ax.set_xlabel("Élections", fontsize=14)
+        ax.set_ylabel("Pourcentage (%)", fontsize=14)
+        ax.legend()
+        return fig
+
+    display_chart(draw_blank_null_comparison, grouped_data)
 
     # Analyse des tendances avec une visualisation linéaire
     st.subheader("Tendances des Votes Blancs, Nuls et Abstentions")
-    fig = plt.figure(figsize=(12, 6))
-    plt.plot(grouped_data['Nom élection'], grouped_data['% Abs/Ins'], marker='o', label='% Abs/Ins', color='lightblue')
-    plt.plot(grouped_data['Nom élection'], grouped_data['% Blancs/Ins'], marker='o', label='% Blancs/Ins', color='lightgreen')
-    plt.plot(grouped_data['Nom élection'], grouped_data['% Nuls/Ins'], marker='o', label='% Nuls/Ins', color='lightcoral')
-    plt.title("Tendances des Votes Blancs, Nuls et Abstentions", fontsize=16)
-    plt.xlabel("Élections", fontsize=14)
-    plt.ylabel("Pourcentage (%)", fontsize=14)
-    plt.xticks(rotation=45)
-    plt.legend()
-    plt.grid(axis='y', linestyle='--', alpha=0.7)
-    st.pyplot(fig)
+    def draw_blank_null_trend(grouped_data):
+        fig = plt.figure(figsize=(12, 6))
+        plt.plot(grouped_data['Nom élection'], grouped_data['% Abs/Ins'], marker='o', label='% Abs/Ins', color='lightblue')
+        plt.plot(grouped_data['Nom élection'], grouped_data['% Blancs/Ins'], marker='o', label='% Blancs/Ins', color='lightgreen')
+        plt.plot(grouped_data['Nom élection'], grouped_data['% Nuls/Ins'], marker='o', label='% Nuls/Ins', color='lightcoral')
+        plt.title("Tendances des Votes Blancs, Nuls et Abstentions", fontsize=16)
+        plt.xlabel("Élections", fontsize=14)
+        plt.ylabel("Pourcentage (%)", fontsize=14)
+        plt.xticks(rotation=45)
+        plt.legend()
+        plt.grid(axis='y', linestyle='--', alpha=0.7)
+        return fig
+
+    display_chart(draw_blank_null_trend, grouped_data)
 
     st.header("Analyse Croisée : Pauvreté et Abstention par Département")
 
@@ -975,24 +1213,23 @@ elif page == "Analyse Approfondie de l'Abstention et de ses Liens Socio-économi
         title_suffix = "(2021/2022)"
 
     try:
-        # Filtrer les données d'abstention pour l'année sélectionnée
-        df_filtered = df[df['id_election'].str.contains(election_year, na=False)]
-        df_filtered['Code du département'] = df_filtered['Code du département'].astype(str).str.zfill(3)
-        poverty_data['departement'] = poverty_data['departement'].astype(str).str.zfill(3)
-
-        # Fusionner les données d'abstention et de pauvreté
-        merged_data = pd.merge(
-            poverty_data, df_filtered, left_on='departement', right_on='Code du département', how='inner'
-        )
+        with etape("calcul fusion pauvreté"):
+            # Abstention moyenne par département pour l'année sélectionnée, à partir du cube
+            cube_filtered = cube[cube['id_election'].str.contains(election_year, na=False)]
+            abstention_data = moyennes_communales(cube_filtered, ['cle_departement', 'Libellé du département'])
+
+            # Fusionner les données d'abstention et de pauvreté sur la clé département
+            merged_data = pd.merge(poverty_data, abstention_data, on='cle_departement', how='inner')
     except Exception as e:
         st.error(f"Erreur lors de la préparation des données : {e}")
         st.stop()
 
 
     # Calculer les moyennes par département
-    dept_analysis = merged_data.groupby('Libellé du département')[[poverty_column, '% Abs/Ins']].mean().reset_index()
-    dept_analysis = dept_analysis.rename(columns={poverty_column: 'Taux de Pauvreté'})
-    dept_analysis = dept_analysis.sort_values(by='% Abs/Ins', ascending=True)
+    with etape("calcul moyennes pauvreté"):
+        dept_analysis = merged_data.groupby('Libellé du département', observed=True)[[poverty_column, '% Abs/Ins']].mean().reset_index()
+        dept_analysis = dept_analysis.rename(columns={poverty_column: 'Taux de Pauvreté'})
+        dept_analysis = dept_analysis.sort_values(by='% Abs/Ins', ascending=True)
 
     # Statistiques globales
     median_poverty = dept_analysis['Taux de Pauvreté'].median()
@@ -1014,35 +1251,41 @@ elif page == "Analyse Approfondie de l'Abstention et de ses Liens Socio-économi
 
     # Graphique pour les départements qui votent le mieux
     st.subheader(f"Départements avec le Taux d'Abstention le Plus Faible {title_suffix}")
-    fig1, ax1 = plt.subplots(figsize=(10, 6))
-    x1 = range(len(best_voters))
-    bars1 = ax1.bar(x1, best_voters['Taux de Pauvreté'], width=0.4, label="Taux de Pauvreté (%)", color='lightblue', align='center')
-    bars2 = ax1.bar(x1, best_voters['% Abs/Ins'], width=0.4, label="Taux d'Abstention (%)", color='orange', align='edge')
-    ax1.set_xticks(range(len(best_voters)))
-    ax1.set_xticklabels(best_voters['Libellé du département'], rotation=45)
-    ax1.set_title(f"Taux de Pauvreté et Abstention (Meilleurs Votants) {title_suffix}", fontsize=16, fontweight='bold', color='darkblue')
-    ax1.set_xlabel('Libellé du département', fontsize=14, fontweight='bold')
-    ax1.set_ylabel("Pourcentage (%)", fontsize=14, fontweight='bold')
-    ax1.legend(fontsize=12, title="Indicateur", title_fontsize=14)
-    ax1.bar_label(bars1, fmt="%.2f%%")
-    ax1.bar_label(bars2, fmt="%.2f%%")
-    st.pyplot(fig1)
+    def draw_best_voters_poverty(best_voters, title_suffix):
+        fig1, ax1 = plt.subplots(figsize=(10, 6))
+        x1 = range(len(best_voters))
+        bars1 = ax1.bar(x1, best_voters['Taux de Pauvreté'], width=0.4, label="Taux de Pauvreté (%)", color='lightblue', align='center')
+        bars2 = ax1.bar(x1, best_voters['% Abs/Ins'], width=0.4, label="Taux d'Abstention (%)", color='orange', align='edge')
+        ax1.set_xticks(range(len(best_voters)))
+        ax1.set_xticklabels(best_voters['Libellé du département'], rotation=45)
+        ax1.set_title(f"Taux de Pauvreté et Abstention (Meilleurs Votants) {title_suffix}", fontsize=16, fontweight='bold', color='darkblue')
+        ax1.set_xlabel('Libellé du département', fontsize=14, fontweight='bold')
+        ax1.set_ylabel("Pourcentage (%)", fontsize=14, fontweight='bold')
+        ax1.legend(fontsize=12, title="Indicateur", title_fontsize=14)
+        ax1.bar_label(bars1, fmt="%.2f%%")
+        ax1.bar_label(bars2, fmt="%.2f%%")
+        return fig1
+
+    display_chart(draw_best_voters_poverty, best_voters, title_suffix)
 
     # Graphique pour les départements qui votent le moins bien
     st.subheader(f"Départements avec le Taux d'Abstention le Plus Élevé {title_suffix}")
-    fig2, ax2 = plt.subplots(figsize=(10, 6))
-    x2 = range(len(worst_voters))
-    bars3 = ax2.bar(x2, worst_voters['Taux de Pauvreté'], width=0.4, label="Taux de Pauvreté (%)", color='lightblue', align='center')
-    bars4 = ax2.bar(x2, worst_voters['% Abs/Ins'], width=0.4, label="Taux d'Abstention (%)", color='orange', align='edge')
-    ax2.set_xticks(range(len(worst_voters)))
-    ax2.set_xticklabels(worst_voters['Libellé du département'], rotation=45)
-    ax2.set_title(f"Taux de Pauvreté et Abstention (Moins Bons Votants) {title_suffix}", fontsize=16, fontweight='bold', color='darkblue')
-    ax2.set_xlabel('Libellé du département', fontsize=14, fontweight='bold')
-    ax2.set_ylabel("Pourcentage (%)", fontsize=14, fontweight='bold')
-    ax2.legend(fontsize=12, title="Indicateur", title_fontsize=14)
-    ax2.bar_label(bars3, fmt="%.2f%%")
-    ax2.bar_label(bars4, fmt="%.2f%%")
-    st.pyplot(fig2)
+    def draw_worst_voters_poverty(worst_voters, title_suffix):
+        fig2, ax2 = plt.subplots(figsize=(10, 6))
+        x2 = range(len(worst_voters))
+        bars3 = ax2.bar(x2, worst_voters['Taux de Pauvreté'], width=0.4, label="Taux de Pauvreté (%)", color='lightblue', align='center')
+        bars4 = ax2.bar(x2, worst_voters['% Abs/Ins'], width=0.4, label="Taux d'Abstention (%)", color='orange', align='edge')
+        ax2.set_xticks(range(len(worst_voters)))
+        ax2.set_xticklabels(worst_voters['Libellé du département'], rotation=45)
+        ax2.set_title(f"Taux de Pauvreté et Abstention (Moins Bons Votants) {title_suffix}", fontsize=16, fontweight='bold', color='darkblue')
+        ax2.set_xlabel('Libellé du département', fontsize=14, fontweight='bold')
+        ax2.set_ylabel("Pourcentage (%)", fontsize=14, fontweight='bold')
+        ax2.legend(fontsize=12, title="Indicateur", title_fontsize=14)
+        ax2.bar_label(bars3, fmt="%.2f%%")
+        ax2.bar_label(bars4, fmt="%.2f%%")
+        return fig2
+
+    display_chart(draw_worst_voters_poverty, worst_voters, title_suffix)
 
     # Informations supplémentaires
     st.subheader("Informations Importantes")
@@ -1055,60 +1298,23 @@ elif page == "Analyse Approfondie de l'Abstention et de ses Liens Socio-économi
 
     st.header("Analyse Croisée : Chômage et Absentéisme pour les Années 2017, 2022 et 2024")
 
-    # Charger les données de chômage
-    unemployment_data = load_unemployment_data()
-    if unemployment_data.empty:
-        st.stop()
-
-    selected_years = st.sidebar.multiselect("Sélectionnez les années d'analyse Abstention/chômage:", ['2017', '2022', '2024'], default=['2017'])
-
-    try:
-        df['Code du département'] = df['Code du département'].astype(str).str.zfill(2)
-        unemployment_data['DEP_CODE'] = unemployment_data['DEP_CODE'].astype(str).str.zfill(2)
-
-        # Filtrer uniquement le premier tour avec un identifiant d'élection contenant '_t1'
-        df_first_round = df[df['id_election'].str.contains("_t1", na=False)]
-
-        merged_data = pd.merge(
-            unemployment_data, 
-            df_first_round.groupby(['Code du département', 'id_election'])['% Abs/Ins'].mean().reset_index(),
-            left_on='DEP_CODE', 
-            right_on='Code du département',
-            how='inner'
-        )
-    except Exception as e:
-        st.error(f"Erreur lors de la fusion des données : {e}")
+    # Panel chômage x abstention (département, année, élection de premier tour), calculé une fois par processus
+    unemployment_panel = load_unemployment_panel()
+    if unemployment_panel.empty:
         st.stop()
 
-    for year in selected_years:
-        st.subheader(f"Analyse pour l'Année {year}")
-        if not any(merged_data['id_election'].str.contains(year, na=False)):
-            st.warning(f"Aucune donnée disponible pour l'année {year}.")
-            continue
-
-        election_year = year
-        year_data = merged_data[merged_data['id_election'].str.contains(election_year, na=False)]
+    available_years = [str(year) for year in sorted(unemployment_panel['Annee'].unique())]
+    selected_years = st.sidebar.multiselect("Sélectionnez les années d'analyse Abstention/chômage:", available_years, default=available_years[:1])
 
-        if year_data.empty:
-            st.warning(f"Aucune donnée disponible pour l'année {year}.")
-            continue
-
-        mean_unemployment = year_data[year].mean()
-        mean_absenteeism = year_data['% Abs/Ins'].mean()
-
-        st.write(f"- **Taux de Chômage Moyen ({year})** : {mean_unemployment:.2f}%")
-        st.write(f"- **Taux d'Absentéisme Moyen ({year})** : {mean_absenteeism:.2f}%")
+    with etape("calcul statistiques chômage"):
+        # Moyennes, corrélations et classements de toutes les années sélectionnées en une passe
+        summary, highest, lowest = statistiques_panel(unemployment_panel, [int(year) for year in selected_years])
 
-        # Identifier les 10 départements avec les taux les plus élevés et les plus faibles
-        top_10_highest = year_data.nlargest(10, year)
-        top_10_lowest = year_data.nsmallest(10, year)
-
-        # Graphique à barres pour les 10 taux de chômage et d'absentéisme les plus élevés
-        st.subheader(f"10 Départements avec les Taux de Chômage les Plus Élevés ({year})")
+    def draw_highest_unemployment(top_10_highest, year):
         fig, ax = plt.subplots(figsize=(10, 6))
         x = range(len(top_10_highest['DEP_NOM']))
         bar_width = 0.4
-        ax.bar(x, top_10_highest[year], bar_width, label="Taux de Chômage", color='red', alpha=0.7)
+        ax.bar(x, top_10_highest['Taux de chômage'], bar_width, label="Taux de Chômage", color='red', alpha=0.7)
         ax.bar([p + bar_width for p in x], top_10_highest['% Abs/Ins'], bar_width, label="Taux d'Absentéisme", color='blue', alpha=0.7)
         ax.set_xticks([p + bar_width / 2 for p in x])
         ax.set_xticklabels(top_10_highest['DEP_NOM'], rotation=45, ha='right')
@@ -1116,13 +1322,13 @@ elif page == "Analyse Approfondie de l'Abstention et de ses Liens Socio-économi
         ax.set_xlabel("Départements")
         ax.set_ylabel("Pourcentage (%)")
         ax.legend()
-        st.pyplot(fig)
+        return fig
 
-        # Graphique à barres pour les 10 taux de chômage et d'absentéisme les plus faibles
-        st.subheader(f"10 Départements avec les Taux de Chômage les Plus Faibles ({year})")
+    def draw_lowest_unemployment(top_10_lowest, year):
         fig, ax = plt.subplots(figsize=(10, 6))
+        bar_width = 0.4
         x = range(len(top_10_lowest['DEP_NOM']))
-        ax.bar(x, top_10_lowest[year], bar_width, label="Taux de Chômage", color='green', alpha=0.7)
+        ax.bar(x, top_10_lowest['Taux de chômage'], bar_width, label="Taux de Chômage", color='green', alpha=0.7)
         ax.bar([p + bar_width for p in x], top_10_lowest['% Abs/Ins'], bar_width, label="Taux d'Absentéisme", color='blue', alpha=0.7)
         ax.set_xticks([p + bar_width / 2 for p in x])
         ax.set_xticklabels(top_10_lowest['DEP_NOM'], rotation=45, ha='right')
@@ -1130,29 +1336,52 @@ elif page == "Analyse Approfondie de l'Abstention et de ses Liens Socio-économi
         ax.set_xlabel("Départements")
         ax.set_ylabel("Pourcentage (%)")
         ax.legend()
-        st.pyplot(fig)
+        return fig
 
-        # Graphique de corrélation
-        st.subheader(f"Corrélation entre Taux de Chômage et Absentéisme ({year})")
-        correlation = year_data[[year, '% Abs/Ins']].corr().iloc[0, 1]
+    def draw_unemployment_correlation(year_data, year, correlation):
         fig, ax = plt.subplots(figsize=(10, 6))
-        ax.scatter(year_data[year], year_data['% Abs/Ins'], color='orange', alpha=0.7)
+        ax.scatter(year_data['Taux de chômage'], year_data['% Abs/Ins'], color='orange', alpha=0.7)
         ax.set_title(f"Corrélation entre Chômage et Absentéisme ({year}) : {correlation:.2f}")
         ax.set_xlabel("Taux de Chômage (%)")
         ax.set_ylabel("Taux d'Absentéisme (%)")
         ax.grid(alpha=0.3)
-        st.pyplot(fig)
+        return fig
+
+    for year in selected_years:
+        st.subheader(f"Analyse pour l'Année {year}")
+        if int(year) not in summary.index:
+            st.warning(f"Aucune donnée disponible pour l'année {year}.")
+            continue
 
-    @st.cache_data
-    def convert_to_csv(df):
-        return df.to_csv(index=False).encode('utf-8')
+        year_data = unemployment_panel[unemployment_panel['Annee'] == int(year)]
+        mean_unemployment, mean_absenteeism, correlation = summary.loc[int(year)]
 
-    csv = convert_to_csv(merged_data)
-    st.download_button(
-        label="Télécharger les données fusionnées",
-        data=csv,
-        file_name='chomage_absenteisme.csv',
-        mime='text/csv'
+        st.write(f"- **Taux de Chômage Moyen ({year})** : {mean_unemployment:.2f}%")
+        st.write(f"- **Taux d'Absentéisme Moyen ({year})** : {mean_absenteeism:.2f}%")
+
+        # Les 10 départements avec les taux les plus élevés et les plus faibles
+        top_10_highest = highest[highest['Annee'] == int(year)]
+        top_10_lowest = lowest[lowest['Annee'] == int(year)]
+
+        # Graphique à barres pour les 10 taux de chômage et d'absentéisme les plus élevés
+        st.subheader(f"10 Départements avec les Taux de Chômage les Plus Élevés ({year})")
+        display_chart(draw_highest_unemployment, top_10_highest, year)
+
+        # Graphique à barres pour les 10 taux de chômage et d'absentéisme les plus faibles
+        st.subheader(f"10 Départements avec les Taux de Chômage les Plus Faibles ({year})")
+        display_chart(draw_lowest_unemployment, top_10_lowest, year)
+
+        # Graphique de corrélation
+        st.subheader(f"Corrélation entre Taux de Chômage et Absentéisme ({year})")
+        display_chart(draw_unemployment_correlation, year_data, year, correlation)
+
+    # Panel des années sélectionnées, produit seulement au clic
+    display_download(
+        "Télécharger les données fusionnées",
+        lambda: unemployment_panel[unemployment_panel['Annee'].isin([int(year) for year in selected_years])],
+        'chomage_absenteisme',
+        sources=['taux_chomage_par_departement.csv', 'data_elections.csv'],
+        years=tuple(selected_years),
     )
 
     st.header("Analyse de l'Absentéisme et des Proportions par Tranche d'Âge")
@@ -1166,54 +1395,49 @@ elif page == "Analyse Approfondie de l'Abstention et de ses Liens Socio-économi
 
 
 
-    # Charger les données démographiques
-    demographic_data = load_demographic_data()
-    if demographic_data.empty:
-        st.error("Les données démographiques sont introuvables.")
-        st.stop()
-
-    # Charger les données d'absentéisme
-    absenteeism_data = load_data()
-    if absenteeism_data.empty:
-        st.error("Les données d'absentéisme sont introuvables.")
+    # Proportions par tranche d'âge et abstention pondérée des premiers tours, une ligne par département et par année
+    age_abstention = load_age_abstention()
+    if age_abstention.empty:
+        st.error("Les données démographiques ou d'absentéisme sont introuvables.")
         st.stop()
 
-    # Vérifier les proportions et les convertir en pourcentage si nécessaire
-    for col in ['prop0142017', 'prop15392017', 'prop40592017', 'prop60p2017',
-                'prop0142022', 'prop15392022', 'prop40592022', 'prop60p2022']:
-        if demographic_data[col].max() <= 1:  # Si les proportions sont en décimales
-            demographic_data[col] *= 100
-
-    # Normaliser les codes département pour la jointure
-    absenteeism_data['Code du département'] = absenteeism_data['Code du département'].astype(str).str.zfill(3)
-    demographic_data['dep'] = demographic_data['dep'].astype(str).str.zfill(3)
-
     # Sélectionner l'année pour l'analyse
-    selected_year = st.sidebar.selectbox("Choisissez une année pour l'analyse Abstention/Categorie d'age :", ['2017', '2022'])
-
-    # Filtrer les données démographiques pour l'année sélectionnée
-    cols_to_keep = ['dep', 'nomdep', f'prop014{selected_year}', f'prop1539{selected_year}', f'prop4059{selected_year}', f'prop60p{selected_year}']
-    try:
-        proportion_data = demographic_data[cols_to_keep]
-    except KeyError:
-        st.error(f"Colonnes pour l'année {selected_year} introuvables dans les données démographiques.")
-        st.stop()
+    available_years = [str(year) for year in sorted(age_abstention['Annee'].unique())]
+    selected_year = st.sidebar.selectbox("Choisissez une année pour l'analyse Abstention/Categorie d'age :", available_years)
+
+    with etape("calcul sélection âge"):
+        # Départements de l'année sélectionnée, colonnes renommées pour simplifier l'affichage
+        merged_data = age_abstention[age_abstention['Annee'] == int(selected_year)].rename(columns={
+            'prop1539': '% Population 15-39 ans',
+            'prop4059': '% Population 40-59 ans',
+            'prop60p': '% Population 60+ ans',
+            'Taux Abs/Ins': '% Abs/Ins',
+        })
+
+    election_year = merged_data['Annee election'].iloc[0]
+    if str(election_year) != selected_year:
+        st.caption(f"Pas d'élection en {selected_year} : l'abstention est celle des premiers tours de {election_year}.")
 
-    # Renommer les colonnes pour simplifier l'affichage
-    proportion_data = proportion_data.rename(columns={
-        f'prop1539{selected_year}': '% Population 15-39 ans',
-        f'prop4059{selected_year}': '% Population 40-59 ans',
-        f'prop60p{selected_year}': '% Population 60+ ans'
-    })
+    # Tranches d'âge
+    age_columns = [ '% Population 15-39 ans', '% Population 40-59 ans', '% Population 60+ ans']
 
-    # Filtrer les données d'absentéisme pour le premier tour
-    absenteeism_data = absenteeism_data[absenteeism_data['id_election'].str.contains("_t1")]
+    def draw_age_group(graph_df, age_column):
+        fig, ax = plt.subplots(figsize=(8, 6))
+        bar_width = 0.35
+        x = range(len(graph_df))
 
-    # Fusionner les données démographiques et d'absentéisme
-    merged_data = pd.merge(proportion_data, absenteeism_data, left_on='dep', right_on='Code du département', how='inner')
+        bars1 = ax.bar(x, graph_df['Proportion Moyenne (%)'], bar_width, label='Proportion Moyenne (%)', color='skyblue')
+        bars2 = ax.bar([i + bar_width for i in x], graph_df['Taux d\'Absentéisme (%)'], bar_width, label='Taux d\'Absentéisme (%)', color='orange')
 
-    # Tranches d'âge
-    age_columns = [ '% Population 15-39 ans', '% Population 40-59 ans', '% Population 60+ ans']
+        # Configuration des étiquettes et du graphique
+        ax.set_xticks([i + bar_width / 2 for i in x])
+        ax.set_xticklabels(graph_df['Groupe'])
+        ax.set_title(f"Analyse : Proportions et Taux d'Absentéisme ({age_column})", fontsize=16, fontweight='bold')
+        ax.set_ylabel("Pourcentage", fontsize=14, fontweight='bold')
+        ax.legend(fontsize=12, title="Indicateur", title_fontsize=14)
+        ax.bar_label(bars1, fmt="%.2f%%")
+        ax.bar_label(bars2, fmt="%.2f%%")
+        return fig
 
     # Analyse par tranche d'âge
     for age_column in age_columns:
@@ -1238,51 +1462,53 @@ elif page == "Analyse Approfondie de l'Abstention et de ses Liens Socio-économi
 
         # Afficher les résultats
         st.subheader(f"Tranche d'Âge : {age_column}")
-        fig, ax = plt.subplots(figsize=(8, 6))
-        bar_width = 0.35
-        x = range(len(graph_df))
+        display_chart(draw_age_group, graph_df, age_column)
 
-        bars1 = ax.bar(x, graph_df['Proportion Moyenne (%)'], bar_width, label='Proportion Moyenne (%)', color='skyblue')
-        bars2 = ax.bar([i + bar_width for i in x], graph_df['Taux d\'Absentéisme (%)'], bar_width, label='Taux d\'Absentéisme (%)', color='orange')
+    st.header("Matrice de Corrélations : Indicateurs Socio-économiques et Résultats Électoraux")
 
-        # Configuration des étiquettes et du graphique
-        ax.set_xticks([i + bar_width / 2 for i in x])
-        ax.set_xticklabels(graph_df['Groupe'])
-        ax.set_title(f"Analyse : Proportions et Taux d'Absentéisme ({age_column})", fontsize=16, fontweight='bold')
-        ax.set_ylabel("Pourcentage", fontsize=14, fontweight='bold')
-        ax.legend(fontsize=12, title="Indicateur", title_fontsize=14)
-        ax.bar_label(bars1, fmt="%.2f%%")
-        ax.bar_label(bars2, fmt="%.2f%%")
+    st.markdown("""
+    Chaque case donne la corrélation, entre départements, d'un indicateur (pauvreté, chômage, tranches d'âge, revenus, QPV) 
+    et d'un résultat électoral (abstention, votes blancs et nuls, part des voix de chaque bord aux premiers tours des législatives). 
+    Le tableau classe les paires par corrélation décroissante en valeur absolue, avec un intervalle de confiance à 95 % obtenu par bootstrap.
+    """)
+
+    correlation_matrix = load_correlations()
+    if correlation_matrix is None:
+        st.warning("Données insuffisantes pour calculer la matrice de corrélations.")
+        st.stop()
 
-        st.pyplot(fig)
+    method = st.sidebar.selectbox("Méthode de corrélation :", ['pearson', 'spearman'], format_func=str.capitalize)
+    indicator_families = list(dict.fromkeys(correlation_matrix.indicateurs.get_level_values(0)))
+    result_families = list(dict.fromkeys(correlation_matrix.resultats.get_level_values(0)))
+    selected_indicators = st.sidebar.multiselect("Indicateurs de la matrice :", indicator_families,
+                                                 default=[family for family in ['Pauvreté', 'Chômage'] if family in indicator_families])
+    selected_results = st.sidebar.multiselect("Résultats de la matrice :", result_families,
+                                              default=[family for family in ['Abstention', 'Blancs', 'Nuls'] if family in result_families])
+
+    def draw_correlation_heatmap(matrix, method):
+        fig, ax = plt.subplots(figsize=(max(8, 0.35 * matrix.shape[1] + 4), max(6, 0.3 * matrix.shape[0] + 2)))
+        heatmap = ax.imshow(matrix.to_numpy(), cmap='RdBu_r', vmin=-1, vmax=1, aspect='auto')
+        ax.set_xticks(range(matrix.shape[1]))
+        ax.set_xticklabels([f"{family} {label}" for family, label in matrix.columns], rotation=90)
+        ax.set_yticks(range(matrix.shape[0]))
+        ax.set_yticklabels([f"{family} {label}" for family, label in matrix.index])
+        ax.set_title(f"Corrélations entre indicateurs et résultats ({method.capitalize()})", fontsize=14, fontweight='bold')
+        fig.colorbar(heatmap, ax=ax, label="Coefficient de corrélation")
+        return fig
+
+    matrix = correlation_matrix.matrice(method, selected_indicators, selected_results)
+    if matrix.empty:
+        st.info("Sélectionnez au moins une famille d'indicateurs et une famille de résultats.")
+    else:
+        display_chart(draw_correlation_heatmap, matrix, method)
+
+        # Paires les plus corrélées parmi les familles sélectionnées
+        pairs = correlation_matrix.table(method)
+        pairs = pairs[pairs['Famille indicateur'].isin(selected_indicators) & pairs['Famille résultat'].isin(selected_results)]
+        st.dataframe(pairs.head(20).round(3), hide_index=True)
         
 if page == "Analyse globale de la population française":
-        # Charger les données
-    @st.cache_data
-    def load_votes_data_2024():
-        try:
-            return pd.read_csv('df_jointure_2024.csv')
-        except FileNotFoundError:
-            st.error("Fichier 'df_jointure_2024.csv' introuvable. Assurez-vous qu'il est dans le même répertoire que le script.")
-            return pd.DataFrame()
-    
-    @st.cache_data
-    def load_votes_data_2022():
-        try:
-            return pd.read_csv('df_jointure_2022.csv')
-        except FileNotFoundError:
-            st.error("Fichier 'df_jointure_2022.csv' introuvable. Assurez-vous qu'il est dans le même répertoire que le script.")
-            return pd.DataFrame()
-    
-    @st.cache_data
-    def load_demographics_data():
-        try:
-            return pd.read_csv('df_age.csv')
-        except FileNotFoundError:
-            st.error("Fichier 'df_age.csv' introuvable. Assurez-vous qu'il est dans le même répertoire que le script.")
-            return pd.DataFrame()
-    
-    
+    # Charger les données
     df_jointure = load_votes_data_2024()
     df_jointure_2022 = load_votes_data_2022()
     df_age = load_demographics_data()
@@ -1311,7 +1537,7 @@ if page == "Analyse globale de la population française":
     
     if annee_selectionnee==2017:
         st.image("age2017.png")
-        st.components.v1.html(open("res_2017_T1_dept.html", "r", encoding="utf-8").read(), height=600, scrolling=True)
+        display_results_map("2017_legi_t1")
     elif annee_selectionnee==2018:
         st.image("age2018.png")
     elif annee_selectionnee==2019:
@@ -1322,7 +1548,7 @@ if page == "Analyse globale de la population française":
         st.image("age2021.png")
     elif annee_selectionnee==2022:
         st.image("age2022.png")
-        st.components.v1.html(open("res_2022_T1_dept.html", "r", encoding="utf-8").read(), height=600, scrolling=True)
+        display_results_map("2022_legi_t1")
 
     
     # Analyse des Partis Politiques
@@ -1341,3 +1567,10 @@ if page == "Analyse globale de la population française":
         st.image("image2022.png")
     elif annee_selectionnee_graphe == 2024:
          st.image("image2024.png")
+
+# Données des autres pages, en arrière-plan
+prefetch_pages(page)
+
+# Profil de l'exécution, en fin de script
+if profile is not None:
+    display_profile(profile, profile_modes)
@@ -0,0 +1,471 @@
+"""
+Cartes choroplèthes construites à l'exécution.
+
+Les contours (départements, circonscriptions) sont stockés une seule fois dans
+geometries/*.geojson et chargés une fois par processus ; chaque carte n'ajoute
+que le petit vecteur de valeurs issu des CSV.
+
+Chaque couche existe en plusieurs niveaux de détail (simplification qui
+préserve les frontières communes, coordonnées arrondies) ; la carte choisit le
+niveau d'après l'étendue affichée et la largeur de la vue.
+
+Usage hors ligne : python cartographie.py
+    extrait les contours des cartes HTML folium (ou de fichiers GeoJSON) vers
+    geometries/, puis produit les niveaux de détail de chaque couche.
+"""
+import functools
+import json
+import os
+import re
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objs as go
+
+from ressources import url_carte
+
+DOSSIER_GEOMETRIES = "geometries"
+
+# Couches de contours : fichier GeoJSON produit, sources (cartes folium ou GeoJSON), propriété portant le code
+# et, si les sources ne couvrent qu'une partie du territoire, les départements couverts.
+# Les cartes folium d'origine ne contiennent pas de contour pour l'outre-mer, et seules les circonscriptions
+# de la Haute-Garonne sont versionnées.
+COUCHES = {
+    "departements": {
+        "fichier": os.path.join(DOSSIER_GEOMETRIES, "departements.geojson"),
+        "sources": ["res_2017_T1_dept.html"],
+        "propriete": "Code département",
+    },
+    "circonscriptions": {
+        "fichier": os.path.join(DOSSIER_GEOMETRIES, "circonscriptions.geojson"),
+        "sources": ["res_2022_T1_circo_Haute_Garonne.html"],
+        "propriete": "Code circonscription",
+        "departements": ["31"],
+    },
+    # Aucun contour communal n'est versionné : la couche est construite si le fichier est fourni
+    "communes": {
+        "fichier": os.path.join(DOSSIER_GEOMETRIES, "communes.geojson"),
+        "sources": ["communes.geojson"],
+        "propriete": "code",
+    },
+}
+
+# Niveaux de détail : tolérance de simplification et nombre de décimales conservées (en degrés)
+NIVEAUX = {
+    "fin": {"tolerance": 0.0005, "decimales": 4},
+    "moyen": {"tolerance": 0.002, "decimales": 3},
+    "grossier": {"tolerance": 0.008, "decimales": 3},
+}
+
+# Largeur par défaut d'une carte dans la page, en pixels
+LARGEUR_VUE = 700
+
+# Colonne de la table des candidats servant de code de zone, par couche
+CODES_ZONES = {
+    "departements": ("Code du département", "Libellé du département"),
+    "circonscriptions": ("Code de la circonscription", "Libellé de la circonscription"),
+}
+
+# Couleurs des bords politiques (mêmes couleurs que les cartes folium d'origine)
+COULEURS_BORDS = {
+    "Extrême gauche": "#8B0000",
+    "Gauche": "red",
+    "Centre": "yellow",
+    "Droite": "blue",
+    "Extrême droite": "darkblue",
+    "Divers": "green",
+}
+
+# Cadrage sur la France métropolitaine (les DROM sont loin sur une projection unique)
+CADRAGE_METROPOLE = {"lonaxis_range": [-5.5, 10], "lataxis_range": [41, 51.5]}
+
+
+################
+# LES CONTOURS #
+################
+
+def extraire_contours(fichier_source, propriete, entites=None):
+    """
+    Récupère les polygones d'une carte folium (chaque appel geo_json_xxx_add({...})
+    contient une FeatureCollection) ou d'un fichier GeoJSON.
+    Seuls la géométrie et le code sont conservés.
+    """
+    with open(fichier_source, "r", encoding="utf-8") as fichier:
+        contenu = fichier.read()
+    entites = {} if entites is None else entites
+    if fichier_source.endswith(".geojson"):
+        collections = [json.loads(contenu)]
+    else:
+        decodeur = json.JSONDecoder()
+        collections = []
+        for appel in re.finditer(r"_add\(\{", contenu):
+            try:
+                collections.append(decodeur.raw_decode(contenu, appel.end() - 1)[0])
+            except ValueError:
+                continue
+    for collection in collections:
+        for entite in collection.get("features", []):
+            code = str(entite.get("properties", {}).get(propriete, "")).strip()
+            if code and entite.get("geometry") and code.zfill(2) not in entites:
+                entites[code.zfill(2)] = {
+                    "type": "Feature",
+                    "properties": {"code": code.zfill(2)},
+                    "geometry": entite["geometry"],
+                }
+    return entites
+
+
+def chemin_geometrie(couche, niveau=None):
+    """Fichier GeoJSON d'une couche : pleine résolution, ou niveau de détail donné."""
+    fichier = COUCHES[couche]["fichier"]
+    if niveau is None:
+        return fichier
+    base, extension = os.path.splitext(fichier)
+    return f"{base}_{niveau}{extension}"
+
+
+def ecrire_geojson(collection, chemin):
+    os.makedirs(os.path.dirname(chemin), exist_ok=True)
+    with open(chemin, "w", encoding="utf-8") as fichier:
+        json.dump(collection, fichier, separators=(",", ":"))
+
+
+def construire_geometries(dossier="."):
+    """Écrit, pour chaque couche, le GeoJSON pleine résolution puis ses niveaux de détail."""
+    for nom, couche in COUCHES.items():
+        entites = {}
+        for source in couche["sources"]:
+            chemin_source = os.path.join(dossier, source)
+            if os.path.exists(chemin_source):
+                extraire_contours(chemin_source, couche["propriete"], entites)
+        if not entites:
+            print(f"{nom} : aucune source disponible, couche ignorée")
+            continue
+        collection = {"type": "FeatureCollection", "features": list(entites.values())}
+        ecrire_geojson(collection, os.path.join(dossier, chemin_geometrie(nom)))
+        print(f"{nom} : {len(collection['features'])} contours")
+        for niveau, parametres in NIVEAUX.items():
+            chemin = os.path.join(dossier, chemin_geometrie(nom, niveau))
+            ecrire_geojson(simplifier_collection(collection, **parametres), chemin)
+            print(f"  {niveau} -> {chemin} ({os.path.getsize(chemin) // 1024} Ko)")
+
+
+@functools.lru_cache(maxsize=None)
+def charger_geometrie(couche, niveau=None):
+    """
+    Contours d'une couche, lus une seule fois par processus (à ne pas modifier).
+    Sans fichier pour le niveau demandé, la pleine résolution est utilisée.
+    """
+    chemin = chemin_geometrie(couche, niveau)
+    if not os.path.exists(chemin):
+        chemin = chemin_geometrie(couche)
+    with open(chemin, "r", encoding="utf-8") as fichier:
+        return json.load(fichier)
+
+
+def source_geometrie(couche, niveau=None):
+    """
+    Contours à transmettre à Plotly : l'URL du GeoJSON en mode fichiers statiques
+    (le navigateur le télécharge une fois et le garde en cache), sinon le GeoJSON lui-même.
+    """
+    chemin = chemin_geometrie(couche, niveau)
+    if not os.path.exists(chemin):
+        chemin = chemin_geometrie(couche)
+    url = url_carte(chemin)
+    return url if url is not None else charger_geometrie(couche, niveau)
+
+
+def codes_disponibles(couche):
+    return set(emprises(couche))
+
+
+@functools.lru_cache(maxsize=None)
+def emprises(couche):
+    """Rectangle englobant (xmin, ymin, xmax, ymax) de chaque contour, par code."""
+    resultat = {}
+    for entite in charger_geometrie(couche)["features"]:
+        points = np.array([point[:2] for anneau in anneaux(entite["geometry"]) for point in anneau])
+        resultat[entite["properties"]["code"]] = (*points.min(axis=0), *points.max(axis=0))
+    return resultat
+
+
+def choisir_niveau(etendue, largeur=LARGEUR_VUE):
+    """
+    Niveau de détail le plus grossier dont la tolérance reste sous le demi-pixel :
+    `etendue` est la plus grande dimension affichée, en degrés.
+    """
+    demi_pixel = etendue / largeur / 2
+    adaptes = [niveau for niveau, parametres in NIVEAUX.items() if parametres["tolerance"] <= demi_pixel]
+    if not adaptes:
+        return None
+    return max(adaptes, key=lambda niveau: NIVEAUX[niveau]["tolerance"])
+
+
+def etendue_codes(couche, codes):
+    """Plus grande dimension, en degrés, du rectangle englobant les codes affichés."""
+    boites = [emprises(couche)[code] for code in codes if code in emprises(couche)]
+    if not boites:
+        return 0
+    boites = np.array(boites)
+    return max(boites[:, 2].max() - boites[:, 0].min(), boites[:, 3].max() - boites[:, 1].min())
+
+
+##################
+# SIMPLIFICATION #
+##################
+
+def anneaux(geometrie):
+    """Tous les anneaux (extérieurs et trous) d'un Polygon ou MultiPolygon."""
+    if geometrie["type"] == "Polygon":
+        return list(geometrie["coordinates"])
+    return [anneau for polygone in geometrie["coordinates"] for anneau in polygone]
+
+
+def polygones(geometrie):
+    if geometrie["type"] == "Polygon":
+        return [geometrie["coordinates"]]
+    return geometrie["coordinates"]
+
+
+def quantifier(anneau, decimales):
+    """Arrondit les coordonnées puis retire les points consécutifs confondus (anneau ouvert)."""
+    points = np.round(np.asarray(anneau, dtype=float)[:, :2], decimales)
+    garder = np.ones(len(points), dtype=bool)
+    garder[1:] = np.any(points[1:] != points[:-1], axis=1)
+    points = points[garder]
+    if len(points) > 1 and np.all(points[0] == points[-1]):
+        points = points[:-1]
+    return points
+
+
+def douglas_peucker(points, tolerance):
+    """Masque des points conservés par l'algorithme de Douglas-Peucker (extrémités fixes)."""
+    garder = np.zeros(len(points), dtype=bool)
+    garder[0] = garder[-1] = True
+    pile = [(0, len(points) - 1)]
+    while pile:
+        debut, fin = pile.pop()
+        if fin - debut < 2:
+            continue
+        a, b = points[debut], points[fin]
+        milieu = points[debut + 1:fin]
+        ab = b - a
+        longueur = np.hypot(*ab)
+        if longueur == 0:
+            distances = np.hypot(*(milieu - a).T)
+        else:
+            distances = np.abs(ab[0] * (milieu[:, 1] - a[1]) - ab[1] * (milieu[:, 0] - a[0])) / longueur
+        indice = int(np.argmax(distances))
+        if distances[indice] > tolerance:
+            garder[debut + 1 + indice] = True
+            pile += [(debut, debut + 1 + indice), (debut + 1 + indice, fin)]
+    return garder
+
+
+def simplifier_collection(collection, tolerance, decimales):
+    """
+    Simplifie une FeatureCollection sans ouvrir de trous ni de chevauchements
+    entre contours voisins : comme en TopoJSON, chaque anneau est découpé en arcs
+    aux points de jonction (où l'ensemble des contours voisins change) et chaque
+    arc commun est simplifié une seule fois, puis réutilisé des deux côtés.
+    """
+    entites = collection["features"]
+    # Anneaux quantifiés, rangés comme dans la géométrie d'origine
+    quantifies = [
+        [[quantifier(anneau, decimales) for anneau in polygone] for polygone in polygones(entite["geometry"])]
+        for entite in entites
+    ]
+
+    # Contours auxquels appartient chaque point
+    proprietaires = {}
+    for indice, entite in enumerate(quantifies):
+        for polygone in entite:
+            for anneau in polygone:
+                for point in map(tuple, anneau):
+                    proprietaires.setdefault(point, set()).add(indice)
+
+    arcs_simplifies = {}
+
+    def simplifier_arc(arc):
+        # Même clé quel que soit le sens de parcours : les deux voisins obtiennent le même tracé
+        cle = tuple(map(tuple, arc))
+        inverse = cle[::-1]
+        if inverse < cle:
+            return simplifier_arc(arc[::-1])[::-1]
+        if cle not in arcs_simplifies:
+            arcs_simplifies[cle] = arc[douglas_peucker(arc, tolerance)]
+        return arcs_simplifies[cle]
+
+    def simplifier_anneau(anneau):
+        n = len(anneau)
+        if n < 3:
+            return None
+        voisins = [frozenset(proprietaires[tuple(point)]) for point in anneau]
+        jonctions = [
+            i for i in range(n)
+            if len(voisins[i]) > 2 or voisins[i] != voisins[i - 1] or voisins[i] != voisins[(i + 1) % n]
+        ]
+        if not jonctions:
+            # Anneau sans jonction (île, enclave) : deux points fixes pour garder une surface,
+            # choisis indépendamment du point de départ pour qu'une enclave et le trou
+            # correspondant chez son voisin soient découpés de la même façon
+            premier = int(np.lexsort((anneau[:, 1], anneau[:, 0]))[0])
+            oppose = int(np.argmax(np.hypot(*(anneau - anneau[premier]).T)))
+            jonctions = sorted({premier, oppose})
+        points = []
+        for k, debut in enumerate(jonctions):
+            fin = jonctions[(k + 1) % len(jonctions)]
+            indices = np.arange(debut, fin + 1) if fin > debut else np.r_[np.arange(debut, n), np.arange(0, fin + 1)]
+            points.append(simplifier_arc(anneau[indices])[:-1])
+        points = np.vstack(points)
+        if len(points) < 3:
+            return None
+        return np.vstack([points, points[:1]]).tolist()
+
+    resultat = []
+    for entite, polygones_quantifies in zip(entites, quantifies):
+        nouveaux = []
+        for polygone in polygones_quantifies:
+            exterieur = simplifier_anneau(polygone[0])
+            if exterieur is None:
+                continue
+            trous = [trou for trou in map(simplifier_anneau, polygone[1:]) if trou is not None]
+            nouveaux.append([exterieur] + trous)
+        if not nouveaux:
+            # Contour trop petit pour le niveau : on garde son anneau extérieur quantifié
+            anneau = polygones_quantifies[0][0]
+            nouveaux = [[np.vstack([anneau, anneau[:1]]).tolist()]]
+        resultat.append({
+            "type": "Feature",
+            "properties": entite["properties"],
+            "geometry": {"type": "MultiPolygon", "coordinates": nouveaux},
+        })
+    return {"type": "FeatureCollection", "features": resultat}
+
+
+###############
+# LES VALEURS #
+###############
+
+@functools.lru_cache(maxsize=None)
+def charger_bords(fichier="nuance_politique.csv"):
+    """Correspondance nuance -> bord politique (fichier en latin-1, codes avec espaces)."""
+    bords = pd.read_csv(fichier, sep=";", header=None, names=["Nuance", "Bord"], encoding="latin-1")
+    return dict(zip(bords["Nuance"].str.strip(), bords["Bord"].str.strip()))
+
+
+def resultats_par_zone(candidats, id_election, couche, nb_candidats=3):
+    """
+    Voix par nuance agrégées par zone, puis les nb_candidats premières nuances de
+    chaque zone en colonnes ("Nuance 1", "Voix 1", ...), sans boucle sur les zones.
+    """
+    code, libelle = CODES_ZONES[couche]
+    election = candidats[candidats["id_election"] == id_election]
+    voix = (
+        election.groupby([code, libelle, "Nuance"], observed=True)["Voix"].sum()
+        .reset_index()
+        .sort_values([code, "Voix"], ascending=[True, False])
+    )
+    exprimes = voix.groupby(code, observed=True)["Voix"].transform("sum")
+    voix["% Voix/Exp"] = 100 * voix["Voix"] / exprimes
+    voix["Rang"] = voix.groupby(code, observed=True).cumcount() + 1
+    voix = voix[voix["Rang"] <= nb_candidats]
+    zones = voix.pivot(index=[code, libelle], columns="Rang", values=["Nuance", "Voix", "% Voix/Exp"])
+    zones.columns = [f"{valeur} {rang}" for valeur, rang in zones.columns]
+    zones = zones.reset_index().rename(columns={code: "Code", libelle: "Libellé"})
+    zones["Code"] = zones["Code"].astype(str)
+    zones["Bord 1"] = zones["Nuance 1"].map(charger_bords()).fillna("Divers")
+    return zones
+
+
+##############
+# LES CARTES #
+##############
+
+def choroplethe(couche, codes, classes, couleurs, survol=None, cadrage=None, titre=None, largeur=LARGEUR_VUE):
+    """
+    Carte choroplèthe à classes discrètes en une seule trace (les contours ne sont
+    donc envoyés qu'une fois). `classes` donne la classe de chaque code,
+    `couleurs` l'ordre des classes et leur couleur. Le niveau de détail des
+    contours dépend de l'étendue affichée (cadrage, ou emprise des codes).
+    """
+    codes = list(codes)
+    if cadrage is None:
+        etendue = etendue_codes(couche, codes)
+    else:
+        etendue = max(np.diff(cadrage["lonaxis_range"])[0], np.diff(cadrage["lataxis_range"])[0])
+    niveau = choisir_niveau(etendue, largeur)
+    noms = list(couleurs)
+    indices = pd.Categorical(classes, categories=noms).codes
+    nb = len(noms)
+    # Échelle en escalier : la classe i occupe l'intervalle [i/nb, (i+1)/nb]
+    echelle = []
+    for i, nom in enumerate(noms):
+        echelle += [[i / nb, couleurs[nom]], [(i + 1) / nb, couleurs[nom]]]
+    trace = go.Choropleth(
+        featureidkey="properties.code",
+        locations=codes,
+        z=indices,
+        zmin=-0.5,
+        zmax=nb - 0.5,
+        colorscale=echelle,
+        marker_line_color="black",
+        marker_line_width=0.5,
+        colorbar=dict(tickvals=list(range(nb)), ticktext=noms, title=None),
+        hovertext=survol,
+        hoverinfo="text" if survol is not None else "location",
+    )
+    figure = go.Figure(trace)
+    # Affectation après coup : go.Figure() copierait en profondeur le GeoJSON partagé
+    figure.data[0].geojson = source_geometrie(couche, niveau)
+    if cadrage is None:
+        figure.update_geos(fitbounds="locations", visible=False)
+    else:
+        figure.update_geos(visible=False, **cadrage)
+    figure.update_layout(margin=dict(l=0, r=0, t=40 if titre else 0, b=0), title=titre, height=600)
+    return figure
+
+
+def texte_survol(zones, nb_candidats=3):
+    """Info-bulle : zone puis les premières nuances avec leurs voix."""
+    texte = zones["Code"] + " - " + zones["Libellé"].astype(str)
+    for rang in range(1, nb_candidats + 1):
+        if f"Nuance {rang}" not in zones.columns:
+            break
+        present = zones[f"Nuance {rang}"].notna()
+        ligne = (
+            "<br>" + str(rang) + ". " + zones[f"Nuance {rang}"].astype(str)
+            + " : " + zones[f"Voix {rang}"].fillna(0).astype(int).astype(str) + " voix ("
+            + zones[f"% Voix/Exp {rang}"].astype(float).round(2).astype(str) + " %)"
+        )
+        texte = texte + ligne.where(present, "")
+    return texte
+
+
+def carte_resultats(candidats, id_election, couche="departements"):
+    """
+    Carte des nuances arrivées en tête par zone, colorée selon le bord politique.
+    Une couche partielle (clé "departements" de COUCHES) ne porte que sur les
+    départements qu'elle couvre. Retourne la figure et les zones sans contour
+    disponible ("code - libellé"), qui ne sont pas représentées.
+    """
+    couverts = COUCHES[couche].get("departements")
+    if couverts is not None:
+        candidats = candidats[candidats["Code du département"].isin(couverts)]
+    zones = resultats_par_zone(candidats, id_election, couche)
+    representees = zones["Code"].isin(codes_disponibles(couche))
+    sans_contour = (zones["Code"] + " - " + zones["Libellé"].astype(str))[~representees].tolist()
+    zones = zones[representees]
+    figure = choroplethe(
+        couche,
+        zones["Code"],
+        zones["Bord 1"],
+        COULEURS_BORDS,
+        survol=texte_survol(zones),
+        cadrage=CADRAGE_METROPOLE if couverts is None and couche == "departements" else None,
+    )
+    return figure, sans_contour
+
+
+if __name__ == "__main__":
+    construire_geometries()
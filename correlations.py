@@ -0,0 +1,197 @@
+"""
+Corrélations en lot entre indicateurs socio-économiques et résultats électoraux.
+
+Deux matrices alignées sur la clé département : les indicateurs (pauvreté,
+chômage par année, tranches d'âge, déciles de revenu, QPV) et les résultats
+(abstention, blancs et nuls de chaque élection, part des voix de chaque bord
+politique aux premiers tours des législatives). Les colonnes sont indexées
+par (famille, libellé).
+
+Toutes les corrélations indicateur x résultat sont obtenues d'un coup par
+produits matriciels, sur les paires de valeurs présentes des deux côtés. Les
+intervalles de confiance viennent d'un bootstrap sur les départements, dont
+les tirages sont traités par lots sous forme de poids.
+"""
+import numpy as np
+import pandas as pd
+
+from referentiel import INDEX_CODES, normaliser_code
+
+METHODES = ('pearson', 'spearman')
+
+# Libellés des tranches d'âge du fichier démographique
+TRANCHES = {'prop014': '0-14 ans', 'prop1539': '15-39 ans', 'prop4059': '40-59 ans', 'prop60p': '60+ ans'}
+
+# Taux pondérés du cube retenus comme résultats
+RESULTATS_CUBE = {'Abstention': 'Taux Abs/Ins', 'Blancs': 'Taux Blancs/Ins', 'Nuls': 'Taux Nuls/Ins'}
+
+# Effectif minimal d'une paire pour calculer une corrélation
+EFFECTIF_MINIMAL = 5
+
+
+################
+# LES MATRICES #
+################
+
+def colonnes(famille, table):
+    """Préfixe les colonnes d'une table (index : clé département) par leur famille."""
+    table = table.copy()
+    table.columns = pd.MultiIndex.from_product([[famille], [str(colonne) for colonne in table.columns]])
+    return table
+
+
+def indicateurs_departements(pauvrete=None, chomage=None, demographie=None, revenus=None):
+    """Matrice département x indicateur ; une source absente (None ou vide) est simplement omise."""
+    blocs = []
+    if pauvrete is not None and not pauvrete.empty:
+        taux = pauvrete.set_index('cle_departement')[['tp60_a17', 'DISP_TP60_A21']]
+        blocs.append(colonnes('Pauvreté', taux.set_axis(['2017', '2021'], axis=1)))
+    if chomage is not None and not chomage.empty:
+        annees = [colonne for colonne in chomage.columns if colonne.isdigit()]
+        blocs.append(colonnes('Chômage', chomage.set_index('cle_departement')[annees]))
+    if demographie is not None and not demographie.empty:
+        for colonne, tranche in TRANCHES.items():
+            blocs.append(colonnes(f'Âge {tranche}', demographie.pivot(index='cle_departement', columns='Annee', values=colonne)))
+    if revenus is not None:
+        cles = INDEX_CODES.get_indexer([normaliser_code(code) for code in revenus.codes])
+        connus = cles >= 0
+        for d, decile in enumerate(revenus.deciles):
+            blocs.append(colonnes(f'Revenu D{decile}', pd.DataFrame(revenus.revenus[connus, d, :], index=cles[connus],
+                                                                     columns=revenus.annees)))
+        blocs.append(colonnes('QPV', pd.DataFrame(revenus.qpv[connus], index=cles[connus], columns=revenus.annees)))
+    if not blocs:
+        return pd.DataFrame()
+    matrice = pd.concat(blocs, axis=1).astype(float)
+    matrice.index.name = 'cle_departement'
+    return matrice
+
+
+def resultats_departements(cube=None, candidats=None, bords=None):
+    """
+    Matrice département x résultat : taux pondérés du cube par élection, et part
+    des voix de chaque bord (nuances regroupées par `bords`) aux premiers tours
+    des législatives par circonscription.
+    """
+    blocs = []
+    if cube is not None and not cube.empty:
+        for famille, colonne in RESULTATS_CUBE.items():
+            blocs.append(colonnes(famille, cube.pivot_table(index='cle_departement', columns='id_election',
+                                                            values=colonne, observed=True)))
+    if candidats is not None and not candidats.empty and bords:
+        premiers = candidats[candidats['id_election'].astype(str).str.endswith('t1')]
+        bord = premiers['Nuance'].astype(str).str.strip().map(bords).fillna('Divers')
+        voix = premiers.groupby(['cle_departement', premiers['id_election'].astype(str), bord], observed=True)['Voix'].sum()
+        parts = 100 * voix / voix.groupby(level=[0, 1]).transform('sum')
+        parts = parts.unstack(level=[2, 1])
+        for nom in sorted(parts.columns.get_level_values(0).unique()):
+            blocs.append(colonnes(nom, parts[nom]))
+    if not blocs:
+        return pd.DataFrame()
+    matrice = pd.concat(blocs, axis=1).astype(float)
+    matrice = matrice[matrice.index >= 0]
+    matrice.index.name = 'cle_departement'
+    return matrice
+
+
+#############
+# LE CALCUL #
+#############
+
+def standardiser(valeurs):
+    """Centre et réduit chaque colonne sur ses valeurs présentes (stabilité numérique des sommes)."""
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ecart = np.nanstd(valeurs, axis=0)
+        return (valeurs - np.nanmean(valeurs, axis=0)) / np.where(ecart > 0, ecart, 1.0)
+
+
+def rangs(valeurs):
+    """Rangs moyens de chaque colonne sur ses valeurs présentes (NaN conservés)."""
+    return pd.DataFrame(valeurs).rank().to_numpy()
+
+
+def pearson_pondere(x, y, poids):
+    """
+    Corrélations de toutes les colonnes de x avec toutes celles de y, sur les
+    paires complètes, pour chaque jeu de poids des lignes.
+
+    x : (n, p), y : (n, q), poids : (B, n) ; renvoie r et l'effectif (B, p, q).
+    Six produits matriciels par lot : effectifs, sommes, sommes des carrés et
+    des produits, restreints aux lignes présentes des deux côtés.
+    """
+    presents_x, presents_y = ~np.isnan(x), ~np.isnan(y)
+    x0, y0 = np.where(presents_x, x, 0.0), np.where(presents_y, y, 0.0)
+    presents_x, presents_y = presents_x.astype(float), presents_y.astype(float)
+
+    def croiser(a, b):
+        return np.matmul((a[None] * poids[:, :, None]).transpose(0, 2, 1), b)
+
+    n = croiser(presents_x, presents_y)
+    sx, sy = croiser(x0, presents_y), croiser(presents_x, y0)
+    sxx, syy = croiser(x0 ** 2, presents_y), croiser(presents_x, y0 ** 2)
+    sxy = croiser(x0, y0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        r = (n * sxy - sx * sy) / np.sqrt((n * sxx - sx ** 2) * (n * syy - sy ** 2))
+    return np.clip(r, -1, 1), n
+
+
+class MatriceCorrelations:
+    """
+    Corrélations de Pearson et de Spearman de chaque indicateur avec chaque
+    résultat, et leurs intervalles de confiance par bootstrap.
+
+    Le Spearman est un Pearson sur les rangs de chaque colonne (calculés sur ses
+    valeurs présentes) ; dans le bootstrap, ces rangs ne sont pas recalculés à
+    chaque tirage. Les paires de moins de EFFECTIF_MINIMAL départements sont NaN.
+    """
+
+    def __init__(self, indicateurs, resultats, tirages=200, niveau=0.95, graine=0, lot=50):
+        departements = indicateurs.index.union(resultats.index)
+        indicateurs, resultats = indicateurs.reindex(departements), resultats.reindex(departements)
+        self.indicateurs = indicateurs.columns
+        self.resultats = resultats.columns
+        self.niveau = niveau
+        tirage = np.random.default_rng(graine)
+        nb = len(departements)
+        # Poids du bootstrap : nombre de fois où chaque département est tiré
+        poids = tirage.multinomial(nb, np.full(nb, 1 / nb), size=tirages).astype(float)
+
+        self.r, self.bas, self.haut = {}, {}, {}
+        for methode in METHODES:
+            x, y = indicateurs.to_numpy(dtype=float), resultats.to_numpy(dtype=float)
+            if methode == 'spearman':
+                x, y = rangs(x), rangs(y)
+            x, y = standardiser(x), standardiser(y)
+            r, n = pearson_pondere(x, y, np.ones((1, nb)))
+            self.effectif = n[0]
+            self.r[methode] = np.where(self.effectif >= EFFECTIF_MINIMAL, r[0], np.nan)
+            echantillons = np.concatenate([pearson_pondere(x, y, poids[debut:debut + lot])[0]
+                                           for debut in range(0, tirages, lot)])
+            with np.errstate(invalid='ignore'):
+                bas, haut = np.nanpercentile(echantillons, [50 * (1 - niveau), 50 * (1 + niveau)], axis=0)
+            self.bas[methode] = np.where(np.isnan(self.r[methode]), np.nan, bas)
+            self.haut[methode] = np.where(np.isnan(self.r[methode]), np.nan, haut)
+
+    def matrice(self, methode='pearson', familles_indicateurs=None, familles_resultats=None):
+        """Coefficients indicateur x résultat, restreints aux familles demandées (toutes par défaut)."""
+        table = pd.DataFrame(self.r[methode], index=self.indicateurs, columns=self.resultats)
+        if familles_indicateurs is not None:
+            table = table.loc[table.index.get_level_values(0).isin(familles_indicateurs)]
+        if familles_resultats is not None:
+            table = table.loc[:, table.columns.get_level_values(0).isin(familles_resultats)]
+        return table
+
+    def table(self, methode='pearson'):
+        """Une ligne par paire : coefficient, bornes de l'intervalle, effectif ; triée par |r| décroissant."""
+        p, q = len(self.indicateurs), len(self.resultats)
+        table = pd.DataFrame({
+            'Famille indicateur': np.repeat(self.indicateurs.get_level_values(0), q),
+            'Indicateur': np.repeat(self.indicateurs.get_level_values(1), q),
+            'Famille résultat': np.tile(self.resultats.get_level_values(0), p),
+            'Résultat': np.tile(self.resultats.get_level_values(1), p),
+            'r': self.r[methode].ravel(),
+            'IC bas': self.bas[methode].ravel(),
+            'IC haut': self.haut[methode].ravel(),
+            'Départements': self.effectif.ravel().astype(int),
+        })
+        table = table.dropna(subset=['r'])
+        return table.iloc[np.argsort(-table['r'].abs().to_numpy(), kind='stable')].reset_index(drop=True)
@@ -0,0 +1,632 @@
+"""
+Chargement des jeux de données du dashboard.
+
+Les fonctions de ce module ne dépendent pas de Streamlit : elles peuvent être
+appelées depuis carte.py (qui ajoute la mise en cache et les messages
+d'erreur) comme depuis un script hors ligne.
+"""
+import contextlib
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from referentiel import cles_circonscriptions, normaliser_departements
+
+# Répertoire des fichiers pré-convertis (non versionné)
+DOSSIER_CACHE = "cache"
+
+# Version des tables pré-converties, à augmenter quand les fonctions de lecture changent
+FORMAT_CACHE = 2
+
+# Colonnes numériques du fichier des élections
+COLONNES_NUMERIQUES = ['Inscrits', 'Abstentions', '% Abs/Ins', 'Votants', '% Vot/Ins', 'Blancs', '% Blancs/Ins',
+                       'Nuls', '% Nuls/Ins', '% Nuls/Vot', 'Exprimés', '% Exp/Ins', '% Exp/Vot']
+
+# Colonnes textuelles très répétées, stockées en catégories
+COLONNES_CATEGORIELLES = ['id_election', 'Libellé du département', 'Libellé de la commune']
+
+
+def chemin_cache(fichier_source, extension=""):
+    """Chemin du dossier pré-converti associé à un fichier source."""
+    nom = os.path.splitext(os.path.basename(fichier_source))[0]
+    return os.path.join(os.path.dirname(fichier_source), DOSSIER_CACHE, nom + extension)
+
+
+def signature_source(fichier_source):
+    """Taille et date de modification du fichier source, et format du cache, pour invalider ce dernier."""
+    stat = os.stat(fichier_source)
+    return {"taille": stat.st_size, "mtime": stat.st_mtime_ns, "format": FORMAT_CACHE}
+
+
+def typer_elections(df):
+    """Convertit les colonnes numériques et catégorielles du fichier des élections, et ajoute la clé département."""
+    for colonne in COLONNES_NUMERIQUES:
+        if colonne in df.columns:
+            df[colonne] = pd.to_numeric(df[colonne], errors='coerce')
+    for colonne in COLONNES_CATEGORIELLES + ['Code du département']:
+        if colonne in df.columns:
+            df[colonne] = df[colonne].astype('category')
+    if 'Code du département' in df.columns:
+        normaliser_departements(df, 'Code du département')
+    return df
+
+
+# Message des écritures refusées sur une table partagée
+LECTURE_SEULE = "table partagée en lecture seule : en dériver une nouvelle (copy, assign, filtre) avant de la modifier"
+
+
+class IndexeurFige:
+    """Indexeur (loc, iloc, at, iat) d'une TableFigee : lecture déléguée, affectation refusée."""
+
+    def __init__(self, indexeur):
+        self._indexeur = indexeur
+
+    def __getitem__(self, cle):
+        return self._indexeur[cle]
+
+    def __getattr__(self, nom):
+        # pandas passe par les méthodes internes de l'indexeur pour les lectures sur plusieurs axes
+        return getattr(self._indexeur, nom)
+
+    def __setitem__(self, cle, valeur):
+        raise ValueError(LECTURE_SEULE)
+
+    def __call__(self, *args, **kwargs):
+        return IndexeurFige(self._indexeur(*args, **kwargs))
+
+
+class TableFigee(pd.DataFrame):
+    """
+    DataFrame partagé entre les sessions, qui refuse toute modification en
+    place : affectation de colonnes, de cellules ou d'attributs (df[...] =,
+    loc, iloc, at, iat, df.x =), ajout et suppression de colonnes, changement
+    des axes et opérations inplace=True lèvent ValueError. Ses blocs ne sont
+    jamais consolidés : chaque colonne garde son tableau d'origine. Les tables
+    qui en sont dérivées (filtres, copy, assign, groupby...) sont des DataFrame
+    ordinaires.
+    """
+
+    @property
+    def _constructor(self):
+        return pd.DataFrame
+
+    def __setitem__(self, cle, valeur):
+        raise ValueError(LECTURE_SEULE)
+
+    def __setattr__(self, nom, valeur):
+        # Les attributs internes de pandas commencent par "_" ; df.x = ... viserait une colonne ou
+        # ajouterait un attribut visible de toutes les sessions
+        if not nom.startswith("_"):
+            raise ValueError(LECTURE_SEULE)
+        super().__setattr__(nom, valeur)
+
+    def __delitem__(self, cle):
+        raise ValueError(LECTURE_SEULE)
+
+    def insert(self, *args, **kwargs):
+        raise ValueError(LECTURE_SEULE)
+
+    def pop(self, *args, **kwargs):
+        raise ValueError(LECTURE_SEULE)
+
+    def _update_inplace(self, *args, **kwargs):
+        # Point de passage des méthodes appelées avec inplace=True
+        raise ValueError(LECTURE_SEULE)
+
+    def _set_axis(self, *args, **kwargs):
+        # df.columns = ... et df.index = ...
+        raise ValueError(LECTURE_SEULE)
+
+    def _consolidate_inplace(self):
+        # pandas regroupe en place les colonnes de même type (.values, .T, filtres, apply...) dans des
+        # tableaux neufs et modifiables, qui remplaceraient les colonnes en lecture seule et projetées en
+        # mémoire de toutes les sessions : la table garde ses blocs, les tables dérivées sont consolidées
+        pass
+
+    @property
+    def loc(self):
+        return IndexeurFige(super().loc)
+
+    @property
+    def iloc(self):
+        return IndexeurFige(super().iloc)
+
+    @property
+    def at(self):
+        return IndexeurFige(super().at)
+
+    @property
+    def iat(self):
+        return IndexeurFige(super().iat)
+
+
+def tableau_fige(valeurs):
+    """Tableau en lecture seule, copié seulement s'il est encore modifiable."""
+    if valeurs.flags.writeable:
+        valeurs = valeurs.copy()
+        valeurs.setflags(write=False)
+    return valeurs
+
+
+def figer(df):
+    """
+    Version partagée d'un DataFrame, en TableFigee : la table elle-même refuse
+    toute modification en place, et les colonnes numériques et les codes des
+    catégories reposent sur des tableaux en lecture seule, si bien qu'une
+    écriture passant par une colonne extraite (df['Inscrits'][0] = ...) lève
+    aussi ValueError au lieu de modifier les données de toutes les sessions.
+
+    Reste une brèche : les colonnes d'objets (texte) restent modifiables par
+    une affectation en chaîne sur la colonne extraite (df['x'][0] = ..., que
+    pandas signale par SettingWithCopyWarning), car pandas 1.5 ne sait pas
+    comparer un tableau d'objets en lecture seule (df['x'] == 'a' échoue).
+    Aucune page ne le fait.
+
+    Les tableaux ne sont copiés qu'une fois ici, et pas du tout s'ils sont déjà
+    en lecture seule (colonnes projetées en mémoire par lire_colonnes). Comme
+    TableFigee ne regroupe jamais ses colonnes, les colonnes projetées le
+    restent tant que la table vit.
+    """
+    colonnes = {}
+    for nom, serie in df.items():
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            valeurs = pd.Categorical.from_codes(tableau_fige(serie.cat.codes.to_numpy()), dtype=serie.dtype)
+        elif isinstance(serie.dtype, np.dtype) and serie.dtype.kind in 'biufcmM':
+            valeurs = tableau_fige(serie.to_numpy())
+        else:
+            valeurs = serie.to_numpy()
+        colonnes[nom] = pd.Series(valeurs, index=df.index, name=nom, copy=False)
+    if not colonnes:
+        return TableFigee(df)
+    return TableFigee(pd.concat(colonnes.values(), axis=1, copy=False))
+
+
+def ecrire_colonnes(df, dossier, signature):
+    """
+    Écrit un DataFrame dans un dossier, un fichier .npy par colonne.
+
+    Les colonnes numériques sont stockées telles quelles, les autres sous forme
+    de codes entiers et de catégories : aucun pickle au chargement, et chaque
+    fichier peut être projeté en mémoire (np.load(..., mmap_mode='r')).
+    """
+    description = []
+    tableaux = {}
+    for i, colonne in enumerate(df.columns):
+        serie = df[colonne]
+        if isinstance(serie.dtype, np.dtype) and serie.dtype.kind in 'biufcmM':
+            tableaux[f"c{i}"] = serie.to_numpy()
+            description.append({"nom": colonne, "type": "numerique"})
+        else:
+            est_categorie = isinstance(serie.dtype, pd.CategoricalDtype)
+            categories = serie if est_categorie else serie.astype(str).where(serie.notna())
+            categories = categories.astype('category')
+            tableaux[f"c{i}"] = categories.cat.codes.to_numpy()
+            tableaux[f"c{i}_categories"] = categories.cat.categories.astype(str).to_numpy(dtype=str)
+            description.append({"nom": colonne, "type": "categorie" if est_categorie else "texte"})
+    meta = {"colonnes": description, "lignes": len(df), "source": signature}
+
+    with dossier_atomique(dossier) as temporaire:
+        for nom, tableau in tableaux.items():
+            np.save(os.path.join(temporaire, nom + ".npy"), tableau, allow_pickle=False)
+        with open(os.path.join(temporaire, "meta.json"), "w", encoding="utf-8") as fichier:
+            json.dump(meta, fichier, ensure_ascii=False)
+
+
+@contextlib.contextmanager
+def dossier_atomique(dossier):
+    """
+    Dossier temporaire à remplir, qui remplace `dossier` d'un coup à la sortie
+    du bloc (et est supprimé en cas d'erreur) : un dossier incomplet n'est
+    jamais exposé, et les processus qui projettent encore les anciens fichiers
+    les gardent valides jusqu'à leur fermeture.
+    """
+    parent = os.path.dirname(dossier) or "."
+    os.makedirs(parent, exist_ok=True)
+    temporaire = tempfile.mkdtemp(prefix=os.path.basename(dossier) + ".", dir=parent)
+    try:
+        yield temporaire
+        ancien = None
+        if os.path.exists(dossier):
+            ancien = temporaire + ".ancien"
+            os.replace(dossier, ancien)
+        os.replace(temporaire, dossier)
+    except BaseException:
+        shutil.rmtree(temporaire, ignore_errors=True)
+        raise
+    if ancien is not None:
+        shutil.rmtree(ancien, ignore_errors=True)
+
+
+def lire_meta(dossier):
+    with open(os.path.join(dossier, "meta.json"), encoding="utf-8") as fichier:
+        return json.load(fichier)
+
+
+def lire_colonnes(dossier):
+    """
+    Relit un dossier écrit par ecrire_colonnes en DataFrame typé.
+
+    Les colonnes numériques et les codes des catégories restent projetés en
+    mémoire, en lecture seule : les pages du fichier sont partagées par le cache
+    du système entre tous les processus qui ouvrent le même dossier, et seules
+    celles effectivement lues deviennent résidentes. Les colonnes de texte sont
+    reconstruites en objets Python, propres à chaque processus.
+    """
+    meta = lire_meta(dossier)
+    index = pd.RangeIndex(meta["lignes"])
+    colonnes = []
+    for i, description in enumerate(meta["colonnes"]):
+        valeurs = np.load(os.path.join(dossier, f"c{i}.npy"), mmap_mode='r', allow_pickle=False)
+        if description["type"] != "numerique":
+            categories = np.load(os.path.join(dossier, f"c{i}_categories.npy"), allow_pickle=False)
+            valeurs = pd.Categorical.from_codes(valeurs, categories=categories)
+            if description["type"] == "texte":
+                valeurs = np.asarray(valeurs, dtype=object)
+        colonnes.append(pd.Series(valeurs, index=index, name=description["nom"], copy=False))
+    if not colonnes:
+        return pd.DataFrame(index=index)
+    return pd.concat(colonnes, axis=1, copy=False)
+
+
+def cache_a_jour(fichier_source, dossier):
+    """Le cache est valable s'il existe et correspond au fichier source (ou si la source est absente)."""
+    if not os.path.isdir(dossier):
+        return False
+    if not os.path.exists(fichier_source):
+        return True
+    try:
+        return lire_meta(dossier)["source"] == signature_source(fichier_source)
+    except (OSError, KeyError, ValueError):
+        return False
+
+
+def convertir(fichier_source, lire):
+    """Conversion unique d'un fichier source, lu par `lire`, vers son dossier pré-converti."""
+    df = lire(fichier_source)
+    ecrire_colonnes(df, chemin_cache(fichier_source), signature_source(fichier_source))
+    return df
+
+
+def charger_table(fichier_source, lire):
+    """
+    Charge une table depuis son dossier pré-converti s'il est à jour, projeté
+    en mémoire plutôt que copié.
+
+    Sinon le fichier source est lu par `lire` puis converti ; l'échec de
+    l'écriture du cache (dossier en lecture seule par exemple) n'empêche pas le
+    chargement. Lève FileNotFoundError si ni la source ni le cache n'existent.
+    """
+    dossier = chemin_cache(fichier_source)
+    if cache_a_jour(fichier_source, dossier):
+        return lire_colonnes(dossier)
+    df = lire(fichier_source)
+    try:
+        ecrire_colonnes(df, dossier, signature_source(fichier_source))
+    except OSError:
+        return df
+    return lire_colonnes(dossier)
+
+
+def lire_elections(fichier_source='data_elections.csv'):
+    return typer_elections(pd.read_csv(fichier_source, low_memory=False))
+
+
+def charger_elections(fichier_source='data_elections.csv'):
+    """Résultats par commune, depuis le cache projeté en mémoire s'il est à jour."""
+    return charger_table(fichier_source, lire_elections)
+
+
+##########################
+# TABLES DEPARTEMENTALES #
+##########################
+
+# Tranches d'âge du fichier démographique (colonnes prop<tranche><année>)
+TRANCHES_AGE = ['014', '1539', '4059', '60p']
+MOTIF_PROPORTION = re.compile(r"prop(014|1539|4059|60p)(\d{4})")
+
+
+def lire_chomage(fichier='taux_chomage_par_departement.csv'):
+    return normaliser_departements(pd.read_csv(fichier), 'DEP_CODE')
+
+
+def charger_chomage(fichier='taux_chomage_par_departement.csv'):
+    """Taux de chômage par département, codes canoniques ('01', '2A', '971') et clé département."""
+    return charger_table(fichier, lire_chomage)
+
+
+def lire_demographie(fichier='df_age.csv'):
+    """Passe le fichier large (une colonne par tranche et par année) au format long : une ligne par département et par année."""
+    large = normaliser_departements(pd.read_csv(fichier), 'dep')
+    colonnes = [colonne for colonne in large.columns if MOTIF_PROPORTION.fullmatch(colonne)]
+    proportions = [f'prop{tranche}' for tranche in TRANCHES_AGE]
+    df = pd.wide_to_long(large[['cle_departement', 'dep', 'nomdep'] + colonnes], stubnames=proportions,
+                         i='cle_departement', j='Annee').reset_index()
+    for colonne in proportions:
+        # Proportions parfois stockées en décimales
+        if df[colonne].max() <= 1:
+            df[colonne] = df[colonne] * 100
+    df = df[['cle_departement', 'dep', 'nomdep', 'Annee'] + proportions].astype({'cle_departement': np.int16})
+    return df.sort_values(['Annee', 'cle_departement'], ignore_index=True)
+
+
+def charger_demographie(fichier='df_age.csv'):
+    """Proportions par tranche d'âge (prop014, prop1539...) en pourcentages, par département et par année."""
+    return charger_table(fichier, lire_demographie)
+
+
+def lire_pauvrete(fichier='moyenne_pauvrete_par_departement.csv'):
+    return normaliser_departements(pd.read_csv(fichier), 'departement')
+
+
+def charger_pauvrete(fichier='moyenne_pauvrete_par_departement.csv'):
+    """Taux de pauvreté moyen par département, avec la clé département."""
+    return charger_table(fichier, lire_pauvrete)
+
+
+# Tables pré-converties par `python donnees.py`, et leur fonction de lecture
+TABLES_PRECONVERTIES = {
+    'data_elections.csv': lire_elections,
+    'df_age.csv': lire_demographie,
+    'moyenne_pauvrete_par_departement.csv': lire_pauvrete,
+    'taux_chomage_par_departement.csv': lire_chomage,
+}
+
+
+########################################
+# CANDIDATS PAR CIRCONSCRIPTION (LONG) #
+########################################
+
+# Fichiers de résultats par circonscription, par identifiant d'élection
+FICHIERS_CIRCONSCRIPTIONS = {
+    "2017_legi_t1": "circo_2017_T1.csv",
+    "2017_legi_t2": "circo_2017_T2.csv",
+    "2022_legi_t1": "circo_2022_T1.csv",
+    "2022_legi_t2": "circo_2022_T2.csv",
+    "2024_legi_t1": "circo_2024_T1.csv",
+    "2024_legi_t2": "circo_2024_T2.csv",
+}
+
+# Noms des champs d'un bloc candidat selon le millésime (premier bloc, suffixe " 1" retiré)
+CHAMPS_CANDIDAT = {
+    'N°Panneau': 'N°Panneau', 'Numéro de panneau': 'N°Panneau',
+    'Sexe': 'Sexe', 'Sexe candidat': 'Sexe',
+    'Nom': 'Nom', 'Nom candidat': 'Nom',
+    'Prénom': 'Prénom', 'Prénom candidat': 'Prénom',
+    'Nuance': 'Nuance', 'Nuance candidat': 'Nuance',
+    'Voix': 'Voix',
+    '% Voix/Ins': '% Voix/Ins', '% Voix/inscrits': '% Voix/Ins',
+    '% Voix/Exp': '% Voix/Exp', '% Voix/exprimés': '% Voix/Exp',
+    'Sièges': 'Elu', 'Elu': 'Elu',
+}
+
+# Colonnes de la circonscription conservées sur chaque ligne candidat
+CHAMPS_CIRCONSCRIPTION = {
+    'Code du département': 'Code du département', 'Code département': 'Code du département',
+    'Libellé du département': 'Libellé du département', 'Libellé département': 'Libellé du département',
+    'Code de la circonscription': 'Code de la circonscription',
+    'Code circonscription législative': 'Code de la circonscription',
+    'Libellé de la circonscription': 'Libellé de la circonscription',
+    'Libellé circonscription législative': 'Libellé de la circonscription',
+    'Inscrits': 'Inscrits', 'Exprimés': 'Exprimés',
+}
+
+SEXES = {'M': 'MASCULIN', 'F': 'FEMININ', 'MASCULIN': 'MASCULIN', 'FEMININ': 'FEMININ'}
+
+
+def en_nombre(serie):
+    """Convertit '50,87', '50.65' ou '71,20%' en flottant."""
+    texte = serie.astype(str).str.replace('%', '', regex=False).str.replace(',', '.', regex=False).str.strip()
+    return pd.to_numeric(texte, errors='coerce')
+
+
+def lire_candidats_circonscriptions(fichier, id_election):
+    """
+    Passe un fichier circo_*_T*.csv du format large (un bloc de colonnes par
+    candidat) au format long (une ligne par candidat), sans boucle sur les lignes.
+    """
+    brut = pd.read_csv(fichier, sep=';', dtype=str)
+    entetes = list(brut.columns)
+    debut = next(i for i, nom in enumerate(entetes) if nom.startswith(('N°Panneau', 'Numéro de panneau')))
+
+    # Nom du champ sans le numéro de bloc ("Voix 3") ni le suffixe de doublon pandas ("Voix.2")
+    champs = [nom.split('.')[0].rstrip(' 0123456789') for nom in entetes[debut:]]
+    # Largeur d'un bloc : jusqu'à la réapparition du premier champ
+    largeur = champs.index(champs[0], 1)
+    champs = [CHAMPS_CANDIDAT[nom] for nom in champs[:largeur]]
+
+    # Le dernier bloc peut être tronqué : on complète avant le reshape
+    blocs = brut.iloc[:, debut:].to_numpy(dtype=object)
+    manque = (-blocs.shape[1]) % largeur
+    if manque:
+        blocs = np.hstack([blocs, np.full((len(blocs), manque), np.nan, dtype=object)])
+    nb_blocs = blocs.shape[1] // largeur
+    candidats = pd.DataFrame(blocs.reshape(len(blocs) * nb_blocs, largeur), columns=champs)
+
+    # Colonnes de la circonscription répétées pour chaque bloc
+    circonscription = brut.iloc[:, :debut].rename(columns=CHAMPS_CIRCONSCRIPTION)
+    circonscription = circonscription[[c for c in dict.fromkeys(CHAMPS_CIRCONSCRIPTION.values()) if c in circonscription.columns]]
+    circonscription = circonscription.loc[circonscription.index.repeat(nb_blocs)].reset_index(drop=True)
+    resultat = pd.concat([circonscription, candidats], axis=1)
+    resultat = resultat[resultat['Voix'].notna()].reset_index(drop=True)
+
+    # Normalisation des types et des codes ('ZA' en 2017 et 2022, '971' en 2024)
+    normaliser_departements(resultat, 'Code du département')
+    numero = resultat['Code de la circonscription'].str.strip().str.zfill(2).str[-2:]
+    resultat['Code de la circonscription'] = resultat['Code du département'] + numero
+    resultat['cle_circonscription'] = cles_circonscriptions(resultat['cle_departement'], numero)
+    resultat['N°Panneau'] = en_nombre(resultat['N°Panneau']).astype('Int64')
+    for colonne in ['Inscrits', 'Exprimés', 'Voix', '% Voix/Ins', '% Voix/Exp']:
+        resultat[colonne] = en_nombre(resultat[colonne])
+    resultat['Elu'] = resultat['Elu'].fillna('').str.strip().str.lower().isin(['elu', 'élu'])
+    resultat['Sexe'] = resultat['Sexe'].str.strip().map(SEXES)
+    resultat.insert(0, 'id_election', id_election)
+    return resultat
+
+
+def charger_candidats_circonscriptions(dossier="."):
+    """Table longue des candidats de toutes les législatives par circonscription."""
+    tables = [
+        lire_candidats_circonscriptions(os.path.join(dossier, fichier), id_election)
+        for id_election, fichier in FICHIERS_CIRCONSCRIPTIONS.items()
+    ]
+    resultat = pd.concat(tables, ignore_index=True)
+    for colonne in ['id_election', 'Code du département', 'Libellé du département', 'Code de la circonscription',
+                    'Libellé de la circonscription', 'Sexe', 'Nuance']:
+        resultat[colonne] = resultat[colonne].astype('category')
+    return resultat
+
+
+###########################
+# REVENUS PAR DEPARTEMENT #
+###########################
+
+MOTIF_REVENU = re.compile(r"revenu_disp_d(\d+)_(\d{4})")
+
+
+class RevenusDepartements:
+    """
+    Données de departements_pauvrete.csv rangées en tableaux indexés par département.
+
+    - qpv : nombre de QPV, département x année ;
+    - revenus : revenu disponible, département x décile x année ;
+    - augmentation : pourcentage d'augmentation, département x décile.
+
+    Les tableaux sont en lecture seule ; ligne() donne la position d'un
+    département, les vues par département sont de simples tranches.
+    """
+
+    def __init__(self, df):
+        self.codes = df['dept'].to_numpy()
+        self.libelles = df['lib_dept'].to_numpy()
+        self.positions = {code: i for i, code in enumerate(self.codes)}
+
+        colonnes_revenu = {MOTIF_REVENU.fullmatch(c).groups(): c for c in df.columns if MOTIF_REVENU.fullmatch(c)}
+        self.deciles = sorted({decile for decile, _ in colonnes_revenu}, key=int)
+        self.annees = sorted({annee for _, annee in colonnes_revenu})
+        self.revenus = df[[colonnes_revenu[(decile, annee)] for decile in self.deciles for annee in self.annees]] \
+            .to_numpy(dtype=float).reshape(len(df), len(self.deciles), len(self.annees))
+        self.qpv = df[[f"nb_qpv_{annee}" for annee in self.annees]].to_numpy()
+        self.augmentation = df[[f"pourc_augm_d{decile}" for decile in self.deciles]].to_numpy(dtype=float)
+        for tableau in (self.revenus, self.qpv, self.augmentation):
+            tableau.setflags(write=False)
+
+    def ligne(self, code):
+        """Position du département dans les tableaux. Lève KeyError si le code est inconnu."""
+        return self.positions[code]
+
+
+def charger_revenus_departements(fichier='departements_pauvrete.csv'):
+    """Lit le fichier large des revenus une seule fois et le range par département."""
+    return RevenusDepartements(pd.read_csv(fichier, dtype={'dept': str}))
+
+
+#################
+# BAROMETRE INA #
+#################
+
+COLONNES_BAROMETRE = ['Annee', 'Mois', 'Chaîne', 'PartdAudience', 'Thématique', 'Nb_Thème', 'Nb_temps']
+
+
+def charger_barometre_ina(fichier='ina-barometre-jt-tv-donnee-mois-theme-2000-2020.csv'):
+    """Baromètre thématique des JT (INA), une ligne par mois, chaîne et thème."""
+    df = pd.read_csv(fichier, delimiter=';')
+    df.columns = COLONNES_BAROMETRE
+    df['Annee'] = df['Annee'].astype(int)
+    df['Mois'] = df['Mois'].astype(int)
+    df['Nb_Thème'] = pd.to_numeric(df['Nb_Thème'], errors='coerce')
+    df['Nb_temps'] = pd.to_numeric(df['Nb_temps'], errors='coerce')
+    return df
+
+
+####################################
+# HISTORIQUE DES CANDIDATS (2002+) #
+####################################
+
+class HistoriqueCandidats:
+    """
+    Candidats de toutes les élections (df_all_export.csv), stockés partitionnés
+    par année dans le cache pré-converti : un dossier ecrire_colonnes par année,
+    projeté en mémoire seulement quand cette année est demandée.
+
+    Nuance, Sexe et Orientation sont des catégories communes à toutes les
+    partitions. Les sommes de Voix et d'Elu par (Annee, Sexe, Nuance) sont
+    calculées à la conversion et gardées seules en mémoire : une requête ne
+    touche que les quelques lignes agrégées de l'année demandée, quelle que
+    soit la taille de l'historique.
+    """
+
+    def __init__(self, dossier):
+        self.dossier = dossier
+        sommes = lire_colonnes(os.path.join(dossier, "sommes"))
+        self.sommes = sommes.set_index(['Annee', 'Sexe', 'Nuance']).sort_index()
+        self.annees = sorted(sommes['Annee'].unique().tolist())
+        self.sexes = list(sommes['Sexe'].cat.categories)
+
+    def partition(self, annee):
+        """Candidats d'une année, lus depuis sa partition ; table vide pour une année absente."""
+        if annee not in self.annees:
+            return pd.DataFrame()
+        return lire_colonnes(os.path.join(self.dossier, str(annee)))
+
+    def voix_elus(self, annee, sexes):
+        """Voix et élus par nuance pour une année et des sexes donnés, par voix décroissantes."""
+        if annee not in self.annees:
+            return pd.DataFrame(columns=['Nuance', 'Voix', 'Elu'])
+        bloc = self.sommes.loc[annee]
+        bloc = bloc[bloc.index.get_level_values('Sexe').isin(list(sexes))]
+        resultat = bloc.groupby(level='Nuance', observed=True).sum().reset_index()
+        resultat['Nuance'] = resultat['Nuance'].astype(str)
+        return resultat.sort_values('Voix', ascending=False, ignore_index=True)
+
+
+def lire_historique_candidats(fichier='df_all_export.csv'):
+    df = pd.read_csv(fichier, delimiter=';')
+    for colonne in ['Nuance', 'Sexe', 'Orientation']:
+        if colonne in df.columns:
+            df[colonne] = df[colonne].astype('category')
+    return df
+
+
+def ecrire_historique_candidats(df, dossier, signature):
+    """Une partition par année et la table des sommes, remplacées ensemble ; meta.json porte la signature de la source."""
+    with dossier_atomique(dossier) as temporaire:
+        for annee, partition in df.groupby('Annee'):
+            ecrire_colonnes(partition.reset_index(drop=True), os.path.join(temporaire, str(annee)), signature)
+        sommes = df.groupby(['Annee', 'Sexe', 'Nuance'], observed=True)[['Voix', 'Elu']].sum().reset_index()
+        ecrire_colonnes(sommes, os.path.join(temporaire, "sommes"), signature)
+        with open(os.path.join(temporaire, "meta.json"), "w", encoding="utf-8") as fichier:
+            json.dump({"source": signature}, fichier)
+
+
+def charger_historique_candidats(fichier='df_all_export.csv'):
+    """
+    Historique partitionné par année, converti une seule fois. Si le cache
+    n'est pas accessible en écriture, les partitions sont écrites dans un
+    dossier temporaire. Lève FileNotFoundError si ni la source ni le cache
+    n'existent.
+    """
+    dossier = chemin_cache(fichier)
+    if not cache_a_jour(fichier, dossier):
+        df = lire_historique_candidats(fichier)
+        try:
+            ecrire_historique_candidats(df, dossier, signature_source(fichier))
+        except OSError:
+            dossier = os.path.join(tempfile.mkdtemp(prefix="historique."), "partitions")
+            ecrire_historique_candidats(df, dossier, signature_source(fichier))
+    return HistoriqueCandidats(dossier)
+
+
+if __name__ == "__main__":
+    # Usage : python donnees.py [fichier.csv ...] (par défaut toutes les tables pré-converties)
+    for source in sys.argv[1:] or list(TABLES_PRECONVERTIES):
+        if not os.path.exists(source):
+            print(f"{source} absent, ignoré")
+            continue
+        resultat = convertir(source, TABLES_PRECONVERTIES[os.path.basename(source)])
+        print(f"{len(resultat)} lignes converties vers {chemin_cache(source)}")
@@ -0,0 +1,126 @@
+"""
+Exports téléchargeables des tables du dashboard.
+
+Le fichier n'est produit qu'au clic sur le bouton de téléchargement (données
+différées de st.download_button) : l'affichage d'une page ne sérialise ni ne
+hache plus la table. L'encodage se fait par blocs de lignes, directement dans
+un fichier de cache/exports nommé d'après une empreinte du jeu de données
+(taille et date de ses fichiers sources) et des filtres appliqués ; un
+nouveau téléchargement du même export relit ce fichier.
+
+Le module ne dépend pas de Streamlit.
+"""
+import hashlib
+import importlib.util
+import os
+import tempfile
+import zlib
+
+from donnees import DOSSIER_CACHE, signature_source
+
+DOSSIER_EXPORTS = os.path.join(DOSSIER_CACHE, "exports")
+
+# Formats proposés : libellé, extension du fichier et type MIME
+FORMATS = {
+    'csv': {'libelle': 'CSV', 'extension': 'csv', 'mime': 'text/csv'},
+    'csv.gz': {'libelle': 'CSV compressé (gzip)', 'extension': 'csv.gz', 'mime': 'application/gzip'},
+    'parquet': {'libelle': 'Parquet', 'extension': 'parquet', 'mime': 'application/vnd.apache.parquet'},
+}
+
+# Lignes encodées à la fois
+TAILLE_BLOC = 50_000
+
+# Nombre d'exports conservés dans le dossier (les plus anciens sont supprimés)
+EXPORTS_CONSERVES = 20
+
+
+def formats_disponibles():
+    """Formats utilisables ici : Parquet seulement si pyarrow est installé."""
+    return [nom for nom in FORMATS if nom != 'parquet' or importlib.util.find_spec('pyarrow') is not None]
+
+
+def empreinte_export(nom, sources=(), **filtres):
+    """Empreinte d'un export : nom du jeu, taille et date de ses fichiers sources, filtres. Ne lit pas les données."""
+    hachage = hashlib.blake2b(digest_size=12)
+    hachage.update(repr((nom, sorted(filtres.items()))).encode())
+    for source in sources:
+        signature = signature_source(source) if os.path.exists(source) else None
+        hachage.update(repr((source, signature)).encode())
+    return hachage.hexdigest()
+
+
+def blocs_csv(df, taille_bloc=TAILLE_BLOC):
+    """CSV de la table (en-tête puis lignes) par blocs d'octets."""
+    yield df.iloc[:0].to_csv(index=False).encode('utf-8')
+    for debut in range(0, len(df), taille_bloc):
+        yield df.iloc[debut:debut + taille_bloc].to_csv(index=False, header=False).encode('utf-8')
+
+
+def blocs_gzip(blocs):
+    """Compression gzip d'une suite de blocs, bloc par bloc."""
+    compresseur = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    for bloc in blocs:
+        sortie = compresseur.compress(bloc)
+        if sortie:
+            yield sortie
+    yield compresseur.flush()
+
+
+def ecrire_parquet(df, fichier, taille_bloc=TAILLE_BLOC):
+    """Fichier Parquet écrit par groupes de lignes."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    schema = pa.Schema.from_pandas(df, preserve_index=False)
+    with pq.ParquetWriter(fichier, schema) as ecrivain:
+        for debut in range(0, len(df), taille_bloc):
+            ecrivain.write_table(pa.Table.from_pandas(df.iloc[debut:debut + taille_bloc], schema=schema, preserve_index=False))
+
+
+def ecrire_export(df, format, fichier):
+    """Écrit la table dans un fichier binaire ouvert, au format demandé."""
+    if format == 'parquet':
+        ecrire_parquet(df, fichier)
+        return
+    blocs = blocs_csv(df)
+    if format == 'csv.gz':
+        blocs = blocs_gzip(blocs)
+    for bloc in blocs:
+        fichier.write(bloc)
+
+
+def purger(dossier=DOSSIER_EXPORTS, conserves=EXPORTS_CONSERVES):
+    fichiers = sorted((os.path.join(dossier, nom) for nom in os.listdir(dossier) if not nom.endswith('.tmp')),
+                      key=os.path.getmtime, reverse=True)
+    for chemin in fichiers[conserves:]:
+        try:
+            os.remove(chemin)
+        except OSError:
+            pass
+
+
+def ouvrir_export(table, format, empreinte):
+    """
+    Fichier binaire ouvert contenant l'export. `table` est un DataFrame ou une
+    fonction qui le renvoie, appelée seulement si l'export n'est pas déjà dans
+    le cache. Si le dossier du cache n'est pas accessible en écriture, l'export
+    est écrit dans un fichier temporaire.
+    """
+    chemin = os.path.join(DOSSIER_EXPORTS, f"{empreinte}.{FORMATS[format]['extension']}")
+    if os.path.exists(chemin):
+        return open(chemin, 'rb')
+    df = table() if callable(table) else table
+    temporaire = f"{chemin}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(DOSSIER_EXPORTS, exist_ok=True)
+        with open(temporaire, 'wb') as fichier:
+            ecrire_export(df, format, fichier)
+        os.replace(temporaire, chemin)
+        purger()
+        return open(chemin, 'rb')
+    except OSError:
+        if os.path.exists(temporaire):
+            os.remove(temporaire)
+        fichier = tempfile.TemporaryFile()
+        ecrire_export(df, format, fichier)
+        fichier.seek(0)
+        return fichier
@@ -0,0 +1,86 @@
+"""
+Rendu des graphiques matplotlib en images mises en cache.
+
+Chaque graphique est tracé par une fonction qui reçoit toutes ses données en
+arguments et renvoie la figure. La figure est convertie une seule fois en
+octets (PNG ou SVG) par combinaison de fonction et de données, puis fermée
+aussitôt : le processus du serveur ne garde aucune figure ouverte, seulement
+des images dans un cache borné en octets partagé par toutes les sessions.
+"""
+import hashlib
+import io
+import threading
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+from profilage import etape
+from ressources import CacheOctets
+
+# Budget mémoire des images (un graphique PNG pèse entre 30 et 150 Ko)
+TAILLE_MAX_IMAGES = 32 * 1024 * 1024
+
+RESOLUTION = 150
+
+# Instance unique du processus
+cache_images = CacheOctets(TAILLE_MAX_IMAGES)
+
+# Les figures ouvertes de pyplot forment un registre global, partagé par les fils des sessions
+verrou_pyplot = threading.Lock()
+
+
+def empreinte(*valeurs):
+    """Empreinte stable des données d'un graphique (DataFrame, Series, tableaux, scalaires, listes)."""
+    hachage = hashlib.blake2b(digest_size=16)
+    for valeur in valeurs:
+        if isinstance(valeur, (pd.DataFrame, pd.Series)):
+            noms = list(valeur.columns) if isinstance(valeur, pd.DataFrame) else [valeur.name]
+            hachage.update(repr((type(valeur).__name__, noms, list(valeur.index.names))).encode())
+            hachage.update(pd.util.hash_pandas_object(valeur, index=True).to_numpy().tobytes())
+        elif isinstance(valeur, np.ndarray):
+            hachage.update(repr((valeur.dtype.str, valeur.shape)).encode())
+            hachage.update(np.ascontiguousarray(valeur).tobytes())
+        elif isinstance(valeur, (list, tuple)):
+            hachage.update(repr((type(valeur).__name__, len(valeur))).encode())
+            hachage.update(empreinte(*valeur).encode())
+        else:
+            hachage.update(repr(valeur).encode())
+    return hachage.hexdigest()
+
+
+def en_octets(figure, format="png"):
+    """Convertit la figure en image puis la ferme."""
+    tampon = io.BytesIO()
+    try:
+        figure.savefig(tampon, format=format, dpi=RESOLUTION, bbox_inches="tight")
+    finally:
+        plt.close(figure)
+    return tampon.getvalue()
+
+
+def image_graphique(tracer, *donnees, format="png"):
+    """
+    Image du graphique tracer(*donnees), depuis le cache si possible.
+
+    `tracer` n'est appelé qu'en l'absence d'image pour ces données ; il ne doit
+    dépendre que de ses arguments. Les tracés sont faits un à la fois, et les
+    figures qu'ils ouvrent sont fermées même s'ils lèvent une exception.
+    """
+    with etape("empreinte"):
+        cle = (tracer.__module__, tracer.__qualname__, format, empreinte(*donnees))
+    image = cache_images.obtenir(cle)
+    if image is None:
+        with verrou_pyplot:
+            ouvertes = set(plt.get_fignums())
+            try:
+                with etape("tracé"):
+                    figure = tracer(*donnees)
+                with etape(f"conversion {format}"):
+                    image = en_octets(figure, format)
+            finally:
+                # Figures laissées ouvertes par un tracé interrompu par une exception
+                for numero in set(plt.get_fignums()) - ouvertes:
+                    plt.close(numero)
+        cache_images.ajouter(cle, image, len(image))
+    return image
@@ -0,0 +1,130 @@
+"""
+Préchargement en arrière-plan des données des pages que l'utilisateur a le
+plus de chances d'ouvrir ensuite.
+
+Une fois la page affichée, carte.py confie à un pool de fils les chargeurs
+des autres pages : ils remplissent les caches partagés (st.cache_resource)
+sans bloquer le fil du script. L'ordre vient de la navigation observée : les
+passages d'une page à l'autre sont comptés pour tout le processus et gardés
+dans cache/navigation.json d'un démarrage à l'autre.
+
+Le module ne dépend pas de Streamlit. PRECHARGEMENT=0 désactive le
+préchargement (banc d'essai, débogage).
+"""
+import concurrent.futures
+import json
+import logging
+import os
+import threading
+from collections import Counter, defaultdict
+
+from donnees import DOSSIER_CACHE
+
+FICHIER_NAVIGATION = os.path.join(DOSSIER_CACHE, "navigation.json")
+
+ACTIF = os.environ.get("PRECHARGEMENT", "1") != "0"
+
+# Fils du pool : le chargement est surtout de la lecture de fichiers et du pandas
+NOMBRE_FILS = 2
+
+PREFIXE_FILS = "prechargement"
+
+journal = logging.getLogger("prechargement")
+
+
+class SansAvertissementContexte(logging.Filter):
+    """Les fils du pool n'ont pas de contexte d'exécution Streamlit : l'avertissement qui le signale est attendu."""
+
+    def filter(self, record):
+        return not threading.current_thread().name.startswith(PREFIXE_FILS)
+
+
+logging.getLogger("streamlit.runtime.scriptrunner_utils.script_run_context").addFilter(SansAvertissementContexte())
+
+
+class Navigation:
+    """Nombre de passages d'une page à une autre, et de visites de chaque page."""
+
+    def __init__(self, fichier=FICHIER_NAVIGATION):
+        self.fichier = fichier
+        self.transitions = defaultdict(Counter)
+        self.visites = Counter()
+        self._verrou = threading.Lock()
+        try:
+            with open(fichier, encoding="utf-8") as entree:
+                sauvegarde = json.load(entree)
+            for depart, arrivees in sauvegarde.get("transitions", {}).items():
+                self.transitions[depart].update(arrivees)
+            self.visites.update(sauvegarde.get("visites", {}))
+        except (OSError, ValueError):
+            pass
+
+    def noter(self, precedente, page):
+        """Compte une visite de `page`, et le passage depuis `precedente` s'il y en a une autre."""
+        with self._verrou:
+            self.visites[page] += 1
+            if precedente is not None and precedente != page:
+                self.transitions[precedente][page] += 1
+            contenu = {"transitions": {depart: dict(arrivees) for depart, arrivees in self.transitions.items()},
+                       "visites": dict(self.visites)}
+        self.enregistrer(contenu)
+
+    def enregistrer(self, contenu):
+        temporaire = f"{self.fichier}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.fichier), exist_ok=True)
+            with open(temporaire, "w", encoding="utf-8") as sortie:
+                json.dump(contenu, sortie, ensure_ascii=False)
+            os.replace(temporaire, self.fichier)
+        except OSError:
+            # Les statistiques restent en mémoire si le cache n'est pas accessible en écriture
+            if os.path.exists(temporaire):
+                os.remove(temporaire)
+
+    def suivantes(self, page, pages):
+        """
+        Les autres pages, des plus probables aux moins probables : passages
+        observés depuis `page`, puis visites au total, puis ordre de `pages`.
+        """
+        with self._verrou:
+            depuis = self.transitions.get(page, Counter())
+            return sorted((autre for autre in pages if autre != page),
+                          key=lambda autre: (-depuis[autre], -self.visites[autre]))
+
+
+class Prechargeur:
+    """Pool de fils qui exécute chaque chargeur une seule fois par processus, dans l'ordre demandé."""
+
+    def __init__(self, navigation=None, fils=NOMBRE_FILS):
+        self.navigation = navigation or Navigation()
+        self.actif = ACTIF
+        self._pool = concurrent.futures.ThreadPoolExecutor(max_workers=fils, thread_name_prefix=PREFIXE_FILS)
+        self._verrou = threading.RLock()
+        self._en_cours = {}
+        self._termines = set()
+
+    def precharger(self, taches):
+        """
+        Soumet les tâches (nom, fonction) qui ne sont ni terminées ni en cours ;
+        le pool les exécute dans l'ordre de la liste. Ne bloque pas.
+        """
+        if not self.actif:
+            return []
+        soumises = []
+        with self._verrou:
+            for nom, fonction in taches:
+                if nom in self._termines or nom in self._en_cours:
+                    continue
+                futur = self._en_cours[nom] = self._pool.submit(fonction)
+                # Appelé tout de suite, dans ce fil, si la tâche est déjà finie : d'où le verrou réentrant
+                futur.add_done_callback(lambda futur, nom=nom: self._terminer(nom, futur))
+                soumises.append(nom)
+        return soumises
+
+    def _terminer(self, nom, futur):
+        # Un échec n'est pas retenté : la page concernée recharge et affiche l'erreur à sa visite
+        with self._verrou:
+            del self._en_cours[nom]
+            self._termines.add(nom)
+        if futur.exception() is not None:
+            journal.warning("préchargement de %s interrompu : %r", nom, futur.exception())
@@ -0,0 +1,139 @@
+"""
+Chronométrage des étapes d'une exécution du script.
+
+Les étapes sont nommées et imbriquées ("chargement load_data",
+"calcul fusion pauvreté", "graphique draw_qpv" > "tracé" > "conversion png").
+Le premier mot du nom en donne la catégorie, ce qui sépare les lectures de
+fichiers, les calculs pandas et le rendu matplotlib.
+
+Hors profilage, etape() ne coûte qu'une lecture de variable de contexte : les
+mesures ne sont prises que pour les exécutions qui ont appelé nouveau_profil().
+Le module ne dépend pas de Streamlit.
+"""
+import contextvars
+import json
+import logging
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+# Modes d'affichage du profil (paramètre d'URL ?profil=panneau,flamme)
+MODES = ('panneau', 'journal', 'flamme')
+
+journal = logging.getLogger("profil")
+if not journal.handlers:
+    journal.addHandler(logging.StreamHandler())
+    journal.setLevel(logging.INFO)
+    journal.propagate = False
+
+# Profil de l'exécution en cours (chaque exécution du script a son propre fil)
+_profil_courant = contextvars.ContextVar("profil", default=None)
+
+
+class Profil:
+    """Étapes chronométrées d'une exécution, dans l'ordre de leur début."""
+
+    def __init__(self, nom=""):
+        self.nom = nom
+        self.debut = time.perf_counter()
+        self.fin = None
+        self.etapes = []
+        self.ouvertes = []
+
+    def ouvrir(self, nom):
+        parent = self.ouvertes[-1] if self.ouvertes else None
+        self.etapes.append({"nom": nom, "parent": parent, "debut": time.perf_counter(), "duree": None})
+        self.ouvertes.append(len(self.etapes) - 1)
+
+    def fermer(self):
+        etape = self.etapes[self.ouvertes.pop()]
+        etape["duree"] = time.perf_counter() - etape["debut"]
+
+    def terminer(self):
+        self.fin = time.perf_counter()
+        return self
+
+    @property
+    def duree(self):
+        return (self.fin or time.perf_counter()) - self.debut
+
+    def lignes(self):
+        """Une ligne par étape terminée : chemin, profondeur, début, durée totale et propre (en ms)."""
+        enfants = defaultdict(float)
+        for etape in self.etapes:
+            if etape["parent"] is not None and etape["duree"] is not None:
+                enfants[etape["parent"]] += etape["duree"]
+        lignes = []
+        for i, etape in enumerate(self.etapes):
+            if etape["duree"] is None:
+                continue
+            chemin, parent = [etape["nom"]], etape["parent"]
+            while parent is not None:
+                chemin.insert(0, self.etapes[parent]["nom"])
+                parent = self.etapes[parent]["parent"]
+            lignes.append({
+                "etape": etape["nom"],
+                "chemin": chemin,
+                "profondeur": len(chemin) - 1,
+                "debut_ms": round(1000 * (etape["debut"] - self.debut), 3),
+                "duree_ms": round(1000 * etape["duree"], 3),
+                "propre_ms": round(1000 * (etape["duree"] - enfants[i]), 3),
+            })
+        return lignes
+
+    def par_categorie(self):
+        """Durée des étapes de premier niveau par catégorie (premier mot du nom), le reste en "autre"."""
+        categories = defaultdict(float)
+        for ligne in self.lignes():
+            if ligne["profondeur"] == 0:
+                categories[ligne["etape"].split()[0]] += ligne["duree_ms"]
+        categories["autre"] += max(1000 * self.duree - sum(categories.values()), 0)
+        return dict(categories)
+
+    def pile_repliee(self):
+        """Profil au format des piles repliées ("a;b;c durée") lu par flamegraph.pl et speedscope, en µs."""
+        piles = defaultdict(float)
+        racine = self.nom or "script"
+        premier_niveau = 0
+        for ligne in self.lignes():
+            piles[";".join([racine] + ligne["chemin"])] += ligne["propre_ms"]
+            if ligne["profondeur"] == 0:
+                premier_niveau += ligne["duree_ms"]
+        piles[racine] += max(1000 * self.duree - premier_niveau, 0)
+        return "\n".join(f"{pile} {round(1000 * duree)}" for pile, duree in piles.items()) + "\n"
+
+    def journaliser(self):
+        """Une ligne JSON par étape, puis une ligne pour l'exécution complète."""
+        for ligne in self.lignes():
+            journal.info(json.dumps({"page": self.nom, **ligne}, ensure_ascii=False))
+        journal.info(json.dumps({"page": self.nom, "etape": "total", "duree_ms": round(1000 * self.duree, 3),
+                                 "categories": self.par_categorie()}, ensure_ascii=False))
+
+
+def modes_demandes(valeurs):
+    """Modes demandés par les valeurs du paramètre d'URL ; "panneau" si le paramètre est présent sans valeur connue."""
+    if not valeurs:
+        return set()
+    modes = {mode.strip() for valeur in valeurs for mode in valeur.split(",")} & set(MODES)
+    return modes or {'panneau'}
+
+
+def nouveau_profil(actif=True, nom=""):
+    """Démarre le profil de l'exécution courante (ou le désactive) et le renvoie."""
+    profil = Profil(nom) if actif else None
+    _profil_courant.set(profil)
+    return profil
+
+
+@contextmanager
+def etape(nom):
+    """Chronomètre un bloc (with etape(...)) ou une fonction (@etape(...)) dans le profil courant."""
+    profil = _profil_courant.get()
+    if profil is None:
+        yield
+        return
+    profil.ouvrir(nom)
+    try:
+        yield
+    finally:
+        profil.fermer()
@@ -0,0 +1,118 @@
+"""
+Recherche de communes par nom, insensible aux accents, à la casse, aux tirets
+et aux abréviations "Saint/St".
+
+L'index est construit une fois sur les noms distincts (environ 35 000) et
+renvoie directement les positions des lignes correspondantes du fichier des
+élections : la saisie ne déclenche plus de parcours de toutes les lignes.
+"""
+import re
+import unicodedata
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+# Formes développées des abréviations courantes dans les noms de communes
+ABREVIATIONS = {'st': 'saint', 'ste': 'sainte', 'sts': 'saints', 'stes': 'saintes'}
+
+# Ligatures non décomposées par la normalisation Unicode
+LIGATURES = str.maketrans({'œ': 'oe', 'æ': 'ae', 'ß': 'ss'})
+
+SEPARATEURS = re.compile(r"[\s\-'’_.,/()]+")
+
+LONGUEUR_NGRAMME = 3
+
+
+def replier(texte):
+    """Minuscules sans accents ni ligatures, séparateurs remplacés par une espace."""
+    texte = unicodedata.normalize('NFKD', str(texte).lower().translate(LIGATURES))
+    texte = ''.join(c for c in texte if not unicodedata.combining(c))
+    return SEPARATEURS.sub(' ', texte).strip()
+
+
+def normaliser(nom):
+    """Forme canonique d'un nom de commune : "Saint-Étienne" et "St Etienne" donnent "saint etienne"."""
+    return ' '.join(ABREVIATIONS.get(mot, mot) for mot in replier(nom).split())
+
+
+def ngrammes(texte, n=LONGUEUR_NGRAMME):
+    return {texte[i:i + n] for i in range(len(texte) - n + 1)}
+
+
+def saisie_vide(requete):
+    """La saisie ne contient ni lettre ni chiffre ("-", "  ", "?") : il n'y a rien à chercher."""
+    return not any(caractere.isalnum() for caractere in replier(requete))
+
+
+def variantes(requete):
+    """
+    Formes normalisées d'une saisie. Le dernier mot peut être en cours de
+    frappe : une abréviation y est cherchée telle quelle et développée.
+    """
+    mots = replier(requete).split()
+    if not mots:
+        return []
+    debut = [ABREVIATIONS.get(mot, mot) for mot in mots[:-1]]
+    dernier = {mots[-1], ABREVIATIONS.get(mots[-1], mots[-1])}
+    return [' '.join(debut + [mot]) for mot in sorted(dernier)]
+
+
+class IndexCommunes:
+    """
+    Index des noms de communes d'une colonne catégorielle.
+
+    - saisie de moins de trois caractères : recherche de la sous-chaîne dans
+      tous les noms normalisés, en une opération vectorisée ;
+    - sinon : intersection des listes de trigrammes, puis vérification de la
+      sous-chaîne sur les seuls candidats.
+    """
+
+    def __init__(self, libelles):
+        libelles = libelles if isinstance(libelles.dtype, pd.CategoricalDtype) else libelles.astype('category')
+        self.noms = [normaliser(nom) for nom in libelles.cat.categories]
+
+        # Positions des lignes de chaque nom, contiguës après un tri stable des codes
+        codes = libelles.cat.codes.to_numpy()
+        self.ordre = np.argsort(codes, kind='stable')
+        self.bornes = np.searchsorted(codes[self.ordre], np.arange(len(self.noms) + 1))
+
+        postings = defaultdict(list)
+        for identifiant, nom in enumerate(self.noms):
+            for ngramme in ngrammes(nom):
+                postings[ngramme].append(identifiant)
+        self.postings = {ngramme: np.array(ids, dtype=np.int32) for ngramme, ids in postings.items()}
+        self.serie_noms = pd.Series(self.noms, dtype=object)
+
+    def noms_correspondants(self, requete):
+        """
+        Identifiants (codes de catégorie) des noms qui contiennent la saisie ;
+        aucun pour une saisie vide au sens de saisie_vide().
+        """
+        trouves = [self._chercher(variante) for variante in variantes(requete)]
+        if not trouves:
+            return np.array([], dtype=np.int32)
+        return np.unique(np.concatenate(trouves))
+
+    def _chercher(self, requete):
+        if len(requete) < LONGUEUR_NGRAMME:
+            # Trop court pour les trigrammes : sous-chaîne n'importe où dans le nom, comme avant l'index
+            return np.flatnonzero(self.serie_noms.str.contains(requete, regex=False).to_numpy()).astype(np.int32)
+        listes = sorted((self.postings.get(ngramme) for ngramme in ngrammes(requete)),
+                        key=lambda ids: -1 if ids is None else len(ids))
+        if listes[0] is None:
+            return np.array([], dtype=np.int32)
+        candidats = listes[0]
+        for ids in listes[1:]:
+            candidats = np.intersect1d(candidats, ids, assume_unique=True)
+            if not len(candidats):
+                break
+        return np.array([i for i in candidats if requete in self.noms[i]], dtype=np.int32)
+
+    def positions(self, requete):
+        """Positions (triées) des lignes dont la commune correspond à la saisie."""
+        identifiants = self.noms_correspondants(requete)
+        if not len(identifiants):
+            return np.array([], dtype=np.intp)
+        tranches = [self.ordre[self.bornes[i]:self.bornes[i + 1]] for i in identifiants]
+        return np.sort(np.concatenate(tranches))
@@ -0,0 +1,94 @@
+"""
+Référentiel des départements et des circonscriptions.
+
+Les fichiers sources ne codent pas les départements de la même façon : '1',
+'01' ou '001', '2A' ou '02A', et pour l'outre-mer les codes à lettres du
+ministère de l'Intérieur ('ZA', 'ZB'...) dans les législatives 2017 et 2022,
+mais '971', '972'... ailleurs. Chaque table reçoit à la lecture une clé
+entière tirée de ce référentiel (cle_departement, cle_circonscription) : les
+pages font leurs jointures sur ces clés, sans convertir de chaînes.
+"""
+import numpy as np
+import pandas as pd
+
+# Codes à lettres des résultats électoraux et code INSEE correspondant
+CODES_OUTRE_MER = {
+    'ZA': '971',  # Guadeloupe
+    'ZB': '972',  # Martinique
+    'ZC': '973',  # Guyane
+    'ZD': '974',  # La Réunion
+    'ZS': '975',  # Saint-Pierre-et-Miquelon
+    'ZM': '976',  # Mayotte
+    'ZX': '977',  # Saint-Martin et Saint-Barthélemy (une seule circonscription)
+    'ZW': '986',  # Wallis-et-Futuna
+    'ZP': '987',  # Polynésie française
+    'ZN': '988',  # Nouvelle-Calédonie
+    'ZZ': '99',   # Français établis hors de France
+}
+
+CODES_DEPARTEMENTS = (
+    [f"{numero:02d}" for numero in range(1, 20)] + ['2A', '2B'] + [f"{numero:02d}" for numero in range(21, 96)]
+    + ['971', '972', '973', '974', '975', '976', '977', '978', '986', '987', '988', '99']
+)
+
+# Dimension des départements : la clé est la position du code, identique d'un
+# processus à l'autre et d'une version du cache à l'autre
+DEPARTEMENTS = pd.DataFrame(
+    {
+        'code': CODES_DEPARTEMENTS,
+        'metropole': [len(code) == 2 and code != '99' for code in CODES_DEPARTEMENTS],
+    },
+    index=pd.RangeIndex(len(CODES_DEPARTEMENTS), name='cle_departement'),
+)
+
+INDEX_CODES = pd.Index(CODES_DEPARTEMENTS)
+
+# Clé d'un code absent du référentiel (ou manquant)
+CLE_INCONNUE = -1
+
+
+def normaliser_code(code):
+    """Code canonique d'un département : '1', '01', '001' -> '01' ; '02A' -> '2A' ; 'ZA' -> '971'."""
+    if pd.isna(code):
+        return None
+    code = str(code).strip().upper()
+    # Codes numériques lus comme des flottants
+    if code.endswith('.0'):
+        code = code[:-2]
+    code = CODES_OUTRE_MER.get(code, code).lstrip('0')
+    return code.zfill(2) if code else None
+
+
+def normaliser_departements(df, colonne):
+    """
+    Réécrit la colonne de codes sous forme canonique et ajoute la clé entière
+    cle_departement (CLE_INCONNUE hors référentiel).
+
+    Le calcul porte sur les valeurs distinctes seulement (les catégories d'une
+    colonne catégorielle), puis est reporté sur les lignes par leurs positions.
+    """
+    codes = df[colonne]
+    categorielle = isinstance(codes.dtype, pd.CategoricalDtype)
+    if categorielle:
+        positions, valeurs = codes.cat.codes.to_numpy(), codes.cat.categories
+    else:
+        positions, valeurs = pd.factorize(codes)
+    canoniques = [normaliser_code(valeur) for valeur in valeurs]
+    # La position -1 (valeur manquante) désigne le dernier élément ajouté
+    cles = np.append(INDEX_CODES.get_indexer(canoniques), CLE_INCONNUE).astype(np.int16)
+    rangs, distincts = pd.factorize(pd.Series(canoniques, dtype=object))
+    rangs = np.append(rangs, -1)[positions]
+    if categorielle:
+        df[colonne] = pd.Categorical.from_codes(rangs, categories=distincts)
+    else:
+        df[colonne] = np.append(np.asarray(distincts, dtype=object), None)[rangs]
+    df['cle_departement'] = cles[positions]
+    return df
+
+
+def cles_circonscriptions(cles_departement, numeros):
+    """Clé entière d'une circonscription : clé du département x 100 + numéro dans le département."""
+    numeros = pd.to_numeric(pd.Series(numeros), errors='coerce').to_numpy()
+    cles_departement = np.asarray(cles_departement)
+    valides = (cles_departement != CLE_INCONNUE) & ~np.isnan(numeros)
+    return np.where(valides, cles_departement.astype(np.int32) * 100 + np.nan_to_num(numeros), CLE_INCONNUE).astype(np.int32)
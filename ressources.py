@@ -0,0 +1,112 @@
+"""
+Accès aux fichiers HTML des cartes pré-générées.
+
+Deux modes :
+- par défaut, le contenu est intégré dans la page ; il est gardé dans un cache
+  mémoire partagé par toutes les sessions (Streamlit ré-exécute carte.py à
+  chaque interaction, l'état qui doit survivre vit donc dans ce module) ;
+- si la variable d'environnement CARTES_URL_BASE est définie, les cartes sont
+  chargées par le navigateur via une iframe pointant sur
+  CARTES_URL_BASE/<fichier>. Le serveur de fichiers statiques (nginx, CDN,
+  ou "app/static" avec server.enableStaticServing) fournit ETag et
+  Cache-Control : seule l'URL transite par la connexion Streamlit.
+"""
+import os
+import threading
+import urllib.parse
+from collections import OrderedDict
+
+# Budget mémoire du cache (les plus grosses cartes font environ 4 Mo)
+TAILLE_MAX_OCTETS = 64 * 1024 * 1024
+
+# Base des URL des cartes statiques ; vide pour intégrer le HTML dans la page
+URL_CARTES = os.environ.get("CARTES_URL_BASE", "").rstrip("/")
+
+
+class CacheOctets:
+    """
+    Cache LRU borné en octets, partagé entre les threads du serveur.
+
+    Chaque entrée porte une signature : une entrée dont la signature ne
+    correspond plus à celle demandée est considérée comme absente.
+    """
+
+    def __init__(self, taille_max=TAILLE_MAX_OCTETS):
+        self.taille_max = taille_max
+        self.taille = 0
+        self._entrees = OrderedDict()
+        self._verrou = threading.Lock()
+
+    def obtenir(self, cle, signature=None):
+        """Valeur en cache pour cette clé et cette signature, sinon None."""
+        with self._verrou:
+            entree = self._entrees.get(cle)
+            if entree is not None and entree[0] == signature:
+                self._entrees.move_to_end(cle)
+                return entree[1]
+        return None
+
+    def ajouter(self, cle, valeur, octets, signature=None):
+        with self._verrou:
+            self._retirer(cle)
+            # Une valeur plus grosse que tout le budget n'est pas conservée
+            if octets <= self.taille_max:
+                self._entrees[cle] = (signature, valeur, octets)
+                self.taille += octets
+                while self.taille > self.taille_max:
+                    _, (_, _, taille_evincee) = self._entrees.popitem(last=False)
+                    self.taille -= taille_evincee
+
+    def _retirer(self, cle):
+        entree = self._entrees.pop(cle, None)
+        if entree is not None:
+            self.taille -= entree[2]
+
+    def vider(self):
+        with self._verrou:
+            self._entrees.clear()
+            self.taille = 0
+
+
+class CacheFichiers(CacheOctets):
+    """
+    Cache LRU de contenus texte, borné en octets.
+
+    Une entrée est relue dès que la date de modification ou la taille du fichier
+    change, ce qui permet de remplacer une carte sans redémarrer le serveur.
+    """
+
+    def lire(self, chemin):
+        """Contenu du fichier, depuis le cache si possible. Lève FileNotFoundError."""
+        stat = os.stat(chemin)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        contenu = self.obtenir(chemin, signature)
+        if contenu is None:
+            with open(chemin, "r", encoding="utf-8") as fichier:
+                contenu = fichier.read()
+            self.ajouter(chemin, contenu, len(contenu.encode("utf-8")), signature)
+        return contenu
+
+
+# Instance unique du processus
+cache_html = CacheFichiers()
+
+
+def lire_html(chemin):
+    """Contenu d'un fichier HTML via le cache partagé."""
+    return cache_html.lire(chemin)
+
+
+def url_carte(chemin):
+    """
+    URL d'une carte servie en fichier statique, ou None si le mode n'est pas activé.
+
+    Le paramètre v change avec la date de modification du fichier : le
+    navigateur peut garder la carte en cache sans risque de version périmée.
+    Lève FileNotFoundError si le fichier n'existe pas.
+    """
+    if not URL_CARTES:
+        return None
+    version = os.stat(chemin).st_mtime_ns
+    relatif = urllib.parse.quote(os.path.normpath(chemin).replace(os.sep, "/"))
+    return f"{URL_CARTES}/{relatif}?v={version:x}"
@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from agregats import CubeBarometre
+
+
+@pytest.fixture
+def barometre():
+    """Deux chaînes, deux thèmes, années 2000 à 2002 : chaque ligne vaut 1, sauf TF1 / Sport qui vaut 10."""
+    lignes = [
+        {'Annee': annee, 'Mois': mois, 'Chaîne': chaine, 'Thématique': theme,
+         'Nb_Thème': 10.0 if (chaine, theme) == ('TF1', 'Sport') else 1.0, 'Nb_temps': 2.0}
+        for annee in (2000, 2001, 2002) for mois in range(1, 13)
+        for chaine in ('TF1', 'France 2') for theme in ('Sport', 'Culture')
+    ]
+    return CubeBarometre(pd.DataFrame(lignes))
+
+
+def reference(cube, metrique, chaines, themes, debut, fin):
+    """Total calculé mois par mois sur les valeurs mensuelles."""
+    total = pd.Series(0.0, index=pd.Index(themes))
+    for a, annee in enumerate(cube.annees):
+        for m, mois in enumerate(cube.mois):
+            if debut <= (annee, mois) <= fin:
+                for chaine in chaines:
+                    for theme in themes:
+                        total[theme] += cube.mensuel[metrique][a, m, cube.chaines.get_loc(chaine), cube.themes.get_loc(theme)]
+    return total
+
+
+@pytest.mark.parametrize('debut, fin', [
+    ((2000, 1), (2002, 12)),
+    ((2001, 3), (2001, 3)),
+    ((2000, 7), (2002, 2)),
+])
+def test_total_dans_la_periode(barometre, debut, fin):
+    total = barometre.total('Nb_Thème', ['TF1', 'France 2'], ['Sport', 'Culture'], debut, fin)
+    attendu = reference(barometre, 'Nb_Thème', ['TF1', 'France 2'], ['Sport', 'Culture'], debut, fin)
+    np.testing.assert_allclose(total.to_numpy(), attendu.to_numpy())
+
+
+def test_total_sans_bornes(barometre):
+    total = barometre.total('Nb_temps', ['TF1'], ['Sport', 'Culture'])
+    np.testing.assert_allclose(total.to_numpy(), [72.0, 72.0])
+
+
+@pytest.mark.parametrize('debut, fin', [
+    ((1990, 1), (1995, 12)),
+    ((2010, 1), (2012, 6)),
+    ((2002, 6), (2001, 1)),
+])
+def test_total_hors_periode(barometre, debut, fin):
+    total = barometre.total('Nb_Thème', ['TF1'], ['Sport', 'Culture'], debut, fin)
+    assert list(total.index) == ['Sport', 'Culture']
+    assert (total == 0).all()
+
+
+@pytest.mark.parametrize('debut, fin, mois', [
+    ((1995, 1), (2000, 6), 6),
+    ((2002, 7), (2010, 12), 6),
+    ((1990, 1), (2030, 12), 36),
+])
+def test_total_periode_en_partie_couverte(barometre, debut, fin, mois):
+    total = barometre.total('Nb_Thème', ['TF1'], ['Sport'], debut, fin)
+    assert total['Sport'] == 10.0 * mois
+
+
+def test_total_annee_absente():
+    """Une année manquante dans les données ne décale pas les mois des années suivantes."""
+    lignes = [{'Annee': annee, 'Mois': mois, 'Chaîne': 'TF1', 'Thématique': 'Sport', 'Nb_Thème': float(annee), 'Nb_temps': 1.0}
+              for annee in (2000, 2002) for mois in range(1, 13)]
+    cube = CubeBarometre(pd.DataFrame(lignes))
+    assert cube.total('Nb_Thème', ['TF1'], ['Sport'], (2001, 1), (2001, 12))['Sport'] == 0
+    assert cube.total('Nb_Thème', ['TF1'], ['Sport'], (2001, 6), (2002, 2))['Sport'] == 2 * 2002.0
+    assert cube.total('Nb_Thème', ['TF1'], ['Sport'], (2000, 11), (2001, 6))['Sport'] == 2 * 2000.0
+
+
+def test_serie_annuelle(barometre):
+    serie = barometre.serie_annuelle('Nb_Thème', ['TF1', 'France 2'], ['Sport'], annee_max=2001)
+    assert list(serie.index) == [2000, 2001]
+    np.testing.assert_allclose(serie['Sport'].to_numpy(), [132.0, 132.0])
+
+
+@pytest.mark.parametrize('chaines, themes', [
+    (['TF1', 'M6'], ['Sport']),
+    (['TF1'], ['Sport', 'Météo']),
+])
+def test_chaine_ou_theme_inconnu(barometre, chaines, themes):
+    """Un nom inconnu lève KeyError au lieu de sélectionner la dernière chaîne ou le dernier thème."""
+    with pytest.raises(KeyError):
+        barometre.total('Nb_Thème', chaines, themes)
+    with pytest.raises(KeyError):
+        barometre.serie_annuelle('Nb_Thème', chaines, themes)
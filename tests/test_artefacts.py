@@ -0,0 +1,68 @@
+import fnmatch
+import os
+
+import artefacts
+from artefacts import DOSSIER_RECONSTRUITS, NON_REPRODUCTIBLES, regles
+
+
+def motifs_non_reproductibles():
+    return [motif.strip() for motifs in NON_REPRODUCTIBLES for motif in motifs.split(",")]
+
+
+def test_fichiers_versionnes_jamais_remplaces():
+    """Aucune règle n'écrit sur un fichier de NON_REPRODUCTIBLES : les versions approchées vont dans reconstruits/."""
+    for regle in regles().values():
+        for sortie in regle["sorties"]:
+            assert not any(fnmatch.fnmatch(sortie, motif) for motif in motifs_non_reproductibles()), sortie
+
+
+def test_rendus_dans_reconstruits():
+    """Chaque image ou carte reconstruite correspond à un original déclaré non reproductible."""
+    rendus = [sortie for regle in regles().values() for sortie in regle["sorties"]
+              if sortie.startswith(DOSSIER_RECONSTRUITS + os.sep)]
+    assert rendus
+    for sortie in rendus:
+        assert any(fnmatch.fnmatch(os.path.basename(sortie), motif) for motif in motifs_non_reproductibles()), sortie
+    autres = [sortie for regle in regles().values() for sortie in regle["sorties"] if sortie not in rendus]
+    assert all(sortie.startswith(("geometries", artefacts.DOSSIER_CACHE)) for sortie in autres)
+
+
+def test_empreinte_couvre_les_modules_importes(monkeypatch):
+    """Modifier cartographie ou donnees change l'empreinte des règles qui s'en servent, sans toucher aux entrées."""
+    regle = regles()["reconstruits/map_taux_pauv_departements_2017.html"]
+    connus = {}
+    avant = artefacts.empreinte_regle(regle, connus)
+    assert artefacts.empreinte_regle(regle, connus) == avant
+    source_module = artefacts.source_module
+    for nom in ("cartographie", "donnees", "referentiel"):
+        modifiee = lambda module, nom=nom: source_module(module) + ("# modifié" if module.__name__ == nom else "")
+        monkeypatch.setattr(artefacts, "source_module", modifiee)
+        assert artefacts.empreinte_regle(regle, connus) != avant, nom
+
+
+def ecrire_double(sorties, valeur):
+    with open("entree.txt") as entree, open(sorties[0], "w") as sortie:
+        sortie.write(entree.read() * valeur)
+
+
+def test_construction_incrementale(tmp_path, monkeypatch):
+    """Une règle n'est rejouée que si son entrée, ses paramètres ou sa sortie changent."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(artefacts, "MANIFESTE", str(tmp_path / "cache" / "artefacts.json"))
+    regle = {"sorties": ["sortie.txt"], "entrees": ["entree.txt"], "fonction": ecrire_double, "parametres": {"valeur": 2}}
+    monkeypatch.setattr(artefacts, "regles", lambda: {"sortie.txt": regle})
+    (tmp_path / "entree.txt").write_text("a")
+
+    def construire():
+        assert artefacts.construire(processus=1) == 0
+        return (tmp_path / "sortie.txt").read_text(), os.stat(tmp_path / "sortie.txt").st_mtime_ns
+
+    contenu, date = construire()
+    assert contenu == "aa"
+    assert construire() == (contenu, date)
+    (tmp_path / "entree.txt").write_text("b")
+    assert construire()[0] == "bb"
+    regle["parametres"] = {"valeur": 3}
+    assert construire()[0] == "bbb"
+    os.remove(tmp_path / "sortie.txt")
+    assert construire()[0] == "bbb"
@@ -0,0 +1,79 @@
+import os
+
+import pandas as pd
+import pytest
+
+from cartographie import (CADRAGE_METROPOLE, COULEURS_BORDS, NIVEAUX, carte_resultats, charger_geometrie,
+                          choisir_niveau, choroplethe, codes_disponibles, resultats_par_zone)
+from donnees import lire_candidats_circonscriptions
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(autouse=True)
+def dossier_du_dashboard(monkeypatch):
+    """Contours et nuances sont lus par des chemins relatifs au dossier du dashboard."""
+    monkeypatch.chdir(RACINE)
+
+
+@pytest.fixture(scope="module")
+def candidats_2022():
+    return lire_candidats_circonscriptions(os.path.join(RACINE, "circo_2022_T1.csv"), "2022_legi_t1")
+
+
+def test_resultats_par_zone():
+    candidats = pd.DataFrame({
+        "id_election": ["e1"] * 5 + ["e2"],
+        "Code du département": ["01", "01", "01", "02", "02", "01"],
+        "Libellé du département": ["Ain", "Ain", "Ain", "Aisne", "Aisne", "Ain"],
+        "Nuance": ["RN", "ENS", "RN", "LR", "ENS", "LR"],
+        "Voix": [30, 50, 40, 10, 5, 999],
+    })
+    zones = resultats_par_zone(candidats, "e1", "departements", nb_candidats=2).set_index("Code")
+    # Voix additionnées par nuance avant le classement, autre élection ignorée
+    assert zones.loc["01", ["Nuance 1", "Voix 1", "Nuance 2", "Voix 2"]].tolist() == ["RN", 70, "ENS", 50]
+    assert zones.loc["01", "% Voix/Exp 1"] == pytest.approx(100 * 70 / 120)
+    assert zones.loc["02", ["Nuance 1", "Voix 1", "Nuance 2"]].tolist() == ["LR", 10, "ENS"]
+    assert set(zones["Bord 1"]) <= set(COULEURS_BORDS)
+
+
+def test_choisir_niveau():
+    # Toute la métropole sur 700 pixels : le niveau le plus grossier suffit
+    assert choisir_niveau(15.5) == "grossier"
+    # Zoom sur une circonscription : aucune simplification ne reste sous le demi-pixel
+    assert choisir_niveau(0.3) is None
+    assert choisir_niveau(1.5) == "fin"
+    assert [choisir_niveau(etendue) for etendue in (3, 12, 30)] == ["moyen", "grossier", "grossier"]
+    assert NIVEAUX[choisir_niveau(3)]["tolerance"] <= 3 / 700 / 2
+
+
+def test_choroplethe_une_seule_trace():
+    codes = sorted(codes_disponibles("departements"))[:3]
+    figure = choroplethe("departements", codes, ["Gauche", "Droite", "Gauche"], COULEURS_BORDS,
+                         cadrage=CADRAGE_METROPOLE)
+    assert len(figure.data) == 1
+    trace = figure.data[0]
+    assert list(trace.locations) == codes
+    noms = list(COULEURS_BORDS)
+    assert list(trace.z) == [noms.index("Gauche"), noms.index("Droite"), noms.index("Gauche")]
+    # Contours du niveau adapté au cadrage de la métropole
+    assert len(trace.geojson["features"]) == len(charger_geometrie("departements", "grossier")["features"])
+
+
+def test_carte_resultats_departements(candidats_2022):
+    figure, sans_contour = carte_resultats(candidats_2022, "2022_legi_t1", "departements")
+    locations = set(figure.data[0].locations)
+    assert locations <= codes_disponibles("departements")
+    assert len(locations) == 96
+    # Outre-mer et Français de l'étranger nommés, pas représentés
+    assert "971 - Guadeloupe" in sans_contour
+    assert not any(zone.split(" - ")[0] in locations for zone in sans_contour)
+
+
+def test_carte_resultats_circonscriptions_haute_garonne(candidats_2022):
+    """La couche des circonscriptions ne couvre que la Haute-Garonne : les autres départements sont écartés."""
+    figure, sans_contour = carte_resultats(candidats_2022, "2022_legi_t1", "circonscriptions")
+    locations = set(figure.data[0].locations)
+    assert locations == codes_disponibles("circonscriptions")
+    assert all(code.startswith("31") for code in locations)
+    assert sans_contour == []
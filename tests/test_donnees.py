@@ -0,0 +1,150 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from agregats import abstention_premiers_tours, construire_cube_abstention
+from donnees import (cache_a_jour, charger_table, chemin_cache, ecrire_colonnes, figer, lire_colonnes, lire_meta,
+                     typer_elections)
+
+
+@pytest.fixture
+def elections():
+    """Les deux tours d'une présidentielle, trois communes sur deux départements."""
+    lignes = [
+        {'id_election': id_election, 'Code du département': code, 'Libellé du département': libelle,
+         'Libellé de la commune': commune, 'Inscrits': inscrits, 'Abstentions': abstentions,
+         '% Abs/Ins': 100 * abstentions / inscrits, 'Votants': inscrits - abstentions, 'Blancs': 2,
+         '% Blancs/Ins': 200 / inscrits, 'Nuls': 1, '% Nuls/Ins': 100 / inscrits,
+         'Exprimés': inscrits - abstentions - 3, 'Code de la commune': commune[:3]}
+        for id_election in ('2017_pres_t1', '2017_pres_t2')
+        for code, libelle, commune, inscrits, abstentions in (
+            ('01', 'Ain', 'Bourg', 1000, 250), ('01', 'Ain', 'Oyonnax', 500, 200), ('2A', 'Corse-du-Sud', 'Ajaccio', 800, 300))
+    ]
+    return typer_elections(pd.DataFrame(lignes))
+
+
+@pytest.fixture
+def table_figee(elections, tmp_path):
+    """Table des élections relue depuis son cache pré-converti puis figée, comme load_data()."""
+    dossier = str(tmp_path / "elections")
+    ecrire_colonnes(elections, dossier, {})
+    return figer(lire_colonnes(dossier))
+
+
+def affecter(table, colonne, valeur):
+    """Affectation en chaîne sur une colonne extraite."""
+    with pd.option_context('mode.chained_assignment', None):
+        table[colonne][0] = valeur
+
+
+@pytest.mark.parametrize('colonne', ['Inscrits', '% Abs/Ins', 'cle_departement'])
+def test_affectation_en_chaine_refusee(table_figee, colonne):
+    with pytest.raises(ValueError):
+        affecter(table_figee, colonne, 12345)
+
+
+@pytest.mark.parametrize('operation', [
+    lambda table: abstention_premiers_tours(construire_cube_abstention(table)),
+    lambda table: table.values,
+    lambda table: table.T,
+    lambda table: table[['Inscrits', 'Abstentions']].corr(),
+    lambda table: table.apply(lambda ligne: ligne['Inscrits'], axis=1),
+    lambda table: table[table['Inscrits'] > 600],
+])
+def test_lecture_seule_apres_operations(table_figee, operation):
+    """Les opérations qui consolident les blocs de pandas ne rendent pas la table partagée modifiable."""
+    operation(table_figee)
+    for colonne in ['Inscrits', '% Abs/Ins', 'Abstentions']:
+        with pytest.raises(ValueError):
+            affecter(table_figee, colonne, 12345)
+    assert table_figee['Inscrits'][0] == 1000
+
+
+def test_cube_fige_lecture_seule(table_figee):
+    """Même scénario que load_age_abstention : le cube partagé reste en lecture seule après la jointure."""
+    cube = figer(construire_cube_abstention(table_figee))
+    abstention_premiers_tours(cube)
+    for colonne in ['Inscrits', 'Taux Abs/Ins']:
+        with pytest.raises(ValueError):
+            affecter(cube, colonne, 12345.0)
+
+
+@pytest.mark.parametrize('ecriture', [
+    lambda table: table.__setitem__('Inscrits', 0),
+    lambda table: table.__setitem__('Nouvelle', 0),
+    lambda table: setattr(table, 'Inscrits', 0),
+    lambda table: table.loc.__setitem__((0, 'Inscrits'), 0),
+    lambda table: table.iloc.__setitem__((0, 0), 0),
+    lambda table: table.at.__setitem__((0, 'Inscrits'), 0),
+    lambda table: table.iat.__setitem__((0, 0), 0),
+    lambda table: table.__delitem__('Inscrits'),
+    lambda table: table.insert(0, 'Nouvelle', 0),
+    lambda table: table.pop('Inscrits'),
+    lambda table: table.fillna(0, inplace=True),
+    lambda table: table.rename(columns={'Inscrits': 'x'}, inplace=True),
+    lambda table: setattr(table, 'columns', range(table.shape[1])),
+])
+def test_ecritures_refusees(table_figee, ecriture):
+    with pytest.raises(ValueError):
+        ecriture(table_figee)
+
+
+def test_tables_derivees_modifiables(table_figee):
+    derivee = table_figee[table_figee['Inscrits'] > 600].copy()
+    derivee['Inscrits'] = 0
+    assert type(derivee) is pd.DataFrame
+    assert table_figee['Inscrits'].tolist() == [1000, 500, 800] * 2
+
+
+def test_lecture_seule_sans_copie(table_figee):
+    """Les colonnes déjà en lecture seule ne sont pas recopiées par un second figer()."""
+    refigee = figer(table_figee)
+    assert np.shares_memory(refigee['Inscrits'].to_numpy(), table_figee['Inscrits'].to_numpy())
+
+def projete(tableau):
+    """Le tableau est-il une vue d'un fichier projeté en mémoire ?"""
+    tableau = getattr(tableau, 'codes', tableau)
+    while tableau is not None:
+        if isinstance(tableau, np.memmap):
+            return True
+        tableau = getattr(tableau, 'base', None)
+    return False
+
+
+def test_aller_retour_colonnes(elections, tmp_path):
+    dossier = str(tmp_path / "elections")
+    ecrire_colonnes(elections, dossier, {"taille": 1})
+    relue = lire_colonnes(dossier)
+    pd.testing.assert_frame_equal(relue, elections.reset_index(drop=True), check_categorical=False)
+    assert relue['Libellé du département'].dtype == 'category'
+    assert relue['Code de la commune'].dtype == object
+    assert lire_meta(dossier)["source"] == {"taille": 1}
+
+
+def test_colonnes_projetees(table_figee):
+    """Colonnes numériques et codes des catégories sont lus dans les fichiers .npy sans copie, même après figer()."""
+    for colonne, serie in table_figee.items():
+        if serie.dtype != object:
+            assert projete(serie.array if serie.dtype == 'category' else serie.to_numpy()), colonne
+
+
+def test_colonnes_projetees_apres_cube(table_figee):
+    """Construire le cube, comme la page d'abstention, ne recopie pas les colonnes projetées de la table partagée."""
+    abstention_premiers_tours(figer(construire_cube_abstention(table_figee)))
+    table_figee.values
+    blocs = table_figee._mgr.blocks
+    assert all(projete(bloc.values) for bloc in blocs if bloc.dtype != object)
+    assert sum(bloc.dtype != object for bloc in blocs) == table_figee.dtypes.ne(object).sum()
+
+
+def test_cache_invalide_par_la_source(tmp_path):
+    source = tmp_path / "table.csv"
+    source.write_text("a,b\n1,x\n2,y\n")
+    lire = lambda fichier: pd.read_csv(fichier)
+    assert charger_table(str(source), lire)['a'].tolist() == [1, 2]
+    assert cache_a_jour(str(source), chemin_cache(str(source)))
+    source.write_text("a,b\n3,z\n")
+    assert not cache_a_jour(str(source), chemin_cache(str(source)))
+    table = charger_table(str(source), lire)
+    assert table['a'].tolist() == [3]
+    assert projete(table['a'].to_numpy())
@@ -0,0 +1,61 @@
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import pandas as pd
+import pytest
+
+from graphiques import cache_images, empreinte, image_graphique
+
+
+@pytest.fixture(autouse=True)
+def cache_vide():
+    cache_images.vider()
+    yield
+    cache_images.vider()
+
+
+def barres(valeurs):
+    figure, ax = plt.subplots()
+    ax.bar(range(len(valeurs)), valeurs)
+    return figure
+
+
+def test_image_mise_en_cache():
+    appels = []
+
+    def tracer(valeurs):
+        appels.append(valeurs)
+        return barres(valeurs)
+
+    premiere = image_graphique(tracer, pd.Series([1, 2, 3]))
+    assert premiere.startswith(b"\x89PNG")
+    assert image_graphique(tracer, pd.Series([1, 2, 3])) == premiere
+    assert len(appels) == 1
+    image_graphique(tracer, pd.Series([1, 2, 4]))
+    assert len(appels) == 2
+    assert plt.get_fignums() == []
+
+
+def test_figure_fermee_si_le_trace_echoue():
+    def tracer(valeurs):
+        plt.subplots()
+        raise ValueError("tracé interrompu")
+
+    for _ in range(3):
+        with pytest.raises(ValueError):
+            image_graphique(tracer, [1, 2])
+    assert plt.get_fignums() == []
+
+
+def test_figure_fermee_si_la_conversion_echoue():
+    with pytest.raises(ValueError):
+        image_graphique(barres, [1, 2], format="inconnu")
+    assert plt.get_fignums() == []
+
+
+def test_empreinte():
+    serie = pd.Series([1.0, 2.0], name="a")
+    assert empreinte(serie, 3) == empreinte(serie.copy(), 3)
+    assert empreinte(serie, 3) != empreinte(serie.rename("b"), 3)
+    assert empreinte(serie, 3) != empreinte(serie, 4)
+    assert empreinte([1, 2]) != empreinte((1, 2))
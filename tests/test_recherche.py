@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from recherche import IndexCommunes, normaliser, saisie_vide
+
+
+@pytest.fixture
+def index():
+    libelles = pd.Series(['Saint-Étienne', 'Lyon', 'Sainte-Foy-lès-Lyon', 'Ay', 'Lyon', 'Œuilly', "L'Haÿ-les-Roses"],
+                         dtype='category')
+    return IndexCommunes(libelles)
+
+
+def communes(index, requete):
+    return sorted({index.noms[i] for i in index.noms_correspondants(requete)})
+
+
+def test_normaliser():
+    assert normaliser('Saint-Étienne') == normaliser('St Etienne') == 'saint etienne'
+    assert normaliser('Œuilly') == 'oeuilly'
+
+
+@pytest.mark.parametrize('requete, attendu', [
+    ('lyon', ['lyon', 'sainte foy les lyon']),
+    ('st etienne', ['saint etienne']),
+    ('ste', ['sainte foy les lyon']),
+    ('ay', ['ay', 'l hay les roses']),
+    ('y', ['ay', 'l hay les roses', 'lyon', 'oeuilly', 'sainte foy les lyon']),
+    ('ROSES', ['l hay les roses']),
+])
+def test_sous_chaine(index, requete, attendu):
+    assert communes(index, requete) == attendu
+
+
+def test_positions(index):
+    np.testing.assert_array_equal(index.positions('lyon'), [1, 2, 4])
+
+
+@pytest.mark.parametrize('requete', ['-', '  ', "'", '.,', '?', '(-)'])
+def test_saisie_sans_lettre_ni_chiffre(index, requete):
+    """Une saisie faite de séparateurs ou de ponctuation est signalée, et ne renvoie aucune commune."""
+    assert saisie_vide(requete)
+    assert len(index.noms_correspondants(requete)) == 0
+    assert len(index.positions(requete)) == 0
+
+
+@pytest.mark.parametrize('requete', ['a', 'é', '1', ' l '])
+def test_saisie_non_vide(requete):
+    assert not saisie_vide(requete)
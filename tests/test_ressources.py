@@ -0,0 +1,81 @@
+import os
+import threading
+
+import pytest
+
+from ressources import CacheFichiers, CacheOctets
+
+
+def test_eviction_lru_en_octets():
+    cache = CacheOctets(taille_max=10)
+    cache.ajouter("a", "A", 4)
+    cache.ajouter("b", "B", 4)
+    assert cache.obtenir("a") == "A"
+    cache.ajouter("c", "C", 4)
+    # "b" est la moins récemment utilisée
+    assert cache.obtenir("b") is None
+    assert cache.obtenir("a") == "A" and cache.obtenir("c") == "C"
+    assert cache.taille == 8
+
+
+def test_valeur_plus_grosse_que_le_budget():
+    cache = CacheOctets(taille_max=10)
+    cache.ajouter("a", "A", 4)
+    cache.ajouter("gros", "G", 11)
+    assert cache.obtenir("gros") is None
+    assert cache.obtenir("a") == "A"
+    assert cache.taille == 4
+
+
+def test_remplacement_et_signature():
+    cache = CacheOctets(taille_max=10)
+    cache.ajouter("a", "v1", 3, signature=1)
+    cache.ajouter("a", "v2", 5, signature=2)
+    assert cache.obtenir("a", signature=1) is None
+    assert cache.obtenir("a", signature=2) == "v2"
+    assert cache.taille == 5
+    cache.vider()
+    assert cache.obtenir("a", signature=2) is None and cache.taille == 0
+
+
+def test_fichier_relu_quand_il_change(tmp_path):
+    chemin = tmp_path / "carte.html"
+    chemin.write_text("<p>1</p>", encoding="utf-8")
+    cache = CacheFichiers()
+    assert cache.lire(str(chemin)) == "<p>1</p>"
+    # Même taille, date différente
+    chemin.write_text("<p>2</p>", encoding="utf-8")
+    os.utime(chemin, ns=(0, os.stat(chemin).st_mtime_ns + 1))
+    assert cache.lire(str(chemin)) == "<p>2</p>"
+    assert cache.taille == len("<p>2</p>")
+
+
+def test_fichier_absent(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        CacheFichiers().lire(str(tmp_path / "absente.html"))
+
+
+def test_acces_concurrents(tmp_path):
+    """Lectures simultanées depuis plusieurs fils : budget respecté, contenus exacts."""
+    chemins = []
+    for i in range(20):
+        chemin = tmp_path / f"carte{i}.html"
+        chemin.write_text(str(i) * 100, encoding="utf-8")
+        chemins.append(str(chemin))
+    cache = CacheFichiers(taille_max=1000)
+    erreurs = []
+
+    def lire():
+        for _ in range(20):
+            for i, chemin in enumerate(chemins):
+                if cache.lire(chemin) != str(i) * 100:
+                    erreurs.append(chemin)
+
+    fils = [threading.Thread(target=lire) for _ in range(4)]
+    for f in fils:
+        f.start()
+    for f in fils:
+        f.join()
+    assert not erreurs
+    assert cache.taille <= 1000
+    assert cache.taille == sum(octets for _, _, octets in cache._entrees.values())